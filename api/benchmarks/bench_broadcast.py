@@ -0,0 +1,77 @@
+"""Benchmark for encoding the game state sent in a broadcast.
+
+Compares the CPU time per broadcast of the previous path, which built the whole game state from scratch
+for every player and encoded it with the stdlib encoder as `WebSocket.send_json` does, against the
+spliced `get_game_state_json` frames, with the stdlib encoder and with orjson when it is installed.
+
+Run from the api directory:
+    python -m benchmarks.bench_broadcast
+"""
+
+import json
+import logging
+import random
+import time
+
+from game_logic.game import Game, GameState
+from utils import serialisation
+
+
+def send_json_frames(game: Game, player_ids: list[str]) -> list[str]:
+    """The previous broadcast, kept here as a baseline."""
+    frames = []
+    for player_id in player_ids:
+        # The game state caches didn't exist, the state was built again for every websocket
+        game._public_state = None
+        game.players[player_id].hand_view = None
+        frames.append(json.dumps(game.get_game_state(player_id), separators=(",", ":"), ensure_ascii=False))
+    return frames
+
+
+def spliced_frames(game: Game, player_ids: list[str]) -> list[str]:
+    return [game.get_game_state_json(player_id) for player_id in player_ids]
+
+
+def run(encode, players: int, moves: int = 2000, seed: int = 0) -> float:
+    """Plays games, encoding a broadcast after every move.
+
+    Returns:
+        float: The average CPU seconds spent encoding each broadcast
+    """
+    random.seed(seed)
+    elapsed = 0
+    broadcasts = 0
+    while broadcasts < moves:
+        game = Game()
+        player_ids = [game.players.add_player(f"Player {i}") for i in range(players)]
+        game.start_game(player_ids[0])
+        while game.state == GameState.GAME and broadcasts < moves:
+            player_id = game.players.current_player_id
+            wild_colour = random.choice(game.get_game_state(player_id)["wildColours"])
+            if not any(game.play_card(player_id, index, wild_colour)
+                       for index in range(len(game.players[player_id].hand))):
+                game.pick_card(player_id)
+
+            start = time.process_time()
+            encode(game, player_ids)
+            elapsed += time.process_time() - start
+            broadcasts += 1
+    return elapsed / broadcasts
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    fast_encoder = serialisation.orjson
+    print(f"{'players':<10}{'send_json':>12}{'spliced':>12}{'orjson':>12}   (us per broadcast)")
+    for players in (2, 6, 10):
+        serialisation.orjson = None
+        results = [run(send_json_frames, players), run(spliced_frames, players)]
+        if fast_encoder is not None:
+            serialisation.orjson = fast_encoder
+            results.append(run(spliced_frames, players))
+        print(f"{players:<10}" + "".join(f"{seconds * 1e6:>12.1f}" for seconds in results))
+    serialisation.orjson = fast_encoder
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Micro-benchmark for drawing cards from a Deck.
+
+Compares the current stack based draw pile against the previous implementation,
+which picked a random card and removed it from the list on every draw.
+
+Run from the api directory:
+    python -m benchmarks.bench_deck
+"""
+
+from random import choice
+from timeit import timeit
+
+from cards import UNO_CARDS
+from game_logic.deck import Deck
+
+
+class LegacyDeck(Deck):
+    """The previous draw logic, kept here as a baseline."""
+
+    def deal(self, cards: int = 7):
+        return [self.pick_card() for _ in range(cards)]
+
+    def pick_card(self):
+        if not self.cards:
+            self.cards = list(self.discard_pile)[:-1]
+            self.discard_pile = [self.discard_pile[-1]]
+        card = choice(self.cards)
+        self.cards.remove(card)
+        return card
+
+    def draw(self, number: int):
+        return [self.pick_card() for _ in range(number)]
+
+
+def play_round(deck_class, cards: list) -> None:
+    """Deal 10 hands, then keep drawing and discarding through several reshuffles."""
+    deck = deck_class()
+    deck.cards = list(cards)
+    deck.shuffle()
+    hands = [deck.deal(7) for _ in range(10)]
+    deck.discard_pile.append(deck.pick_card())
+    for _ in range(100):
+        # Draw Five style bulk draw followed by the cards being played again
+        drawn = deck.draw(5)
+        deck.discard_pile += drawn
+        deck.discard_pile.append(hands[0].pop() if hands[0] else deck.pick_card())
+
+
+def main(rounds: int = 2000) -> None:
+    cards = list(range(len(UNO_CARDS)))
+    for name, deck_class in (("legacy", LegacyDeck), ("current", Deck)):
+        seconds = timeit(lambda: play_round(deck_class, cards), number=rounds)
+        print(f"{name:<10}{seconds / rounds * 1e6:>10.1f} us per round")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark for UNO Flip games.
+
+Plays complete flip mode games between bots with `sim.simulate_game` and reports the games and moves
+per second, then times playing a flip card on discard piles of several sizes, the cost of a flip
+alone. Only the public game API is used, so the same script can be run against an older checkout
+to compare before and after.
+
+Run from the api directory:
+    python -m benchmarks.bench_flip
+"""
+
+import argparse
+import logging
+import time
+from timeit import timeit
+
+from cards import Card, Colour, CARD_LISTS
+from game_logic.game import Game
+from sim import BOTS
+from sim.simulator import simulate_game
+
+
+def full_games(games: int, bots: str) -> None:
+    strategies = [BOTS[bot] for bot in bots.split(",")]
+    start = time.perf_counter()
+    turns = flips = 0
+    for seed in range(games):
+        result = simulate_game(seed, "flip", strategies)
+        turns += result.turns
+        flips += result.flips
+    elapsed = time.perf_counter() - start
+    print(f"{games:,} flip games in {elapsed:.2f}s: {games / elapsed:,.0f} games per second, "
+          f"{turns / elapsed:,.0f} moves per second, {flips / games:.1f} flips per game")
+
+
+def flip_cost(rounds: int = 2000) -> None:
+    flip_card = Card.flip(Colour.RED)
+    for size in (10, 100, 1000):
+        game = Game(seed=0)
+        game.deck.reset(CARD_LISTS["flip"])
+        game.deck.discard_pile += [card_id % len(CARD_LISTS["flip"]) for card_id in range(size)]
+        seconds = timeit(lambda: flip_card.apply(game), number=rounds)
+        print(f"flip with {size:>5} discarded cards: {seconds / rounds * 1e6:>8.2f} us")
+
+
+def main(args: argparse.Namespace) -> None:
+    logging.disable(logging.CRITICAL)
+    full_games(args.games, args.bots)
+    flip_cost()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2000, help="flip games to play")
+    parser.add_argument("--bots", default="first,random,greedy,first", help="bot strategy of each seat")
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""Stress test for the game ID allocator.
+
+Creates and destroys millions of games while keeping a steady number of them live, checking that no two
+live games ever share an ID and that every ID is in the allocator's shard, and reports the allocations
+per second. With `--games` a real `Game` is created for every ID, otherwise only the IDs are allocated.
+
+Run from the api directory:
+    python -m benchmarks.bench_game_ids
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from game_logic.game import Game
+from utils.game_ids import GameIdAllocator, decode_game_code, encode_game_code
+
+
+def stress(allocator: GameIdAllocator, created: int, live: int, games: bool, seed: int = 0) -> float:
+    """Allocates IDs, releasing a random live one whenever there are too many.
+
+    Returns:
+        float: The seconds taken
+
+    Raises:
+        AssertionError: If an ID is allocated twice while live or is outside the allocator's shard
+    """
+    rng = random.Random(seed)
+    live_ids: set[int] = set()
+    # Released in a random order, so the free list is exercised out of allocation order
+    order: list[int] = []
+
+    start = time.perf_counter()
+    for _ in range(created):
+        game_id = allocator.allocate()
+        assert game_id not in live_ids, f"Game ID {game_id} allocated twice"
+        assert game_id % allocator.shards == allocator.shard, f"Game ID {game_id} outside of the shard"
+        if games:
+            Game(game_id=game_id)
+        live_ids.add(game_id)
+        order.append(game_id)
+
+        if len(live_ids) > live:
+            index = rng.randrange(len(order))
+            order[index], order[-1] = order[-1], order[index]
+            released = order.pop()
+            live_ids.remove(released)
+            allocator.release(released)
+    elapsed = time.perf_counter() - start
+
+    assert len(allocator) == len(live_ids)
+    return elapsed
+
+
+def main(args: argparse.Namespace) -> None:
+    logging.disable(logging.CRITICAL)
+
+    for shard in range(args.shards):
+        allocator = GameIdAllocator(shard, args.shards, seed=shard)
+        elapsed = stress(allocator, args.created, args.live, args.games, seed=shard)
+        print(f"shard {shard}/{args.shards}: {args.created:,} games created and destroyed with "
+              f"{args.live:,} live out of {allocator.size:,} IDs in {elapsed:.2f}s "
+              f"({args.created / elapsed:,.0f} per second)")
+
+    assert all(decode_game_code(encode_game_code(game_id)) == game_id for game_id in range(100000, 1000000))
+    print("Every game code decodes to its game ID")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--created", type=int, default=2_000_000, help="games to create in each shard")
+    parser.add_argument("--live", type=int, default=50_000, help="games live at once")
+    parser.add_argument("--shards", type=int, default=2, help="shards to test")
+    parser.add_argument("--games", action="store_true", help="create a Game for every ID")
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+"""Benchmark for the logging overhead per move.
+
+Plays the same games with logging disabled, with the previous synchronous handlers,
+and with the queue based handlers, at DEBUG and INFO level, and prints the extra time per move.
+Console output goes to os.devnull and file output to a temporary file.
+
+Run from the api directory:
+    python -m benchmarks.bench_logging
+"""
+
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+# The log file and console stream are picked when the handlers are created on import
+log_dir = tempfile.TemporaryDirectory()
+os.environ["UNO_LOG_FILE"] = os.path.join(log_dir.name, "uno.log")
+devnull = open(os.devnull, "w")
+stderr, sys.stderr = sys.stderr, devnull
+
+from game_logic.game import Game, GameState  # noqa: E402
+from utils.custom_logger import get_queue_handler  # noqa: E402
+
+sys.stderr = stderr
+
+
+class LegacyFormatter(logging.Formatter):
+    """The previous console formatter, which built a new Formatter for every record."""
+
+    def format(self, record):
+        formatter = logging.Formatter("{levelname:<10}{name} {message}", "%Y-%m-%d %H:%M:%S", style="{")
+        return formatter.format(record)
+
+
+def game_loggers() -> list[logging.Logger]:
+    return [logger for logger in logging.Logger.manager.loggerDict.values()
+            if isinstance(logger, logging.Logger) and get_queue_handler() in logger.handlers]
+
+
+def use_handlers(handlers: list[logging.Handler], level: int) -> None:
+    for logger in game_loggers():
+        for handler in list(logger.handlers):
+            if handler is not get_queue_handler():
+                logger.removeHandler(handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+        logger.setLevel(level)
+
+
+def run(moves: int = 20000, seed: int = 0) -> float:
+    """Plays games until a number of moves have been made.
+
+    Returns:
+        float: The seconds taken per move
+    """
+    random.seed(seed)
+    elapsed = 0
+    played = 0
+    while played < moves:
+        start = time.perf_counter()
+        game = Game()
+        player_ids = [game.players.add_player(f"Player {i}") for i in range(4)]
+        game.start_game(player_ids[0])
+        while game.state == GameState.GAME and played < moves:
+            player_id = game.players.current_player_id
+            wild_colour = random.choice(game.get_game_state(player_id)["wildColours"])
+            if not any(game.play_card(player_id, index, wild_colour)
+                       for index in range(len(game.players[player_id].hand))):
+                game.pick_card(player_id)
+            played += 1
+        elapsed += time.perf_counter() - start
+    return elapsed / played
+
+
+def main() -> None:
+    queue_handler = get_queue_handler()
+    legacy_console = logging.StreamHandler(devnull)
+    legacy_console.setFormatter(LegacyFormatter())
+    legacy_file = logging.FileHandler(os.path.join(log_dir.name, "legacy.log"), encoding="utf-8")
+    legacy_file.setFormatter(logging.Formatter(
+        "[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{"))
+
+    logging.disable(logging.CRITICAL)
+    baseline = run()
+    logging.disable(logging.NOTSET)
+    print(f"{'disabled':<20}{baseline * 1e6:>8.1f} us per move")
+
+    for level in (logging.DEBUG, logging.INFO):
+        for name, handlers in (("synchronous", [legacy_console, legacy_file]), ("queue", [queue_handler])):
+            use_handlers(handlers, level)
+            overhead = run() - baseline
+            print(f"{name + ' ' + logging.getLevelName(level):<20}{overhead * 1e6:>8.1f} us logging overhead per move")
+
+    use_handlers([queue_handler], logging.DEBUG)
+
+
+if __name__ == "__main__":
+    main()
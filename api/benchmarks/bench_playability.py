@@ -0,0 +1,66 @@
+"""Micro-benchmark for checking which cards in a hand can be played.
+
+Compares the batched playability check of `Deck.playable` against the previous implementation,
+which compared the face of every card with the top of the discard pile, for hands of several sizes
+in both game modes, and checks that both give the same answer for every hand.
+
+Run from the api directory:
+    python -m benchmarks.bench_playability
+"""
+
+from random import Random
+from timeit import timeit
+
+from cards import CARD_LISTS, Colour
+from game_logic import playability
+from game_logic.deck import Deck
+
+
+def legacy_playable(deck: Deck, hand: list[int]) -> list[bool]:
+    """The previous per card check, kept here as a baseline."""
+    def is_playable(card_id: int) -> bool:
+        if deck.discard_pile:
+            discard_colour = deck.colour(deck.discard_pile[-1])
+            if not discard_colour:
+                return True
+            face = deck.face(card_id)
+            return (face.colour == discard_colour
+                    or face.action_name == deck.face(deck.discard_pile[-1]).action_name) or not face.colour
+        return False
+    return [is_playable(card_id) for card_id in hand]
+
+
+def random_decks(game_mode: str, count: int, rng: Random) -> list[Deck]:
+    """Returns decks with a random side face up and a random card, wild ones with a random colour, discarded."""
+    decks = []
+    for _ in range(count):
+        deck = Deck(Random(rng.random()))
+        deck.reset(CARD_LISTS[game_mode])
+        deck.flip = rng.randrange(2) if game_mode == "flip" else 0
+        deck.discard_pile.append(deck.pick_card())
+        if not deck.face(deck.discard_pile[-1]).colour and rng.random() < 0.8:
+            deck.set_colour(deck.discard_pile[-1], rng.choice(Colour.colours(deck)))
+        decks.append(deck)
+    return decks
+
+
+def main(rounds: int = 200) -> None:
+    rng = Random(0)
+    print(f"NumPy {'available' if playability.numpy is not None else 'not installed'}")
+    for game_mode in CARD_LISTS:
+        decks = random_decks(game_mode, 50, rng)
+        for size in (7, 20, 50, 100):
+            hands = [[rng.randrange(len(deck.card_list)) for _ in range(size)] for deck in decks]
+            for deck, hand in zip(decks, hands):
+                assert deck.playable(hand) == legacy_playable(deck, hand), "Playability differs from the legacy check"
+
+            results = []
+            for name, check in (("legacy", legacy_playable), ("batched", Deck.playable)):
+                seconds = timeit(lambda: [check(deck, hand) for deck, hand in zip(decks, hands)], number=rounds)
+                results.append(seconds / rounds / len(decks) * 1e6)
+            print(f"{game_mode:<6}{size:>4} cards  legacy {results[0]:>7.2f} us  batched {results[1]:>7.2f} us  "
+                  f"({results[0] / results[1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark for the throughput of the API sharded over several worker processes.
+
+Starts the router with 1, 2, 4, ... workers, up to the number of cores, and drives it with client processes
+that create, join and start games as fast as they can. Prints the requests per second for each number of
+workers and the speedup over a single worker. Every request for a game must be answered by the worker that
+owns it, so this also checks the routing: a misrouted join or start returns 404.
+
+Needs uvicorn and the API's dependencies installed. Run from the api directory:
+    python -m benchmarks.bench_sharding
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from router import wait_for_port
+
+
+async def request(port: int, path: str, body: dict) -> tuple[int, dict]:
+    """Sends a POST request with a JSON body on a new connection.
+
+    Returns:
+        tuple: The status code and the JSON response
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(content or b"null")
+
+
+async def play(port: int, deadline: float) -> tuple[int, int]:
+    """Creates, joins and starts games until the deadline.
+
+    Returns:
+        tuple: The number of requests and the number of failed requests
+    """
+    requests = failures = 0
+    while time.perf_counter() < deadline:
+        _, created = await request(port, "/create_game", {"player_name": "Host"})
+        game_id = created["game_id"]
+        status_join, _ = await request(port, "/join_game", {"game_id": game_id, "player_name": "Guest"})
+        status_start, _ = await request(port, "/start_game", {"game_id": game_id, "player_id": created["player_id"]})
+        requests += 3
+        failures += (status_join != 201) + (status_start != 200)
+    return requests, failures
+
+
+def run_client(port: int, connections: int, seconds: float) -> tuple[int, int]:
+    """Runs concurrent clients in one process."""
+    async def main():
+        deadline = time.perf_counter() + seconds
+        results = await asyncio.gather(*(play(port, deadline) for _ in range(connections)))
+        return sum(r for r, _ in results), sum(f for _, f in results)
+    return asyncio.run(main())
+
+
+async def measure(workers: int, clients: int, connections: int, seconds: float, port: int) -> tuple[float, int]:
+    """Starts the router with a number of workers and measures the requests per second through it."""
+    router = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "router", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port),
+        "--worker-port", str(port + 1), "--", "--log-level", "critical",
+        env=dict(os.environ, UNO_LOG_LEVEL="WARNING"))
+    try:
+        await wait_for_port("127.0.0.1", port)
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(clients) as pool:
+            results = await asyncio.gather(*(loop.run_in_executor(pool, run_client, port, connections, seconds)
+                                             for _ in range(clients)))
+        return sum(r for r, _ in results) / seconds, sum(f for _, f in results)
+    finally:
+        router.terminate()
+        await router.wait()
+
+
+async def main(args: argparse.Namespace) -> None:
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+
+    baseline = None
+    print(f"{'workers':>8} {'requests/s':>12} {'speedup':>8} {'failed':>7}")
+    for workers in counts:
+        rate, failures = await measure(workers, args.clients, args.connections, args.seconds, args.port)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>12.0f} {rate / baseline:>7.2f}x {failures:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count(), help="most workers to measure")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="client processes")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent clients per process")
+    parser.add_argument("--seconds", type=float, default=5, help="seconds to measure each worker count")
+    parser.add_argument("--port", type=int, default=8800, help="port of the router, the workers use the following ports")
+    asyncio.run(main(parser.parse_args()))
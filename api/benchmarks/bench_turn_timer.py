@@ -0,0 +1,115 @@
+"""Stress test for the turn timers.
+
+Starts tens of thousands of games on one event loop in which no player ever moves, so every turn runs out
+and is played by the turn timer, and reports the automatic moves per second and how late a ticker task
+on the same event loop wakes up. The same games are then timed with one `asyncio.sleep` task per game,
+the baseline the shared heap replaces.
+
+Run from the api directory:
+    python -m benchmarks.bench_turn_timer
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import tracemalloc
+
+from game_logic.game import Game, GameState
+from utils.game_store import MemoryGameStore
+from utils.turn_timer import TurnTimer
+
+
+async def started_games(count: int) -> MemoryGameStore:
+    store = MemoryGameStore()
+    for game_id in range(count):
+        game = Game(seed=game_id, game_id=game_id)
+        player_ids = [game.players.add_player(f"Player {seat}") for seat in range(4)]
+        game.start_game(player_ids[0])
+        await store.add(game)
+    return store
+
+
+async def measure_lag(stop: asyncio.Event, lags: list[float], tick: float = 0.01) -> None:
+    """Records how late each tick of the event loop wakes up."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - start - tick)
+
+
+def report(name: str, moves: int, seconds: float, lags: list[float], memory: int) -> None:
+    lags.sort()
+    print(f"{name:<12}{moves / seconds:>10,.0f} moves per second, event loop lag p50 "
+          f"{lags[len(lags) // 2] * 1000:.1f} ms, p99 {lags[int(len(lags) * 0.99)] * 1000:.1f} ms, "
+          f"max {lags[-1] * 1000:.1f} ms, scheduler memory {memory / 1024 / 1024:.1f} MiB")
+
+
+async def shared_heap(games: int, turn_seconds: float, duration: float) -> None:
+    store = await started_games(games)
+    moves = 0
+
+    async def on_move(game, seat, move):
+        nonlocal moves
+        moves += 1
+
+    tracemalloc.start()
+    timer = TurnTimer(store, on_move, turn_seconds=turn_seconds, interval=0.05)
+    for game_id, _ in store.items():
+        timer.track(game_id)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    timer.start()
+    await asyncio.sleep(duration)
+    await timer.stop()
+    stop.set()
+    await ticker
+    report("shared heap", moves, duration, lags, memory)
+
+
+async def task_per_game(games: int, turn_seconds: float, duration: float) -> None:
+    store = await started_games(games)
+    timer = TurnTimer(store, None, turn_seconds=turn_seconds)
+    moves = 0
+
+    async def time_turns(game: Game):
+        nonlocal moves
+        while game.state == GameState.GAME:
+            await asyncio.sleep(max(game.updated + turn_seconds - time.monotonic(), 0))
+            if time.monotonic() >= game.updated + turn_seconds:
+                timer.auto_move(game)
+                moves += 1
+
+    tracemalloc.start()
+    tasks = [asyncio.create_task(time_turns(game)) for _, game in store.items()]
+    await asyncio.sleep(0)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    stop.set()
+    await ticker
+    report("task/game", moves, duration, lags, memory)
+
+
+def main(args: argparse.Namespace) -> None:
+    logging.disable(logging.CRITICAL)
+    print(f"{args.games:,} games, {args.turn_seconds}s turns, {args.duration}s")
+    asyncio.run(shared_heap(args.games, args.turn_seconds, args.duration))
+    asyncio.run(task_per_game(args.games, args.turn_seconds, args.duration))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20_000, help="games being played at once")
+    parser.add_argument("--turn-seconds", type=float, default=2.0, help="seconds a player has to move")
+    parser.add_argument("--duration", type=float, default=9.0, help="seconds to run each scheduler for")
+    main(parser.parse_args())
@@ -1,2 +1,2 @@
-from .cards import Colour, Type, Card, FlipCard
-from .card_lists import build_uno_cards, build_flip_cards
+from .cards import Colour, Type, Kind, CardKind, CARD_KINDS, Card, FlipCard
+from .card_lists import compile_decks, load_decks, UNO_CARDS, FLIP_CARDS, CARD_LISTS, DECK_NAMES
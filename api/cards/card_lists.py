@@ -1,149 +1,219 @@
-from .cards import Card, FlipCard, Colour
-
-def build_uno_cards(deck) -> list[Card]:
-
-    # Numbers: 0-9 (2 of each colour) = 80 total
-    cards = [Card.number(col, num) for col in Colour.colours(deck) for num in range(1, 10) for _ in range(2)] 
-    cards += [Card.number(col, 0) for col in Colour.colours(deck)]
-    # Skip: (2 of each colour) = 8 total
-    cards += [Card.skip(col) for col in Colour.colours(deck) for _ in range(2)]
-    # Draw Two: (2 of each colour) = 8 total
-    cards += [Card.draw(col, 2) for col in Colour.colours(deck) for _ in range(2)]
-    # Reverse: (2 of each colour) = 8 total
-    cards += [Card.reverse(col) for col in Colour.colours(deck) for _ in range(2)]
-    # Wild: 4 total
-    cards += [Card.wild() for _ in range(4)]
-    # Wild Draw Four: 4 total
-    cards += [Card.wild_draw(4) for _ in range(4)]
-
-    return cards
-
-def build_flip_cards(deck) -> list[Card]:
-    cards = [
-        FlipCard(Card.number(Colour.YELLOW, 1), Card.skip_everyone(Colour.PINK)),
-        FlipCard(Card.number(Colour.YELLOW, 1), Card.wild()),
-        FlipCard(Card.number(Colour.YELLOW, 2), Card.number(Colour.TURQUOISE, 1)),
-        FlipCard(Card.number(Colour.YELLOW, 2), Card.number(Colour.TURQUOISE, 8)),
-        FlipCard(Card.number(Colour.YELLOW, 3), Card.number(Colour.PURPLE, 1)),
-        FlipCard(Card.number(Colour.YELLOW, 3), Card.draw(Colour.PINK, 5)),
-        FlipCard(Card.number(Colour.YELLOW, 4), Card.draw(Colour.PINK, 5)),
-        FlipCard(Card.number(Colour.YELLOW, 4), Card.flip(Colour.PURPLE)),
-        FlipCard(Card.number(Colour.YELLOW, 5), Card.number(Colour.TURQUOISE, 8)),
-        FlipCard(Card.number(Colour.YELLOW, 5), Card.number(Colour.PURPLE, 9)),
-        FlipCard(Card.number(Colour.YELLOW, 6), Card.skip_everyone(Colour.ORANGE)),
-        FlipCard(Card.number(Colour.YELLOW, 6), Card.wild_draw_colour()),
-        FlipCard(Card.number(Colour.YELLOW, 7), Card.number(Colour.ORANGE, 2)),
-        FlipCard(Card.number(Colour.YELLOW, 7), Card.number(Colour.PURPLE, 6)),
-        FlipCard(Card.number(Colour.YELLOW, 8), Card.number(Colour.PINK, 1)),
-        FlipCard(Card.number(Colour.YELLOW, 8), Card.number(Colour.ORANGE, 2)),
-        FlipCard(Card.number(Colour.YELLOW, 9), Card.number(Colour.PURPLE, 4)),
-        FlipCard(Card.number(Colour.YELLOW, 9), Card.number(Colour.TURQUOISE, 5)),
-
-        FlipCard(Card.number(Colour.RED, 1), Card.number(Colour.PURPLE, 2)),
-        FlipCard(Card.number(Colour.RED, 1), Card.number(Colour.PINK, 3)),
-        FlipCard(Card.number(Colour.RED, 2), Card.draw(Colour.PURPLE, 5)),
-        FlipCard(Card.number(Colour.RED, 2), Card.reverse(Colour.ORANGE)),
-        FlipCard(Card.number(Colour.RED, 3), Card.number(Colour.PINK, 7)),
-        FlipCard(Card.number(Colour.RED, 3), Card.wild_draw_colour()),
-        FlipCard(Card.number(Colour.RED, 4), Card.draw(Colour.PURPLE, 5)),
-        FlipCard(Card.number(Colour.RED, 4), Card.flip(Colour.ORANGE)),
-        FlipCard(Card.number(Colour.RED, 5), Card.number(Colour.PINK, 2)),
-        FlipCard(Card.number(Colour.RED, 5), Card.number(Colour.TURQUOISE, 5)),
-        FlipCard(Card.number(Colour.RED, 6), Card.number(Colour.ORANGE, 9)),
-        FlipCard(Card.number(Colour.RED, 6), Card.skip_everyone(Colour.PINK)),
-        FlipCard(Card.number(Colour.RED, 7), Card.number(Colour.ORANGE, 1)),
-        FlipCard(Card.number(Colour.RED, 7), Card.number(Colour.PURPLE, 5)),
-        FlipCard(Card.number(Colour.RED, 8), Card.number(Colour.TURQUOISE, 7)),
-        FlipCard(Card.number(Colour.RED, 8), Card.reverse(Colour.PURPLE)),
-        FlipCard(Card.number(Colour.RED, 9), Card.number(Colour.PURPLE, 5)),
-        FlipCard(Card.number(Colour.RED, 9), Card.reverse(Colour.TURQUOISE)),
-
-        FlipCard(Card.number(Colour.BLUE, 1), Card.skip_everyone(Colour.PURPLE)),
-        FlipCard(Card.number(Colour.BLUE, 1), Card.skip_everyone(Colour.PURPLE)),
-        FlipCard(Card.number(Colour.BLUE, 2), Card.number(Colour.ORANGE, 8)),
-        FlipCard(Card.number(Colour.BLUE, 2), Card.number(Colour.PINK, 6)),
-        FlipCard(Card.number(Colour.BLUE, 3), Card.number(Colour.TURQUOISE, 2)),
-        FlipCard(Card.number(Colour.BLUE, 3), Card.number(Colour.PURPLE, 8)),
-        FlipCard(Card.number(Colour.BLUE, 4), Card.draw(Colour.TURQUOISE, 5)),
-        FlipCard(Card.number(Colour.BLUE, 4), Card.number(Colour.PURPLE, 1)),
-        FlipCard(Card.number(Colour.BLUE, 5), Card.number(Colour.PINK, 9)),
-        FlipCard(Card.number(Colour.BLUE, 5), Card.reverse(Colour.ORANGE)),
-        FlipCard(Card.number(Colour.BLUE, 6), Card.reverse(Colour.PURPLE)),
-        FlipCard(Card.number(Colour.BLUE, 6), Card.skip_everyone(Colour.TURQUOISE)),
-        FlipCard(Card.number(Colour.BLUE, 7), Card.number(Colour.ORANGE, 3)),
-        FlipCard(Card.number(Colour.BLUE, 7), Card.skip_everyone(Colour.ORANGE)),
-        FlipCard(Card.number(Colour.BLUE, 8), Card.number(Colour.TURQUOISE, 4)),
-        FlipCard(Card.number(Colour.BLUE, 8), Card.reverse(Colour.TURQUOISE)),
-        FlipCard(Card.number(Colour.BLUE, 9), Card.number(Colour.ORANGE, 5)),
-        FlipCard(Card.number(Colour.BLUE, 9), Card.flip(Colour.PURPLE)),
-
-        FlipCard(Card.number(Colour.GREEN, 1), Card.number(Colour.ORANGE, 5)),
-        FlipCard(Card.number(Colour.GREEN, 1), Card.flip(Colour.ORANGE)),
-        FlipCard(Card.number(Colour.GREEN, 2), Card.skip_everyone(Colour.TURQUOISE)),
-        FlipCard(Card.number(Colour.GREEN, 2), Card.draw(Colour.TURQUOISE, 5)),
-        FlipCard(Card.number(Colour.GREEN, 3), Card.number(Colour.PURPLE, 2)),
-        FlipCard(Card.number(Colour.GREEN, 3), Card.flip(Colour.PINK)),
-        FlipCard(Card.number(Colour.GREEN, 4), Card.number(Colour.TURQUOISE, 9)),
-        FlipCard(Card.number(Colour.GREEN, 4), Card.number(Colour.PINK, 8)),
-        FlipCard(Card.number(Colour.GREEN, 5), Card.number(Colour.TURQUOISE, 4)),
-        FlipCard(Card.number(Colour.GREEN, 5), Card.number(Colour.ORANGE, 7)),
-        FlipCard(Card.number(Colour.GREEN, 6), Card.number(Colour.PINK, 5)),
-        FlipCard(Card.number(Colour.GREEN, 6), Card.wild_draw_colour()),
-        FlipCard(Card.number(Colour.GREEN, 7), Card.number(Colour.TURQUOISE, 2)),
-        FlipCard(Card.number(Colour.GREEN, 7), Card.number(Colour.ORANGE, 6)),
-        FlipCard(Card.number(Colour.GREEN, 8), Card.number(Colour.TURQUOISE, 9)),
-        FlipCard(Card.number(Colour.GREEN, 8), Card.reverse(Colour.PINK)),
-        FlipCard(Card.number(Colour.GREEN, 9), Card.draw(Colour.PINK, 5)),
-        FlipCard(Card.number(Colour.GREEN, 9), Card.reverse(Colour.ORANGE)),
-
-        FlipCard(Card.draw(Colour.YELLOW, 1, score=10), Card.number(Colour.PINK, 1)),
-        FlipCard(Card.draw(Colour.YELLOW, 1, score=10), Card.number(Colour.PURPLE, 8)),
-        FlipCard(Card.draw(Colour.RED, 1, score=10), Card.number(Colour.PINK, 3)),
-        FlipCard(Card.draw(Colour.RED, 1, score=10), Card.number(Colour.PINK, 4)),
-        FlipCard(Card.draw(Colour.BLUE, 1, score=10), Card.number(Colour.PINK, 6)),
-        FlipCard(Card.draw(Colour.BLUE, 1, score=10), Card.number(Colour.TURQUOISE, 6)),
-        FlipCard(Card.draw(Colour.GREEN, 1, score=10), Card.number(Colour.ORANGE, 6)),
-        FlipCard(Card.draw(Colour.GREEN, 1, score=10), Card.number(Colour.TURQUOISE, 6)),
-
-        FlipCard(Card.reverse(Colour.YELLOW), Card.flip(Colour.TURQUOISE)),
-        FlipCard(Card.reverse(Colour.YELLOW), Card.wild()),
-        FlipCard(Card.reverse(Colour.RED), Card.number(Colour.PURPLE, 3)),
-        FlipCard(Card.reverse(Colour.RED), Card.number(Colour.TURQUOISE, 7)),
-        FlipCard(Card.reverse(Colour.BLUE), Card.number(Colour.ORANGE, 4)),
-        FlipCard(Card.reverse(Colour.BLUE), Card.wild()),
-        FlipCard(Card.reverse(Colour.GREEN), Card.number(Colour.ORANGE, 1)),
-        FlipCard(Card.reverse(Colour.GREEN), Card.number(Colour.PINK, 7)),
-
-        FlipCard(Card.flip(Colour.YELLOW), Card.number(Colour.PINK, 4)),
-        FlipCard(Card.flip(Colour.YELLOW), Card.number(Colour.ORANGE, 8)),
-        FlipCard(Card.flip(Colour.RED), Card.number(Colour.PURPLE, 3)),
-        FlipCard(Card.flip(Colour.RED), Card.number(Colour.PINK, 8)),
-        FlipCard(Card.flip(Colour.BLUE), Card.number(Colour.PURPLE, 6)),
-        FlipCard(Card.flip(Colour.BLUE), Card.number(Colour.PURPLE, 7)),
-        FlipCard(Card.flip(Colour.GREEN), Card.number(Colour.TURQUOISE, 3)),
-        FlipCard(Card.flip(Colour.GREEN), Card.wild_draw_colour()),
-
-        FlipCard(Card.skip(Colour.YELLOW), Card.number(Colour.ORANGE, 3)),
-        FlipCard(Card.skip(Colour.YELLOW), Card.flip(Colour.TURQUOISE)),
-        FlipCard(Card.skip(Colour.RED), Card.draw(Colour.ORANGE, 5)),
-        FlipCard(Card.skip(Colour.RED), Card.wild()),
-        FlipCard(Card.skip(Colour.BLUE), Card.number(Colour.TURQUOISE, 1)),
-        FlipCard(Card.skip(Colour.BLUE), Card.number(Colour.PINK, 9)),
-        FlipCard(Card.skip(Colour.GREEN), Card.number(Colour.PURPLE, 4)),
-        FlipCard(Card.skip(Colour.GREEN), Card.number(Colour.ORANGE, 9)),
-
-        FlipCard(Card.wild(), Card.number(Colour.TURQUOISE, 3)),
-        FlipCard(Card.wild(), Card.number(Colour.PINK, 5)),
-        FlipCard(Card.wild(), Card.number(Colour.PURPLE, 7)),
-        FlipCard(Card.wild(), Card.flip(Colour.PINK)),
-
-        FlipCard(Card.wild_draw(2), Card.number(Colour.PINK, 2)),
-        FlipCard(Card.wild_draw(2), Card.number(Colour.ORANGE, 4)),
-        FlipCard(Card.wild_draw(2), Card.number(Colour.ORANGE, 7)),
-        FlipCard(Card.wild_draw(2), Card.number(Colour.PURPLE, 9)),
+"""The card lists of every game mode, compiled from deck definition files.
+
+Deck compositions are declared in JSON: the built in decks are in `decks.json` next to this module,
+and house decks can be added in more files. Each file is an object of deck name to deck:
+
+    {
+        "house": {
+            "sides": 1,
+            "cards": [
+                {"kind": "number", "colours": ["red", "blue"], "values": [1, 2, 3], "copies": 2},
+                ["wild_draw", null, 4]
+            ]
+        }
+    }
+
+A face is a list of its kind, a name from `cards.Kind` in lower case, and optionally its colour, its value
+and its score, if it isn't the score of its kind. A card is a list with a face for each side of the deck.
+A single sided card can also be a face on its own, or a group that repeats a face for every colour
+and value, `copies` times each. The order of the cards is their card ID, so changing the order of an
+existing deck changes the cards of games saved in snapshots.
+
+The files are compiled into a catalogue of interned card prototypes. The compiled catalogue is cached in
+a binary file keyed by the SHA-256 hash of the definition files, so the JSON is only parsed and checked
+when a file changes. Game modes are the deck names, and the ID of a compiled deck is its index in
+`DECK_NAMES`, the built in decks first.
+
+Settings read from the environment:
+    UNO_DECK_FILES: house deck definition files, separated by `os.pathsep`
+    UNO_DECK_CACHE: the compiled deck cache, `decks.bin` next to this module by default, empty to disable it
+
+Functions:
+    compile_decks: Parses deck definition files into the compiled binary form.
+    load_decks: Returns the card lists of the decks in definition files, using the cache if it is current.
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+from utils.custom_logger import CustomLogger
+
+from .cards import Card, Colour, FlipCard, Kind
+
+logger = CustomLogger(__name__)
+
+MAGIC = b"UNOD"
+FORMAT_VERSION = 1
+# magic, format version, SHA-256 of the definition files, number of faces, number of decks
+HEADER = struct.Struct("<4sH32sHH")
+# kind, colour index + 1 or 0 for none, value or -1, score or -1 for the score of the kind
+FACE = struct.Struct("<BBhh")
+# name length, sides, number of cards, followed by the name and a face index for each side of each card
+DECK = struct.Struct("<HBH")
+
+COLOURS = list(Colour)
+
+BUILT_IN_DECKS = os.path.join(os.path.dirname(__file__), "decks.json")
+DECK_FILES = [BUILT_IN_DECKS] + [path for path in os.environ.get("UNO_DECK_FILES", "").split(os.pathsep) if path]
+DECK_CACHE = os.environ.get("UNO_DECK_CACHE", os.path.join(os.path.dirname(__file__), "decks.bin"))
+
+
+def _parse_face(face: list) -> tuple[int, int, int, int]:
+    """Returns a face declared as [kind, colour, value, score] as its encoded fields."""
+    if not isinstance(face, list) or not 1 <= len(face) <= 4:
+        raise ValueError("a face must be a list of its kind, colour, value and score")
+    kind, colour, value, score = face + [None] * (4 - len(face))
+    return (
+        Kind[kind.upper()],
+        COLOURS.index(Colour(colour)) + 1 if colour is not None else 0,
+        int(value) if value is not None else -1,
+        int(score) if score is not None else -1,
+    )
+
+
+def _parse_cards(entry, sides: int) -> list[tuple]:
+    """Returns the cards declared by an entry of a deck, each a tuple of encoded faces."""
+    if isinstance(entry, dict):
+        if sides != 1:
+            raise ValueError("groups are only allowed in single sided decks")
+        return [(_parse_face([entry["kind"], colour, value, entry.get("score")]),)
+                for colour in entry.get("colours", [None])
+                for value in entry.get("values", [None])
+                for _ in range(entry.get("copies", 1))]
+    if sides == 1 and entry and isinstance(entry[0], str):
+        return [(_parse_face(entry),)]
+    if not isinstance(entry, list) or len(entry) != sides:
+        raise ValueError(f"a card must have a face for each of the {sides} sides")
+    return [tuple(_parse_face(face) for face in entry)]
+
+
+def compile_decks(paths: list[str]) -> bytes:
+    """Parses deck definition files into the compiled binary form.
+
+    Args:
+        paths (list): The definition files, decks are numbered in the order of the files
+
+    Returns:
+        bytes: The compiled decks
+
+    Raises:
+        ValueError: If a deck is declared twice or a card is invalid
+    """
+    digest = hashlib.sha256()
+    decks: dict[str, tuple[int, list[tuple]]] = {}
+    for path in paths:
+        with open(path, "rb") as file:
+            data = file.read()
+        digest.update(hashlib.sha256(data).digest())
+        for name, deck in json.loads(data).items():
+            if name in decks:
+                raise ValueError(f"Deck {name!r} in {path} is already defined")
+            sides = deck.get("sides", 1)
+            if sides not in (1, 2):
+                raise ValueError(f"Deck {name!r} in {path} must have 1 or 2 sides")
+            cards = []
+            for index, entry in enumerate(deck["cards"]):
+                try:
+                    cards += _parse_cards(entry, sides)
+                except (KeyError, ValueError, TypeError, AttributeError) as e:
+                    raise ValueError(f"Invalid card {index} {entry!r} in deck {name!r} of {path}: {e}") from e
+            decks[name] = (sides, cards)
+
+    # Identical faces are stored once and referred to by index
+    faces: dict[tuple, int] = {}
+    body = bytearray()
+    for name, (sides, cards) in decks.items():
+        encoded_name = name.encode()
+        body += DECK.pack(len(encoded_name), sides, len(cards)) + encoded_name
+        indexes = [faces.setdefault(face, len(faces)) for card in cards for face in card]
+        body += struct.pack(f"<{len(indexes)}H", *indexes)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, digest.digest(), len(faces), len(decks))
+    return header + b"".join(FACE.pack(*face) for face in faces) + body
+
+
+def _digest(paths: list[str]) -> bytes:
+    """Returns the SHA-256 hash of the definition files, as stored by `compile_decks`."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.digest()
+
+
+def _build_decks(data: bytes) -> dict[str, tuple[Card | FlipCard, ...]]:
+    """Builds the card lists of compiled decks, sharing one prototype between identical cards."""
+    _, _, _, face_count, deck_count = HEADER.unpack_from(data)
+    offset = HEADER.size
+
+    faces = [
+        Card.make(kind, COLOURS[colour - 1] if colour else None, value if value >= 0 else None,
+                  score=score if score >= 0 else None)
+        for kind, colour, value, score in FACE.iter_unpack(data[offset:offset + face_count * FACE.size])
     ]
+    offset += face_count * FACE.size
+
+    flip_cards: dict[tuple[int, int], FlipCard] = {}
+    decks = {}
+    for _ in range(deck_count):
+        name_length, sides, card_count = DECK.unpack_from(data, offset)
+        offset += DECK.size
+        name = data[offset:offset + name_length].decode()
+        offset += name_length
+        indexes = struct.unpack_from(f"<{card_count * sides}H", data, offset)
+        offset += card_count * sides * 2
+        if sides == 1:
+            decks[name] = tuple(faces[index] for index in indexes)
+            continue
+        cards = []
+        for pair in zip(indexes[::2], indexes[1::2]):
+            if pair not in flip_cards:
+                flip_cards[pair] = FlipCard(faces[pair[0]], faces[pair[1]])
+            cards.append(flip_cards[pair])
+        decks[name] = tuple(cards)
+    return decks
+
+
+def load_decks(paths: list[str], cache: str | None = None) -> dict[str, tuple[Card | FlipCard, ...]]:
+    """Returns the card lists of the decks in definition files, using the compiled cache if it is current.
+
+    Args:
+        paths (list): The definition files
+        cache (str | None): The compiled deck cache, written when it is missing or out of date
+
+    Returns:
+        dict: The card list of each deck by name, in the order they are defined
+    """
+    digest = _digest(paths)
+    if cache:
+        try:
+            with open(cache, "rb") as file:
+                data = file.read()
+            magic, format_version, cached_digest, _, _ = HEADER.unpack_from(data)
+            if (magic, format_version, cached_digest) == (MAGIC, FORMAT_VERSION, digest):
+                return _build_decks(data)
+        except (OSError, struct.error):
+            pass
+
+    data = compile_decks(paths)
+    if cache:
+        try:
+            temporary = f"{cache}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                file.write(data)
+            os.replace(temporary, cache)
+        except OSError as e:
+            logger.warning("Failed to cache the compiled decks in %s: %r", cache, e)
+    return _build_decks(data)
+
 
-    for card in cards:
-        card.deck = deck
+# The card lists are built once when the module is imported and shared by every game.
+# A game's deck refers to these cards by their index in the list.
+CARD_LISTS = load_decks(DECK_FILES, DECK_CACHE)
+# Deck IDs are indexes into this tuple
+DECK_NAMES = tuple(CARD_LISTS)
 
-    return cards
+UNO_CARDS = CARD_LISTS["uno"]
+FLIP_CARDS = CARD_LISTS["flip"]
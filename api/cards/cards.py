@@ -1,4 +1,6 @@
-from enum import Enum
+from enum import Enum, IntEnum
+from functools import cache
+from typing import NamedTuple
 
 from utils.custom_logger import CustomLogger
 
@@ -29,160 +31,231 @@ class Type(Enum):
     WILD = "wild"
     REVERSE = "reverse"
 
+
+class Kind(IntEnum):
+    """The kind of a card, which decides its type, action, score and behaviour."""
+    NUMBER = 0
+    SKIP = 1
+    REVERSE = 2
+    DRAW = 3
+    WILD = 4
+    WILD_DRAW = 5
+    # UNO Flip cards
+    FLIP = 6
+    SKIP_EVERYONE = 7
+    WILD_DRAW_COLOUR = 8
+
+
+class CardKind(NamedTuple):
+    """The definition of a kind of card.
+
+    Attributes:
+        type (Type): The type of the card.
+        action_name (str): The action text of the card, formatted with the card's value.
+        score (int | None): The score of the card, None if the score is the card's value.
+    """
+    type: Type
+    action_name: str
+    score: int | None
+
+
+# The definition of every kind of card, a card is built from its kind, colour and value
+CARD_KINDS = {
+    Kind.NUMBER: CardKind(Type.NUMBER, "{value}", None),
+    Kind.SKIP: CardKind(Type.SKIP, "skip", 20),
+    Kind.REVERSE: CardKind(Type.REVERSE, "reverse", 20),
+    Kind.DRAW: CardKind(Type.DRAW, "draw{value}", 20),
+    Kind.WILD: CardKind(Type.WILD, "wild", 40),
+    Kind.WILD_DRAW: CardKind(Type.WILD, "WildDraw{value}", 50),
+    Kind.FLIP: CardKind(Type.WILD, "flip", 20),
+    Kind.SKIP_EVERYONE: CardKind(Type.SKIP, "skip everyone", 20),
+    Kind.WILD_DRAW_COLOUR: CardKind(Type.WILD, "wild draw colour", 60),
+}
+
+
 class Card:
+    """An immutable card prototype, shared by every game.
 
-    def __init__(self, type: Type, colour: Colour | None, behaviour, action_name: str, score: int):
-        self.type = type
-        self.colour = colour
-        self.behaviour = behaviour
-        self.action_name = action_name
-        self.score = score
-
-    def is_playable(self, deck):
-        discard_pile = deck.discard_pile
-        if discard_pile:
-            discard = discard_pile[-1]
-            # if the discard is a wild card
-            if not discard.colour:
-                return True
-            return (self.colour == discard.colour or self.action_name == discard.action_name) or not self.colour
+    Games never hold Card objects directly, they hold small integer IDs into a card list
+    and keep per game state, such as the colour chosen for a wild card, in their Deck.
+
+    Every card of the same kind shares its behaviour, a method that is looked up in a jump table
+    indexed by the card's kind when the card is applied.
+
+    Attributes:
+        kind (Kind): The kind of the card.
+        colour (Colour | None): The colour of the card, None for wild cards.
+        action_name (str): The action text of the card.
+        score (int): The score of the card.
+        value (int | None): The number on the card, or the number of cards to draw.
+        faces (tuple): The face of each side, indexed by `Deck.flip`, a single sided card shows itself on both.
+    """
+    __slots__ = ("kind", "colour", "action_name", "score", "value", "faces")
+
+    def __init__(self, kind: Kind, colour: Colour | None, action_name: str, score: int, value: int | None = None):
+        for name, attribute in zip(self.__slots__, (kind, colour, action_name, score, value, (self, self))):
+            object.__setattr__(self, name, attribute)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} objects are immutable")
 
     def __str__(self):
         return f"{self.colour} {self.action_name}"
 
+    @property
+    def type(self) -> Type:
+        """The type of the card, from its kind."""
+        return CARD_KINDS[self.kind].type
+
+    def side(self, flip: int) -> "Card":
+        """Returns the face of the card for the given side, a single sided card always shows itself."""
+        return self.faces[flip]
+
+    @staticmethod
+    def make(kind: Kind, colour: Colour | None = None, value: int | None = None, *, score: int | None = None) -> "Card":
+        """Builds a card from the definition of its kind.
+
+        The cards are cached so identical cards share a single prototype.
+
+        Args:
+            kind (Kind): The kind of the card.
+            colour (Colour | None): The colour of the card, None for wild cards.
+            value (int | None): The number on the card, or the number of cards to draw.
+            score (int | None): The score of the card, if it isn't the score of its kind.
+        """
+        if score is None:
+            score = CARD_KINDS[kind].score if CARD_KINDS[kind].score is not None else value
+        return Card._intern(Kind(kind), colour, value, score)
+
+    @staticmethod
+    @cache
+    def _intern(kind: Kind, colour: Colour | None, value: int | None, score: int) -> "Card":
+        return Card(kind, colour, CARD_KINDS[kind].action_name.format(value=value), score, value)
+
+    # Card behaviours, run at the start of the next turn with the game the card was played in
+
+    def apply(self, game):
+        """Runs the behaviour of the card."""
+        self.BEHAVIOURS[self.kind](self, game)
+
+    def _number(self, game):
+        logger.debug("Behaviour of %s running", self.value)
+
+    def _skip(self, game):
+        logger.debug("Behaviour of skip running")
+        game.players.increment_turn()
+
+    def _reverse(self, game):
+        logger.debug("Behaviour of reverse running")
+        game.direction *= -1
+        game.players.increment_turn()
+        game.players.increment_turn()
+
+    def _draw(self, game):
+        logger.debug("Behaviour of draw %s running", self.value)
+        game.players.current_player.hand += game.deck.draw(self.value)
+        game.players.increment_turn()
+
+    def _wild(self, game):
+        logger.debug("Behaviour of wild running")
+
+    def _flip(self, game):
+        logger.debug("Behaviour of flip running")
+        game.deck.flip_over()
+
+    def _skip_everyone(self, game):
+        logger.debug("Behaviour of skip everyone running")
+        game.direction *= -1
+        game.players.increment_turn()
+        game.direction *= -1
+
+    def _wild_draw_colour(self, game):
+        logger.debug("Behaviour of wild draw colour running")
+        deck = game.deck
+        player_hand = game.players.current_player.hand
+        colour = deck.colour(deck.discard_pile[-1])
+
+        while True:
+            card_id = deck.pick_card()
+            player_hand.append(card_id)
+            if deck.colour(card_id) == colour:
+                break
+
+        game.players.increment_turn()
+
+    # The behaviour of each kind, indexed by Kind. Wild draw cards draw like draw cards
+    BEHAVIOURS = (_number, _skip, _reverse, _draw, _wild, _draw, _flip, _skip_everyone, _wild_draw_colour)
+
+    # Factories for each kind of card
+
     @staticmethod
     def number(colour: Colour, number: int):
-        def behaviour(game):
-            logger.debug(f"Behaviour of {number} running")
-        return Card(Type.NUMBER, colour, behaviour, str(number), score=number)
-    
+        return Card.make(Kind.NUMBER, colour, number)
+
     @staticmethod
     def skip(colour: Colour):
-        def behaviour(game):
-            logger.debug("Behaviour of skip running")
-            game.players.increment_turn()
-        return Card(Type.SKIP, colour, behaviour, "skip", score=20)
-    
+        return Card.make(Kind.SKIP, colour)
+
     @staticmethod
     def reverse(colour: Colour):
-        def behaviour(game):
-            logger.debug("Behaviour of reverse running")
-            game.direction *= -1
-            game.players.increment_turn()
-            game.players.increment_turn()
-        return Card(Type.REVERSE, colour, behaviour, "reverse", score=20)
-    
+        return Card.make(Kind.REVERSE, colour)
+
     @staticmethod
-    def draw(colour: Colour, number: int, *, score: int = 20):
-        def behaviour(game):
-            logger.debug(f"Behaviour of draw {number} running")
-            for _ in range(number):
-                player_hand = game.players.current_player.hand
-                player_hand.append(game.deck.pick_card())
-            game.players.increment_turn()
-        return Card(Type.DRAW, colour, behaviour, f"draw{number}", score=score)
-    
+    def draw(colour: Colour, number: int, *, score: int | None = None):
+        return Card.make(Kind.DRAW, colour, number, score=score)
+
     @staticmethod
     def wild():
-        def behaviour(game):
-            logger.debug("Behaviour of wild running")
-        return Card(Type.WILD, None, behaviour, "wild", score=40)
-    
+        return Card.make(Kind.WILD)
+
     @staticmethod
     def wild_draw(number: int):
-        def behaviour(game):
-            logger.debug("Behaviour of wild draw four running")
-            for _ in range(number):
-                player_hand = game.players.current_player.hand
-                player_hand.append(game.deck.pick_card())
-            game.players.increment_turn()
-        return Card(Type.WILD, None, behaviour, f"WildDraw{number}", score=50)
-    
+        return Card.make(Kind.WILD_DRAW, None, number)
+
     # UNO Flip cards
 
     @staticmethod
     def flip(colour: Colour):
-        def behaviour(game):
-            logger.debug("Behaviour of flip running")
-            game.deck.flip = 1 - game.deck.flip 
-            game.deck.discard_pile = game.deck.discard_pile[::-1]
-        return Card(Type.WILD, colour, behaviour, "flip", score=20)
-    
+        return Card.make(Kind.FLIP, colour)
+
     @staticmethod
     def skip_everyone(colour: Colour):
-        def behaviour(game):
-            logger.debug("Behaviour of skip everyone running")
-            game.direction *= -1
-            game.players.increment_turn()
-            game.direction *= -1
-        return Card(Type.SKIP, colour, behaviour, "skip everyone", score=20)
-    
+        return Card.make(Kind.SKIP_EVERYONE, colour)
+
     @staticmethod
     def wild_draw_colour():
-        def behaviour(game):
-            logger.debug("Behaviour of wild draw colour running")
-            player_hand = game.players.current_player.hand
+        return Card.make(Kind.WILD_DRAW_COLOUR)
 
-            while True:
-                card = game.deck.pick_card()
-                player_hand.append(card)
-                if card.colour == game.deck.discard_pile[-1].colour:
-                    break
+class FlipCard:
+    """An immutable two sided card prototype.
 
-            game.players.increment_turn()
-        return Card(Type.WILD, None, behaviour, "wild draw colour", score=60)
+    Both faces are kept in one tuple indexed by the side that is face up,
+    so reading the face of a card is an index rather than a branch on the side.
 
-class FlipCard:
+    Attributes:
+        faces (tuple): The light side and the dark side of the card, indexed by `Deck.flip`.
+    """
+    __slots__ = ("faces",)
 
     def __init__(self, light_card: Card, dark_card: Card):
-        
-        self.light = light_card
-        self.dark = dark_card
-        self.deck = None
+        object.__setattr__(self, "faces", (light_card, dark_card))
 
-    def __str__(self):
-        return str(self.light) if self.deck.flip == 0 else str(self.dark)
-
-    @property
-    def score(self):
-        return self.light.score if self.deck.flip == 0 else self.dark.score
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} objects are immutable")
 
-    @property
-    def action_name(self):
-        return self.light.action_name if self.deck.flip == 0 else self.dark.action_name
+    def __str__(self):
+        return f"{self.light} / {self.dark}"
 
     @property
-    def colour(self):
-        return self.light.colour if self.deck.flip == 0 else self.dark.colour
-    
-    @property
-    def behaviour(self):
-        return self.light.behaviour if self.deck.flip == 0 else self.dark.behaviour
-    
-    @property
-    def type(self):
-        return self.light.type if self.deck.flip == 0 else self.dark.type
-
-    @colour.setter
-    def colour(self, colour):
-        if self.deck.flip == 0:
-            self.light.colour = colour
-        else:
-            self.dark.colour = colour
+    def light(self) -> Card:
+        """The light side of the card."""
+        return self.faces[0]
 
     @property
-    def __class__(self):
-        if self.deck.flip == 0:
-            return self.light.__class__
-        else:
-            return self.dark.__class__
-        
-    def is_playable(self, deck):
-        discard_pile = deck.discard_pile
-        if discard_pile:
-            discard = discard_pile[-1]
-            # if the discard is a wild card
-            if not discard.colour:
-                return True
-            return (self.colour == discard.colour or self.action_name == discard.action_name) or not self.colour
+    def dark(self) -> Card:
+        """The dark side of the card."""
+        return self.faces[1]
 
+    def side(self, flip: int) -> Card:
+        """Returns the face of the card for the given side: 0 for light side, 1 for dark side."""
+        return self.faces[flip]
@@ -2,61 +2,275 @@
 
 This module contains the Deck class, representing a deck of cards used in a game.
 The Deck class manages the cards, deals hands, and handles discards for the specified game.
+
+Cards are shared, immutable prototypes from `cards.CARD_LISTS`. A deck only holds integer card IDs,
+which are indexes into its card list, and keeps the per game state of the cards, such as the colours
+chosen for wild cards.
 """
 
-from random import choice
+from collections import deque
+from random import Random
+from typing import Iterable, Iterator
+
+from cards import Card, FlipCard, Colour
+from game_logic.playability import FaceTable, face_table, hand_playability
+
+class DiscardPile:
+    """The discard pile, a stack of card IDs that can be turned over in constant time.
+
+    Turning the pile over only changes which end of the underlying deque is the top,
+    so flipping the deck doesn't copy the pile. Indexing and iterating follow the current
+    order, with the top card last, as if the pile were a list.
+
+    Attributes:
+        reversed (bool): Whether the pile has been turned over an odd number of times.
+    """
+    __slots__ = ("_cards", "reversed")
+
+    def __init__(self, cards: Iterable[int] = ()):
+        self._cards = deque(cards)
+        self.reversed = False
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __iter__(self) -> Iterator[int]:
+        return reversed(self._cards) if self.reversed else iter(self._cards)
+
+    def __getitem__(self, index: int) -> int:
+        return self._cards[-1 - index if self.reversed else index]
+
+    def __iadd__(self, cards: Iterable[int]) -> "DiscardPile":
+        self.extend(cards)
+        return self
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"DiscardPile({list(self)})"
+
+    def append(self, card_id: int) -> None:
+        """Puts a card on top of the pile."""
+        if self.reversed:
+            self._cards.appendleft(card_id)
+        else:
+            self._cards.append(card_id)
+
+    def extend(self, cards: Iterable[int]) -> None:
+        """Puts cards on top of the pile in order."""
+        if self.reversed:
+            self._cards.extendleft(cards)
+        else:
+            self._cards.extend(cards)
+
+    def pop(self) -> int:
+        """Takes the top card off the pile."""
+        return self._cards.popleft() if self.reversed else self._cards.pop()
+
+    def turn_over(self) -> None:
+        """Turns the pile over, so the bottom card is on top."""
+        self.reversed = not self.reversed
 
-from cards import Card, FlipCard, build_uno_cards
 
 class Deck:
     """Represents a deck of cards used in a game.
 
+    The draw pile is kept shuffled, with the top of the pile at the end of the list,
+    so picking a card is a single pop rather than a random choice and removal.
+
     Attributes:
-        game (str): The name of the game this deck belongs to.
+        rng (Random): The random number generator of the game the deck belongs to.
         flip (int): Indicates the current side of the card: 0 for light side, 1 for dark side. only used in uno flip
-        discard (list): A list to store discarded cards.
-        cards (list): A list of cards in the deck.
+        card_list (tuple): The card prototypes used by this deck, indexed by card ID.
+        discard_pile (DiscardPile): The discarded card IDs, the last card is the top of the pile.
+        cards (list): A list of card IDs in the deck, the last card is the top of the draw pile.
+        wild_colours (tuple): The colours chosen for wild cards, one dict of card ID to Colour per side.
+        reshuffles (int): The number of times the discard pile has been shuffled back into the draw pile.
 
     Methods:
-        __init__(game): Initializes the Deck object for the specified game.
-        deal_hand(): Deals a hand of 7 cards from the deck.
-        place_card(card): Places a card onto the discard pile.
+        __init__(rng): Initializes an empty Deck.
+        reset(card_list): Fills and shuffles the deck with every card in a card list.
+        shuffle(): Shuffles the draw pile.
+        deal(cards): Deals a hand of cards from the deck.
         pick_card(): Picks a card from the deck, reshuffling if necessary.
+        draw(number): Picks a number of cards from the deck at once.
+        return_cards(cards): Puts cards back into the draw pile.
+        flip_over(): Turns the deck over to the other side.
+        face(card_id): The face up side of a card.
+        colour(card_id): The colour of a card, including the colour chosen for a wild card.
+        set_colour(card_id, colour): Sets the colour chosen for a wild card.
+        playable_mask(): A bitmask of the IDs of the cards that can be played on the discard pile.
+        is_playable(card_id): Checks if a card can be played on the discard pile.
+        playable(hand): Checks which cards in a hand can be played on the discard pile.
     """
 
-    def __init__(self):
-        """Initialize the Deck.
+    def __init__(self, rng: Random | None = None):
+        """Initialize an empty Deck.
 
         Args:
-            game (str): The name of the game.
+            rng (Random | None): The random number generator used to shuffle the deck.
         """
+        self.rng = rng or Random()
         self.flip = 0
-        self.discard_pile = []
-        self.cards = []
+        self.card_list: tuple[Card | FlipCard, ...] = ()
+        self.discard_pile = DiscardPile()
+        self.cards: list[int] = []
+        self.wild_colours: tuple[dict[int, Colour], dict[int, Colour]] = ({}, {})
+        self.reshuffles = 0
+
+    def reset(self, card_list: tuple[Card | FlipCard, ...]) -> None:
+        """Fill the deck with every card in a card list and shuffle it.
 
-    def deal(self, cards: int = 7) -> list[Card | FlipCard]:
+        Args:
+            card_list (tuple): The card prototypes to use, from `cards.CARD_LISTS`.
+        """
+        self.flip = 0
+        self.card_list = card_list
+        self.discard_pile = DiscardPile()
+        self.cards = list(range(len(card_list)))
+        self.wild_colours = ({}, {})
+        self.reshuffles = 0
+        self.shuffle()
+
+    def shuffle(self) -> None:
+        """Shuffle the draw pile in place."""
+        self.rng.shuffle(self.cards)
+
+    def deal(self, cards: int = 7) -> list[int]:
         """Deal a hand of 7 cards from the deck.
 
         Returns:
-            list: A list of cards representing the hand dealt.
+            list: A list of card IDs representing the hand dealt.
         """
-        hand = [self.pick_card() for _ in range(cards)]
-        return hand
+        return self.draw(cards)
 
-    def pick_card(self) -> Card | FlipCard:
+    def pick_card(self) -> int:
         """Pick a card from the deck, reshuffling if necessary.
 
         Returns:
-            Card | FlipCard: The card picked from the deck as an object.
+            int: The ID of the card picked from the deck.
         """
-        # Check if the deck is empty
         if not self.cards:
-            # Moves cards from discard pile to the deck, except the last card
-            # TODO: reset wild card colours
-            self.cards = self.discard_pile[:-1]
-            self.discard_pile = [self.discard_pile[-1]]
-
-        # Pick a random card from the deck
-        card = choice(self.cards)
-        self.cards.remove(card)
-        return card
+            self.recycle_discard_pile()
+        return self.cards.pop()
+
+    def draw(self, number: int) -> list[int]:
+        """Pick a number of cards from the deck, reshuffling if necessary.
+
+        Args:
+            number (int): The number of cards to pick.
+
+        Returns:
+            list: The IDs of the cards picked from the deck, in the order they were drawn.
+        """
+        drawn = []
+        while number > 0:
+            if not self.cards:
+                self.recycle_discard_pile()
+            # Take as many cards as possible from the top of the pile in one slice
+            count = min(number, len(self.cards))
+            drawn += reversed(self.cards[-count:])
+            del self.cards[-count:]
+            number -= count
+        return drawn
+
+    def recycle_discard_pile(self) -> None:
+        """Move every card from the discard pile into the draw pile, except the top card.
+
+        The lists are swapped rather than copied and the new draw pile is shuffled once.
+        The colours chosen for the recycled wild cards are cleared.
+
+        Raises:
+            IndexError: If there are no cards left to recycle
+        """
+        if len(self.discard_pile) < 2:
+            raise IndexError("There are no cards left to draw")
+        top_card = self.discard_pile.pop()
+        self.cards, self.discard_pile = list(self.discard_pile), DiscardPile((top_card,))
+        self.wild_colours = tuple(
+            {top_card: colours[top_card]} if top_card in colours else {} for colours in self.wild_colours)
+        self.reshuffles += 1
+        self.shuffle()
+
+    def return_cards(self, cards: list[int]) -> None:
+        """Put cards back into the draw pile, for example when a player leaves.
+
+        Args:
+            cards (list): The IDs of the cards to put back.
+        """
+        self.cards += cards
+        self.shuffle()
+
+    def flip_over(self) -> None:
+        """Turns the deck over to the other side, the discard pile is turned over without copying it."""
+        self.flip = 1 - self.flip
+        self.discard_pile.turn_over()
+
+    def face(self, card_id: int) -> Card:
+        """Returns the face up side of a card.
+
+        Args:
+            card_id (int): The ID of the card.
+        """
+        return self.card_list[card_id].faces[self.flip]
+
+    def colour(self, card_id: int) -> Colour | None:
+        """Returns the colour of the face up side of a card.
+
+        Args:
+            card_id (int): The ID of the card.
+
+        Returns:
+            Colour | None: The colour of the card, the chosen colour for a played wild card,
+            or None for a wild card that has not been played.
+        """
+        return self.face(card_id).colour or self.wild_colours[self.flip].get(card_id)
+
+    def set_colour(self, card_id: int, colour: Colour) -> None:
+        """Sets the colour chosen for the face up side of a wild card.
+
+        Args:
+            card_id (int): The ID of the card.
+            colour (Colour): The chosen colour.
+        """
+        self.wild_colours[self.flip][card_id] = colour
+
+    @property
+    def faces(self) -> FaceTable:
+        """The encoded faces of the deck's card list, shared with every other deck using it."""
+        return face_table(self.card_list)
+
+    def playable_mask(self) -> int:
+        """Returns a bitmask of the IDs of the cards that can be played on top of the discard pile.
+
+        Bit n is set if the card with ID n can be played, so a card is checked with `mask >> card_id & 1`.
+        """
+        if not self.discard_pile:
+            return 0
+        top_card = self.discard_pile[-1]
+        return self.faces.playable_mask(self.flip, self.colour(top_card), self.face(top_card).action_name)
+
+    def is_playable(self, card_id: int) -> bool:
+        """Checks if a card can be played on top of the discard pile.
+
+        Args:
+            card_id (int): The ID of the card.
+        """
+        return self.playable_mask() >> card_id & 1 == 1
+
+    def playable(self, hand: list[int]) -> list[bool]:
+        """Checks which cards in a hand can be played on top of the discard pile, in one batch.
+
+        Args:
+            hand (list): The IDs of the cards in the hand.
+
+        Returns:
+            list: True for each card in the hand that can be played, in the same order as the hand.
+        """
+        if not self.discard_pile:
+            return [False] * len(hand)
+        top_card = self.discard_pile[-1]
+        colour, action_name = self.colour(top_card), self.face(top_card).action_name
+        mask = self.faces.playable_mask(self.flip, colour, action_name)
+        return hand_playability(self.faces, self.flip, colour, action_name, mask, hand)
@@ -1,10 +1,14 @@
 """This module defines the classes for a game and player in the UNO API."""
 
+import time
 from enum import Enum
-from random import randint
+from random import Random
+from secrets import randbits
 
-from cards import Type, Colour, build_uno_cards, build_flip_cards
+from cards import Type, Colour, CARD_LISTS
 from utils.custom_logger import CustomLogger
+from utils.serialisation import dumps
+from utils.sharding import new_game_id
 
 from .deck import Deck
 from .players import Players
@@ -25,7 +29,7 @@ class GameState(Enum):
 
 class Game:
 
-    def __init__(self) -> None:
+    def __init__(self, seed: int | None = None, game_id: int | None = None) -> None:
         """Initialises a game of UNO.
 
         This is the default game configuration, but the user can change the settings when the game starts
@@ -39,11 +43,21 @@ class Game:
         - name: The name of the game.
 
         Game State:
-        - game_id: The unique ID of the game.
+        - game_id: The unique ID of the game, in the shard of this worker process, see `utils.sharding`.
+          The API allocates it with `utils.game_ids`, a random ID is used if it isn't given.
         - deck: The deck of cards.
         - players: The players in the game.
         - state: The current state of the game.
         - prerequisite_func: The function to be executed before each turn.
+        - version: Incremented every time the game state changes, used to cache game state snapshots.
+        - updated: The `time.monotonic` time of the last change to the game state, used to expire idle games.
+        - seed: The seed of the game's random number generator, a random seed is used if it isn't given.
+        - rng: The game's own random number generator, used for everything random during the game.
+        - actions: Every accepted action, so the game can be replayed from its seed, see `game_logic.replay`.
+
+        Args:
+            seed (int | None): The seed for the game's random number generator.
+            game_id (int | None): The ID of the game.
         """
         # Inital Game settings
         self.direction = 1
@@ -52,14 +66,44 @@ class Game:
         self.name = "UNO"
 
         # Game state
-        self.game_id = randint(100000, 999999)
-        self.deck = Deck()
+        self.game_id = game_id if game_id is not None else new_game_id()
+        self.seed = seed if seed is not None else randbits(64)
+        self.rng = Random(self.seed)
+        self.actions: list[tuple] = []
+        self.deck = Deck(self.rng)
         self.players = Players(self)
         self.state = GameState.LOBBY
         self.prerequisite_func = lambda self: logger.debug(
-            f"Running default prerequisite_func for game {self.game_id}")
-        
-        logger.info(f"Created game: {self.game_id}")
+            "Running default prerequisite_func for game %s", self.game_id)
+        self.version = 0
+        self.updated = time.monotonic()
+
+        # Cached public part of the game state: (version, public state, host ID, current player ID)
+        self._public_state = None
+        # Cached JSON of the public game state without its closing brace: (version, JSON)
+        self._public_json = None
+        # Cached JSON of each player's ID and name, by player ID
+        self._player_json = {}
+
+        logger.info("Created game: %s with seed %s", self.game_id, self.seed)
+
+    def state_changed(self) -> None:
+        """Marks the game state as changed, invalidating the cached public game state.
+
+        This must be called after anything that changes what `get_game_state` returns.
+        """
+        self.version += 1
+        self.updated = time.monotonic()
+
+    def record_action(self, *action) -> None:
+        """Records an accepted action so the game can be replayed.
+
+        Players are recorded by their seat, as player IDs are not reproducible.
+
+        Args:
+            action: The name of the action followed by its arguments.
+        """
+        self.actions.append(action)
 
     def start_game(self, player_id: str):
         """Starts the game.
@@ -69,18 +113,17 @@ class Game:
         Args:
             player_id (str): The ID of the player who is trying to start the game.
         """
-        logger.info(f"Starting game {self.game_id}")
+        logger.info("Starting game %s", self.game_id)
 
-        if self.state == GameState.LOBBY and list(self.players.keys())[0] == player_id and len(self.players) >= 2:
+        if self.state == GameState.LOBBY and self.players.host_id == player_id and len(self.players) >= 2:
             # Set the game state to GAME and select a random player to start
             self.state = GameState.GAME
-            self.players.current_player_index = randint(0, len(self.players)-1)
+            self.record_action("start_game", self.game_mode, self.hand_size)
+            self.players.current_player_index = self.rng.randint(0, len(self.players)-1)
 
-            # Build the deck of cards
-            # TODO: do this better
+            # Fill the deck with the shared cards for the game mode
             # TODO: also deal with cases where the deck runs out of cards
-            self.deck.flip = 0
-            self.deck.cards = {"uno": build_uno_cards, "flip": build_flip_cards}[self.game_mode](self.deck)
+            self.deck.reset(CARD_LISTS[self.game_mode])
 
             # Deal hands to players
             for player in self.players.values():
@@ -88,12 +131,14 @@ class Game:
 
             # Pick a card from the deck to start the discard pile
             while True:
-                card = self.deck.pick_card()
-                self.deck.discard_pile.append(card)
+                card_id = self.deck.pick_card()
+                self.deck.discard_pile.append(card_id)
+                card = self.deck.face(card_id)
                 if card.type == Type.NUMBER:
-                    logger.debug(f"Start card {card.colour} {card.action_name}")
+                    logger.debug("Start card %s %s", card.colour, card.action_name)
                     break
 
+            self.state_changed()
             return True
 
     def pick_card(self, player_id) -> bool:
@@ -103,10 +148,12 @@ class Game:
             player_id (str): The ID of the player who is picking a card.
         """
         if player_id == self.players.current_player_id:
-            logger.debug(f"Selecting card for {player_id}")
+            logger.debug("Selecting card for %s", player_id)
+            self.record_action("pick_card", self.players.current_player_index)
             # Pick a card from the deck and add it to the player's hand
             self.players[player_id].hand.append(self.deck.pick_card())
             self.end_turn()
+            self.state_changed()
             return True
 
     def play_card(self, player_id: str, card_index: int, wild_colour: str) -> bool:
@@ -118,24 +165,30 @@ class Game:
             wild_colour (str): The colour chosen for a wild card.
         """
         player = self.players[player_id]
-        card = player.hand[card_index]
+        # A negative index would play a card counted from the end of the hand, and can't be recorded
+        if not 0 <= card_index < len(player.hand):
+            return
+        card_id = player.hand[card_index]
+        card = self.deck.face(card_id)
 
-        if card.is_playable(self.deck) and player_id == self.players.current_player_id:
+        if self.deck.is_playable(card_id) and player_id == self.players.current_player_id:
             # Check if the card is a wild card and set the colour
             if not card.colour:
                 if wild_colour in [colour.value for colour in Colour.colours(self.deck)]:
-                    card.colour = Colour[wild_colour.upper()]
+                    self.deck.set_colour(card_id, Colour[wild_colour.upper()])
                 else:
                     return
 
             logger.debug(
-                f"Playing card {card_index} for player {player_id} in game {self.game_id}")
+                "Playing card %s for player %s in game %s", card_index, player_id, self.game_id)
+            self.record_action("play_card", self.players.current_player_index, card_index, wild_colour)
 
             # Remove the card from the player hand and add it to the discard pile
-            self.players[player_id].hand.remove(card)
-            self.deck.discard_pile.append(card)
-            self.prerequisite_func = card.behaviour
+            del player.hand[card_index]
+            self.deck.discard_pile.append(card_id)
+            self.prerequisite_func = card.apply
             self.end_turn()
+            self.state_changed()
             return True
 
     def end_turn(self):
@@ -148,18 +201,18 @@ class Game:
 
         # Check if the current player has an empty hand/has won the game
         if len(player.hand) == 0:
-            logger.info(f"Game({self.game_id}) won by {self.players.current_player_id}")
+            logger.info("Game(%s) won by %s", self.game_id, self.players.current_player_id)
 
             # Update player scores based on remaining cards in hands
             for player_id, opponent in self.players.items():
-                for card in opponent.hand:
-                    player.score += card.score
+                for card_id in opponent.hand:
+                    player.score += self.deck.face(card_id).score
 
             self.state = GameState.GAME_OVER
             return
 
         # Log the end of the turn and increment to the next player
-        logger.debug(f"Ending {self.players.current_player_id}'s turn")
+        logger.debug("Ending %s's turn", self.players.current_player_id)
         self.players.increment_turn()
 
         # START OF NEXT TURN
@@ -167,54 +220,136 @@ class Game:
         # Execute prerequisite_func after incrementing the turn, then reset it
         self.prerequisite_func(self)
         self.prerequisite_func = lambda self: logger.debug(
-            f"Running default prerequisite_func for game {self.game_id}")
+            "Running default prerequisite_func for game %s", self.game_id)
 
-    def get_game_state(self, player_id: str) -> dict:
-        """Returns the current state of the game for a given player,
-        from their 'view' of the game only showing the back of other players cards
+    def get_public_state(self) -> tuple[dict, str, str]:
+        """Returns the part of the game state that is the same for every player.
 
-        Args:
-            player_id (str): The ID of the player to get the game state for.
+        It is built once per state version and shared by every player's game state.
 
         Returns:
-            dict: A dict containing the game state for the player that requested it,
-            this data changes depending one the game state.
+            tuple: The public game state, the ID of the host and the ID of the current player.
         """
-        player = self.players[player_id]
-        player_names = [player.name for player in self.players.values()]
+        if self._public_state and self._public_state[0] == self.version:
+            return self._public_state[1:]
 
-        player_hand = [
-            {
-                "colour": card.colour.value if card.colour else None,
-                "action": card.action_name,
-                "isPlayable": card.is_playable(self.deck) and player_id == self.players.current_player_id
-            }
-            for card in player.hand
-        ]
+        current_player_id = self.players.current_player_id
 
         # if the discard pile is empty then the discard is None
-        if discard := self.deck.discard_pile[-1] if self.deck.discard_pile else None:
+        if self.deck.discard_pile:
+            discard_id = self.deck.discard_pile[-1]
             discard = {
                 # Wild cards with the colour None can appear
-                "colour": discard.colour.value if discard.colour else None,
-                "action": discard.action_name,
+                "colour": colour.value if (colour := self.deck.colour(discard_id)) else None,
+                "action": self.deck.face(discard_id).action_name,
             }
         else:
             discard = {"colour": None, "action": None}
 
-        return {
+        public_state = {
             "type": self.state.value,
+            "version": self.version,
             "name": self.name,
             "gameId": self.game_id,
             "discard": discard,
-            "currentPlayerName": self.players.current_player.name,
-            "playerNames": player_names,
+            "currentPlayerName": self.players[current_player_id].name,
+            "playerNames": [player.name for player in self.players.values()],
             "wildColours": [colour.value for colour in Colour.colours(self.deck)],
+        }
+        self._public_state = (self.version, public_state, self.players.host_id, current_player_id)
+        return self._public_state[1:]
+
+    def get_hand_view(self, player_id: str, is_turn: bool) -> list[dict]:
+        """Returns the view of a player's hand.
+
+        The view is cached on the player and only rebuilt when their hand, the top of the discard pile
+        or whether it is their turn changes.
+
+        Args:
+            player_id (str): The ID of the player.
+            is_turn (bool): Whether it is the player's turn, cards are only playable on their turn.
+
+        Returns:
+            list: A dict for every card in the hand, with its colour, action and if it can be played.
+        """
+        player = self.players[player_id]
+        discard_id = self.deck.discard_pile[-1] if self.deck.discard_pile else None
+        key = (tuple(player.hand), discard_id, self.deck.flip,
+               self.deck.colour(discard_id) if discard_id is not None else None, is_turn)
 
+        if player.hand_view and player.hand_view[0] == key:
+            return player.hand_view[1]
+
+        playable = self.deck.playable(player.hand) if is_turn else [False] * len(player.hand)
+        hand_view = [
+            {
+                "colour": card.colour.value if (card := self.deck.face(card_id)).colour else None,
+                "action": card.action_name,
+                "isPlayable": is_playable
+            }
+            for card_id, is_playable in zip(player.hand, playable)
+        ]
+        # The JSON of the hand view is only encoded when it is needed, see `get_game_state_json`
+        player.hand_view = [key, hand_view, None]
+        return hand_view
+
+    def get_game_state(self, player_id: str) -> dict:
+        """Returns the current state of the game for a given player,
+        from their 'view' of the game only showing the back of other players cards
+
+        The public part of the state and the player's hand view are cached,
+        so building the state for every player in a game only does the full work once.
+        The returned dict must not be modified.
+
+        Args:
+            player_id (str): The ID of the player to get the game state for.
+
+        Returns:
+            dict: A dict containing the game state for the player that requested it,
+            this data changes depending one the game state.
+        """
+        player = self.players[player_id]
+        public_state, host_id, current_player_id = self.get_public_state()
+        is_turn = player_id == current_player_id
+
+        return {
+            **public_state,
             "playerId": player_id,
-            "playerName": self.players[player_id].name,
-            "playerHand": player_hand,
-            "isHost": list(self.players.keys())[0] == player_id,
-            "isTurn": player_id == self.players.current_player_id,
+            "playerName": player.name,
+            "playerHand": self.get_hand_view(player_id, is_turn),
+            "isHost": host_id == player_id,
+            "isTurn": is_turn,
             "score": player.score,
         }
+
+    def get_game_state_json(self, player_id: str) -> str:
+        """Returns the game state for a given player encoded as JSON.
+
+        The public part of the state is encoded once per state version and the player's hand
+        once per hand view, then the player's own fields are spliced in between them.
+        It has the same content as `get_game_state`.
+
+        Args:
+            player_id (str): The ID of the player to get the game state for.
+
+        Returns:
+            str: The game state as a JSON string.
+        """
+        player = self.players[player_id]
+        public_state, host_id, current_player_id = self.get_public_state()
+        is_turn = player_id == current_player_id
+
+        if not self._public_json or self._public_json[0] != self.version:
+            self._public_json = (self.version, dumps(public_state)[:-1])
+
+        self.get_hand_view(player_id, is_turn)
+        if player.hand_view[2] is None:
+            player.hand_view[2] = dumps(player.hand_view[1])
+
+        if (player_json := self._player_json.get(player_id)) is None:
+            player_json = self._player_json[player_id] = f'"playerId":{dumps(player_id)},"playerName":{dumps(player.name)}'
+
+        # The rest of the player's fields are plain numbers and booleans
+        return (f'{self._public_json[1]},{player_json},'
+                f'"playerHand":{player.hand_view[2]},"isHost":{"true" if host_id == player_id else "false"},'
+                f'"isTurn":{"true" if is_turn else "false"},"score":{player.score:d}}}')
@@ -0,0 +1,143 @@
+"""Batched evaluation of which cards can be played on the discard pile.
+
+A card can be played if the discard pile's colour has not been chosen yet, or if the card has the same colour
+or action as the top of the discard pile, or if it is a wild card. Rather than checking every card's face,
+each card list is encoded once into tables of the faces on each side:
+
+- bitmasks of the card IDs with each colour, each action and of the wild cards, so the set of every
+  playable card ID is a single integer, the OR of three masks, and checking a card is a shift and an AND.
+- when NumPy is installed, arrays of each card's colour code and action code, so large hands,
+  for example after a chain of Wild Draw Colour cards, are checked in one vectorised comparison.
+
+The tables only depend on the card list, so they are built once and shared by every deck using it.
+
+Classes:
+    FaceTable: The encoded faces of the cards in a card list.
+
+Functions:
+    face_table: Returns the shared FaceTable of a card list.
+    hand_playability: Returns whether each card in a hand can be played, given the set of playable card IDs.
+"""
+
+from cards import Card, FlipCard, Colour
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Hands at least this big are checked with NumPy when it is installed, smaller hands are faster with bitmasks
+NUMPY_MIN_HAND = 32
+
+COLOUR_CODES = {colour: code for code, colour in enumerate(Colour, 1)}
+
+
+class FaceTable:
+    """The encoded faces of the cards in a card list.
+
+    Each attribute is a tuple with an entry for each side, indexed by `Deck.flip`.
+
+    Attributes:
+        all_cards (int): A mask of every card ID
+        colour_masks (tuple): Dicts of Colour to a mask of the IDs of the cards with that colour
+        action_masks (tuple): Dicts of action name to a mask of the IDs of the cards with that action
+        wild_masks (tuple): Masks of the IDs of the wild cards, which have no colour
+        colour_codes (tuple | None): NumPy arrays of each card's colour code, 0 for wild cards
+        action_codes (tuple | None): NumPy arrays of each card's action code
+        action_indexes (tuple): Dicts of action name to action code
+    """
+
+    def __init__(self, card_list: tuple[Card | FlipCard, ...]):
+        self.all_cards = (1 << len(card_list)) - 1
+        sides = range(2) if card_list and isinstance(card_list[0], FlipCard) else range(1)
+        faces = [[card.side(flip) for card in card_list] for flip in sides]
+
+        colour_masks, action_masks, wild_masks, action_indexes = [], [], [], []
+        for side in faces:
+            colours: dict[Colour, int] = {}
+            actions: dict[str, int] = {}
+            wild = 0
+            for card_id, face in enumerate(side):
+                bit = 1 << card_id
+                if face.colour:
+                    colours[face.colour] = colours.get(face.colour, 0) | bit
+                else:
+                    wild |= bit
+                actions[face.action_name] = actions.get(face.action_name, 0) | bit
+            colour_masks.append(colours)
+            action_masks.append(actions)
+            wild_masks.append(wild)
+            action_indexes.append({action: code for code, action in enumerate(actions)})
+
+        # Cards without a second side show the same face whichever way up the deck is
+        if len(faces) == 1:
+            faces *= 2
+            for tables in (colour_masks, action_masks, wild_masks, action_indexes):
+                tables *= 2
+        self.colour_masks = tuple(colour_masks)
+        self.action_masks = tuple(action_masks)
+        self.wild_masks = tuple(wild_masks)
+        self.action_indexes = tuple(action_indexes)
+
+        self.colour_codes = self.action_codes = None
+        if numpy is not None:
+            self.colour_codes = tuple(
+                numpy.array([COLOUR_CODES.get(face.colour, 0) for face in side], dtype=numpy.uint8) for side in faces)
+            self.action_codes = tuple(
+                numpy.array([indexes[face.action_name] for face in side], dtype=numpy.uint16)
+                for side, indexes in zip(faces, self.action_indexes))
+
+    def playable_mask(self, flip: int, colour: Colour | None, action_name: str) -> int:
+        """Returns a mask of the IDs of the cards that can be played on a discard.
+
+        Args:
+            flip (int): The side that is face up
+            colour (Colour | None): The colour of the discard, None if a colour hasn't been chosen for it
+            action_name (str): The action of the discard
+        """
+        if not colour:
+            return self.all_cards
+        return (self.colour_masks[flip].get(colour, 0) | self.action_masks[flip].get(action_name, 0)
+                | self.wild_masks[flip])
+
+
+# Tables by the ID of their card list, the card lists are module level constants so their IDs are stable
+_face_tables: dict[int, tuple[tuple, FaceTable]] = {}
+
+
+def face_table(card_list: tuple[Card | FlipCard, ...]) -> FaceTable:
+    """Returns the shared FaceTable of a card list, building it the first time.
+
+    Args:
+        card_list (tuple): The card prototypes, from `cards.CARD_LISTS`
+    """
+    cached = _face_tables.get(id(card_list))
+    if cached is None or cached[0] is not card_list:
+        # The card list is kept with its table so its ID can't be reused by another object
+        cached = _face_tables[id(card_list)] = (card_list, FaceTable(card_list))
+    return cached[1]
+
+
+def hand_playability(table: FaceTable, flip: int, colour: Colour | None, action_name: str,
+                     mask: int, hand: list[int]) -> list[bool]:
+    """Returns whether each card in a hand can be played on a discard.
+
+    Args:
+        table (FaceTable): The face table of the deck's card list
+        flip (int): The side that is face up
+        colour (Colour | None): The colour of the discard
+        action_name (str): The action of the discard
+        mask (int): The mask of playable card IDs, from `FaceTable.playable_mask`
+        hand (list): The IDs of the cards in the hand
+
+    Returns:
+        list: True for each card in the hand that can be played
+    """
+    if table.colour_codes is not None and len(hand) >= NUMPY_MIN_HAND and colour:
+        card_ids = numpy.fromiter(hand, dtype=numpy.intp, count=len(hand))
+        colour_codes = table.colour_codes[flip][card_ids]
+        playable = (colour_codes == COLOUR_CODES[colour]) | (colour_codes == 0)
+        if (action_code := table.action_indexes[flip].get(action_name)) is not None:
+            playable |= table.action_codes[flip][card_ids] == action_code
+        return playable.tolist()
+    return [mask >> card_id & 1 == 1 for card_id in hand]
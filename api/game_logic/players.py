@@ -13,18 +13,20 @@ class Player:
     Attributes:
         name (str): The name of the player.
         game (Game): The game the player is in.
-        hand (list): A list of cards in the player's hand.
+        hand (list): A list of the IDs of the cards in the player's hand.
+        hand_view (list | None): The key, the cached view of the hand and its JSON, see `Game.get_hand_view`.
 
     Properties:
         score (int): The score of the player's hand.
     """
-    hand: Card | FlipCard = []
+    hand: list[int] = []
 
     def __init__(self, name, game):
         self.name = name
         self.id = str(uuid4())
         self.game = game
         self.score = 0
+        self.hand_view = None
 
     def assign_hand(self, hand_size):
         """Assigns a hand of cards to the player.
@@ -36,47 +38,81 @@ class Player:
 
 
 class Players:
+    """The players in a game, in seat order.
+
+    Attributes:
+        game (Game): The game the players are in.
+        players (dict): The players by player ID, in seat order.
+        seats (list): The player IDs in seat order.
+        seat_index (dict): The seat of each player by player ID.
+        current_player_index (int): The seat of the player whose turn it is.
+
+    Properties:
+        current_player_id (str): The ID of the player whose turn it is.
+        current_player (Player): The player whose turn it is.
+        host_id (str | None): The ID of the host, the player in the first seat.
+    """
 
     def __init__(self, game):
         self.game = game
         self.players = {}
+        self.seats: list[str] = []
+        self.seat_index: dict[str, int] = {}
         self.current_player_index = 0
 
     @property
     def current_player_id(self) -> str:
-        return list(self.players.keys())[self.current_player_index]
+        return self.seats[self.current_player_index]
 
     @property
     def current_player(self) -> Player:
-        return self.players[self.current_player_id]
+        return self.players[self.seats[self.current_player_index]]
+
+    @property
+    def host_id(self) -> str | None:
+        return self.seats[0] if self.seats else None
 
     def increment_turn(self) -> None:
         self.current_player_index = (
-            self.current_player_index + self.game.direction) % len(self.players)
+            self.current_player_index + self.game.direction) % len(self.seats)
 
     def add_player(self, player_name: str) -> str:
-        logger.info(f"Adding {player_name} to game {self.game.game_id}")
+        logger.info("Adding %s to game %s", player_name, self.game.game_id)
+        self.game.record_action("add_player", player_name)
         player = Player(player_name, self.game)
         self.players[player.id] = player
+        self.seat_index[player.id] = len(self.seats)
+        self.seats.append(player.id)
+        self.game.state_changed()
         return player.id
 
     def remove_player(self, player_id: str) -> None:
-        logger.info(f"Removing {player_id} from game {self.game.game_id}")
+        logger.info("Removing %s from game %s", player_id, self.game.game_id)
 
         player = self.players.get(player_id)
 
         if not player:
             return
 
-        if self.game.direction:
-            if list(self.players.keys()).index(player_id) < self.current_player_index:
-                self.current_player_index -= 1
-            if self.current_player_index >= len(self.players)-1:
-                self.current_player_index = 0
+        seat = self.seat_index.pop(player_id)
+        self.game.record_action("remove_player", seat)
+        del self.seats[seat]
+        # Shift the seats after the removed one down
+        for index in range(seat, len(self.seats)):
+            self.seat_index[self.seats[index]] = index
+
+        # Keep the turn with the same player, or if it was the removed player's turn,
+        # pass it to the next player in the direction of play
+        if seat < self.current_player_index or (seat == self.current_player_index and self.game.direction < 0):
+            self.current_player_index -= 1
+        self.current_player_index = self.current_player_index % len(self.seats) if self.seats else 0
 
         # TODO: RESET WILD CARDS COLOUR
-        self.game.deck.cards += player.hand
+        self.game.deck.return_cards(player.hand)
         del self.players[player_id]
+        # Drop the player's cached JSON, see `Game.get_game_state_json`
+        self.game._player_json.pop(player_id, None)
+        self.game.state_changed()
 
     # Allows the Players object to be used like a dictionary
     def __getitem__(self, player_id: str):
@@ -0,0 +1,46 @@
+"""Deterministic replay of recorded games.
+
+Every game owns a seeded random number generator and records each accepted action in `Game.actions`,
+so replaying the actions on a new game with the same seed reproduces it exactly.
+
+Functions:
+    replay_game: Replays a game from its seed and actions.
+"""
+
+from .game import Game
+
+
+def replay_game(seed: int, actions: list[tuple], until: int | None = None) -> Game:
+    """Replays a game from its seed and recorded actions.
+
+    Args:
+        seed (int): The seed of the recorded game, `Game.seed`.
+        actions (list): The recorded actions, `Game.actions`.
+        until (int | None): Only replay this many actions, to inspect the game part way through.
+
+    Returns:
+        Game: A new game in the same state as the recorded game.
+
+    Raises:
+        ValueError: If an action is not recognised.
+    """
+    game = Game(seed)
+
+    for name, *args in actions[:until]:
+        match name:
+            case "add_player":
+                game.players.add_player(*args)
+            case "remove_player":
+                game.players.remove_player(game.players.seats[args[0]])
+            case "start_game":
+                game.game_mode, game.hand_size = args
+                game.start_game(game.players.host_id)
+            case "pick_card":
+                game.pick_card(game.players.seats[args[0]])
+            case "play_card":
+                seat, card_index, wild_colour = args
+                game.play_card(game.players.seats[seat], card_index, wild_colour)
+            case _:
+                raise ValueError(f"Unknown action: {name}")
+
+    return game
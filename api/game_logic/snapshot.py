@@ -0,0 +1,271 @@
+"""Versioned binary snapshots of games.
+
+A snapshot holds everything needed to carry on a game after a restart: the settings, the state of the
+random number generator, the deck, the players with their IDs and hands, and the recorded actions.
+It is a little endian byte string starting with a fixed header:
+
+    magic            4s      b"UNOG"
+    format_version   uint16  FORMAT_VERSION, or 1 for snapshots without `updated`, other versions are rejected
+    game_id          uint64
+    seed             uint64
+    version          uint32  The game state version, see `Game.state_changed`
+    direction        int8
+    hand_size        uint8
+    state            uint8   The index of the state in GameState
+    game_mode        uint8   The index of the game mode in GAME_MODES
+    flip             uint8
+    current_player   uint16  The seat of the current player
+    reshuffles       uint32
+    updated          float64 The Unix time of the last change to the game, not in version 1 snapshots
+
+followed by the game's name, the generator state, the draw pile, the discard pile, the wild colours,
+the players and the actions, each length prefixed.
+
+`Game.updated` is a `time.monotonic` time, which means nothing after a restart, so it is stored as a Unix time
+and converted back when the game is loaded, so idle games still expire on time. Version 1 snapshots don't have
+it, and their games are loaded as if they had just changed.
+
+The pending `prerequisite_func` is not stored, it is only ever set to a card's behaviour while that card
+is being played, so between actions it is always the default.
+
+Functions:
+    dump_game: Encodes a game as a snapshot.
+    load_game: Decodes a snapshot into a new game.
+    unix_time: Converts a `time.monotonic` time to a Unix time.
+    monotonic_time: Converts a Unix time to a `time.monotonic` time.
+"""
+
+import struct
+import time
+
+from cards import Colour, CARD_LISTS, DECK_NAMES
+
+from .deck import DiscardPile
+from .game import Game, GameState
+from .players import Player
+
+MAGIC = b"UNOG"
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct("<4sHQQIbBBBBHI")
+UPDATED = struct.Struct("<d")
+COUNT = struct.Struct("<I")
+WILD_COLOUR = struct.Struct("<HB")
+PLAYER = struct.Struct("<I")
+PLAY_CARD = struct.Struct("<BH")
+
+# Length of a string that is None
+NONE_LENGTH = 0xFFFF
+# The generator state is 624 words and the position, see `random.Random.getstate`
+RNG_STATE = struct.Struct("<625IBd")
+
+GAME_MODES = DECK_NAMES
+GAME_STATES = list(GameState)
+COLOURS = list(Colour)
+
+ACTIONS = {
+    "add_player": 1,
+    "remove_player": 2,
+    "start_game": 3,
+    "pick_card": 4,
+    "play_card": 5,
+}
+ACTION_NAMES = {code: name for name, code in ACTIONS.items()}
+
+
+class _Writer:
+    """Appends little endian values to a buffer."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def pack(self, packer: struct.Struct, *values) -> None:
+        self.data += packer.pack(*values)
+
+    def string(self, value: str | None) -> None:
+        if value is None:
+            self.data += struct.pack("<H", NONE_LENGTH)
+            return
+        encoded = value.encode("utf-8")
+        self.data += struct.pack("<H", len(encoded))
+        self.data += encoded
+
+    def card_ids(self, card_ids: list[int]) -> None:
+        self.data += COUNT.pack(len(card_ids))
+        self.data += struct.pack(f"<{len(card_ids)}H", *card_ids)
+
+
+class _Reader:
+    """Reads little endian values from a buffer in order."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, packer: struct.Struct) -> tuple:
+        values = packer.unpack_from(self.data, self.offset)
+        self.offset += packer.size
+        return values
+
+    def string(self) -> str | None:
+        length, = struct.unpack_from("<H", self.data, self.offset)
+        self.offset += 2
+        if length == NONE_LENGTH:
+            return None
+        value = bytes(self.data[self.offset:self.offset + length]).decode("utf-8")
+        self.offset += length
+        return value
+
+    def card_ids(self) -> list[int]:
+        count, = self.unpack(COUNT)
+        card_ids = list(struct.unpack_from(f"<{count}H", self.data, self.offset))
+        self.offset += count * 2
+        return card_ids
+
+
+def unix_time(monotonic: float) -> float:
+    """Converts a `time.monotonic` time, such as `Game.updated`, to a Unix time."""
+    return time.time() - (time.monotonic() - monotonic)
+
+
+def monotonic_time(unix: float) -> float:
+    """Converts a Unix time to a `time.monotonic` time, a time in the future is treated as now."""
+    return time.monotonic() - max(time.time() - unix, 0.0)
+
+
+def dump_game(game: Game) -> bytes:
+    """Encodes a game as a snapshot.
+
+    Args:
+        game (Game): The game to encode.
+
+    Returns:
+        bytes: The snapshot of the game.
+    """
+    deck = game.deck
+    players = game.players
+    writer = _Writer()
+
+    writer.pack(HEADER, MAGIC, FORMAT_VERSION, game.game_id, game.seed, game.version, game.direction,
+                game.hand_size, GAME_STATES.index(game.state), GAME_MODES.index(game.game_mode), deck.flip,
+                players.current_player_index, deck.reshuffles)
+    writer.pack(UPDATED, unix_time(game.updated))
+    writer.string(game.name)
+
+    _, rng_state, gauss_next = game.rng.getstate()
+    writer.pack(RNG_STATE, *rng_state, gauss_next is not None, gauss_next or 0.0)
+
+    writer.card_ids(deck.cards)
+    writer.card_ids(deck.discard_pile)
+    for colours in deck.wild_colours:
+        writer.pack(COUNT, len(colours))
+        for card_id, colour in colours.items():
+            writer.pack(WILD_COLOUR, card_id, COLOURS.index(colour))
+
+    writer.pack(COUNT, len(players))
+    for player in players.values():
+        writer.string(player.id)
+        writer.string(player.name)
+        writer.pack(PLAYER, player.score)
+        writer.card_ids(player.hand)
+
+    writer.pack(COUNT, len(game.actions))
+    for name, *args in game.actions:
+        writer.data.append(ACTIONS[name])
+        match name:
+            case "add_player":
+                writer.string(args[0])
+            case "remove_player" | "pick_card":
+                writer.data.append(args[0])
+            case "start_game":
+                writer.data += bytes((GAME_MODES.index(args[0]), args[1]))
+            case "play_card":
+                writer.pack(PLAY_CARD, args[0], args[1])
+                # Only the colour of a wild card matters, anything else sent by the client is dropped
+                writer.string(args[2] if isinstance(args[2], str) else None)
+
+    return bytes(writer.data)
+
+
+def load_game(data: bytes) -> Game:
+    """Decodes a snapshot into a new game.
+
+    Args:
+        data (bytes): The snapshot, from `dump_game`.
+
+    Returns:
+        Game: The game, in the same state as when it was snapshotted.
+
+    Raises:
+        ValueError: If the data is not a snapshot or has an unsupported format version.
+    """
+    reader = _Reader(memoryview(data))
+    try:
+        (magic, format_version, game_id, seed, version, direction, hand_size, state, game_mode, flip,
+         current_player_index, reshuffles) = reader.unpack(HEADER)
+    except struct.error as e:
+        raise ValueError("The data is too short to be a game snapshot") from e
+    if magic != MAGIC:
+        raise ValueError("The data is not a game snapshot")
+    if format_version not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported game snapshot format version: {format_version}")
+    updated = reader.unpack(UPDATED)[0] if format_version >= 2 else None
+
+    game = Game(seed)
+    game.game_id = game_id
+    game.version = version
+    game.direction = direction
+    game.hand_size = hand_size
+    game.state = GAME_STATES[state]
+    game.game_mode = GAME_MODES[game_mode]
+    if updated is not None:
+        game.updated = monotonic_time(updated)
+    game.name = reader.string()
+
+    *rng_state, has_gauss, gauss_next = reader.unpack(RNG_STATE)
+    game.rng.setstate((3, tuple(rng_state), gauss_next if has_gauss else None))
+
+    deck = game.deck
+    if game.state != GameState.LOBBY:
+        deck.card_list = CARD_LISTS[game.game_mode]
+    deck.flip = flip
+    deck.reshuffles = reshuffles
+    deck.cards = reader.card_ids()
+    deck.discard_pile = DiscardPile(reader.card_ids())
+    for colours in deck.wild_colours:
+        count, = reader.unpack(COUNT)
+        for _ in range(count):
+            card_id, colour = reader.unpack(WILD_COLOUR)
+            colours[card_id] = COLOURS[colour]
+
+    players = game.players
+    count, = reader.unpack(COUNT)
+    for seat in range(count):
+        player_id = reader.string()
+        player = Player(reader.string(), game)
+        player.id = player_id
+        player.score, = reader.unpack(PLAYER)
+        player.hand = reader.card_ids()
+        players.players[player_id] = player
+        players.seat_index[player_id] = seat
+        players.seats.append(player_id)
+    players.current_player_index = current_player_index
+
+    count, = reader.unpack(COUNT)
+    for _ in range(count):
+        name = ACTION_NAMES[reader.data[reader.offset]]
+        reader.offset += 1
+        match name:
+            case "add_player":
+                game.actions.append((name, reader.string()))
+            case "remove_player" | "pick_card":
+                game.actions.append((name, reader.data[reader.offset]))
+                reader.offset += 1
+            case "start_game":
+                game.actions.append((name, GAME_MODES[reader.data[reader.offset]], reader.data[reader.offset + 1]))
+                reader.offset += 2
+            case "play_card":
+                seat, card_index = reader.unpack(PLAY_CARD)
+                game.actions.append((name, seat, card_index, reader.string()))
+
+    return game
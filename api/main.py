@@ -6,22 +6,65 @@ and managing websocket connections.
 """
 
 import asyncio
+import os
+from contextlib import asynccontextmanager
+from itertools import islice
 
 from fastapi import FastAPI, HTTPException, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from game_logic.game import Game, GameState
 from utils.request_model import *
 from utils.connection_manager import ConectionManager
 from utils.custom_logger import CustomLogger
+from utils.action_log import ActionLog, GAME_MODES
+from utils.snapshots import Snapshotter
+from utils.game_store import MemoryGameStore, SQLiteGameStore
+from utils.game_ids import GameIdAllocator, encode_game_code, decode_game_code
+from utils.reaper import Reaper
+from utils.sharding import SHARD, shard_of
+from utils.turn_timer import TurnTimer
+from utils.memory import memory_stats
+from utils.admin_stats import ServerStats, game_stats, websocket_stats
+from utils.serialisation import dumps
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts and stops the background tasks of the API.
+
+    The game store is started before any requests are handled, restoring the games from the last snapshot,
+    so players can reconnect to them through the lobby with their game and player IDs. Only the games in
+    this worker's shard are tracked, the others in a shared game database belong to other workers.
+    """
+    await games.start()
+    for game_id, (state, players) in (await games.game_summaries()).items():
+        # Workers can share a game database, each one only looks after the games in its own shard
+        if shard_of(game_id) != SHARD:
+            continue
+        game_ids.reserve(game_id)
+        reaper.track(game_id)
+        if state == GameState.GAME:
+            turn_timer.track(game_id)
+        stats.game_added(state, players)
+    action_log.start()
+    reaper.start()
+    turn_timer.start()
+    yield
+    await turn_timer.stop()
+    await reaper.stop()
+    await games.stop()
+    await action_log.stop()
 
 # Run with logging:
 # uvicorn main:app --reload --host 0.0.0.0
 # Run without logging:
 # uvicorn main:app --reload --host 0.0.0.0 --log-level critical
+# Run sharded over several worker processes, see router.py:
+# python -m router --workers 4 --port 8000
 app = FastAPI(title="UNO API",
-              description="API for the UNO Flip game", version="0.1.0")
+              description="API for the UNO Flip game", version="0.1.0", lifespan=lifespan)
 
 # Add the CORSMiddleware to the FastAPI instance
 app.add_middleware(
@@ -35,12 +78,71 @@ app.add_middleware(
 # Create a logger instance
 logger = CustomLogger(__name__)
 
-# Dictionary to store game objects with their IDs as keys
-games = {}
-
 # Create a connection manager instance to manage the websocket connections
 manager = ConectionManager()
 
+# The store of the games, see utils.game_store
+# UNO_GAME_STORE=sqlite keeps idle games in the SQLite database at UNO_GAME_DB instead of in memory
+if os.environ.get("UNO_GAME_STORE", "memory") == "sqlite":
+    # Games with websockets connected are kept in memory
+    games = SQLiteGameStore(os.environ.get("UNO_GAME_DB", "games.db"),
+                            int(os.environ.get("UNO_GAME_CACHE_SIZE", "10000")),
+                            pinned=lambda game_id: game_id in manager.game_connections)
+else:
+    # Incremental snapshots of the games, restored when the API starts, see utils.snapshots
+    games = MemoryGameStore(Snapshotter(os.environ.get("UNO_SNAPSHOT_DIR", "snapshots"),
+                                        float(os.environ.get("UNO_SNAPSHOT_INTERVAL", "5"))))
+
+# Allocates the IDs of new games in this worker's shard
+game_ids = GameIdAllocator()
+
+
+async def remove_game(game_id: int, state: GameState, players: int):
+    """Removes a game from the game store and releases its ID.
+
+    Args:
+        game_id (int): The ID of the game
+        state (GameState): The state of the game
+        players (int): The number of players in the game
+    """
+    stats.game_removed(state, players)
+    await games.remove(game_id)
+    game_ids.release(game_id)
+
+# Aggregate counters for the admin page, see utils.admin_stats
+stats = ServerStats()
+# Games and websockets returned per page of the admin stats
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 1000
+
+# Removes idle and finished games without websockets connected, see utils.reaper
+reaper = Reaper(games, remove_game, pinned=lambda game_id: game_id in manager.game_connections)
+
+# Append-only binary log of every accepted action, see utils.action_log
+action_log = ActionLog(os.environ.get("UNO_ACTION_LOG", "actions.bin"))
+
+
+async def auto_moved(game: Game, seat: int, move: tuple[int, str] | None):
+    """Logs and broadcasts a move made for a player whose turn ran out.
+
+    Args:
+        game (Game): The game
+        seat (int): The seat of the player
+        move (tuple | None): The index of the card played and the colour chosen, or None if a card was picked
+    """
+    if move:
+        action_log.append(game.game_id, "play_card", seat=seat, card_index=move[0], wild_colour=move[1],
+                          version=game.version)
+    else:
+        action_log.append(game.game_id, "pick_card", seat=seat, version=game.version)
+    stats.move()
+    if game.state != GameState.GAME:
+        stats.state_changed(GameState.GAME, game.state)
+    await manager.broadcast_gamestate(game)
+
+# Moves for players who don't take their turn in time in games with websockets connected, see utils.turn_timer
+turn_timer = TurnTimer(games, auto_moved, active=lambda game_id: game_id in manager.game_connections)
+
 
 @app.get("/")
 async def root():
@@ -53,26 +155,31 @@ async def root():
 
 
 @app.websocket("/lobby")
-async def lobby(websocket: WebSocket, game_id: int, player_id: str):
+async def lobby(websocket: WebSocket, game_id: int, player_id: str, delta: bool = False):
     """Endpoint for the websocket connection to the lobby.
 
     Provies authentication for the websocket connection and handles the lobby logic, such as adding and removing players.
     It also broadcasts the game state to all players in the lobby.
     And it handles removing players and deleting the game if they are empty.
 
+    With `delta` the websocket is sent the full game state when it connects and then only the changes,
+    the client can send a "resync" message to get the full game state again if it misses a version.
+
     Args:
         websocket (WebSocket): The websocket connection
         game_id (int): The ID of the game
         player_id (str): The ID of the player
+        delta (bool): Whether to send deltas of the game state instead of the full state
 
     Raises:
         WebSocketDisconnect: If the websocket connection is closed
     """
-    game = games.get(game_id)
+    game = await games.get(game_id)
 
     if game and game.players.get(player_id):
-        await manager.connect(websocket, game_id, player_id)
-        await websocket.send_json(game.get_game_state(player_id))
+        # Connecting pins the game in the game store before it awaits anything, so this copy stays the live one
+        await manager.connect(websocket, game_id, player_id, delta)
+        manager.queue_gamestate(websocket, game)
     else:
         await websocket.close()
         return
@@ -82,43 +189,63 @@ async def lobby(websocket: WebSocket, game_id: int, player_id: str):
 
             if message["type"] == "message":
                 await manager.broadcast_message(game, message["message"])
+                continue
+
+            if message["type"] == "resync":
+                manager.queue_gamestate(websocket, game, full=True)
+                continue
 
             if game.state != GameState.GAME:
                 continue
             
+            seat = game.players.seat_index[player_id]
             match message["type"]:
                 case "play_card":
                     if game.play_card(player_id, int(message["index"]), message["wildColour"]):
+                        action_log.append(game_id, "play_card", seat=seat, card_index=int(message["index"]),
+                                          wild_colour=message["wildColour"], version=game.version)
+                        stats.move()
+                        if game.state != GameState.GAME:
+                            stats.state_changed(GameState.GAME, game.state)
                         await manager.broadcast_gamestate(game)
                 case "pick_card":
                     if game.pick_card(player_id):
+                        action_log.append(game_id, "pick_card", seat=seat, version=game.version)
+                        stats.move()
                         await manager.broadcast_gamestate(game)
                 case "call_uno":
-                    if game.call_uno(player_id):
-                        await manager.broadcast_gamestate(game)
+                    # Calling UNO doesn't change the game, it is only logged and announced to the other players
+                    action_log.append(game_id, "call_uno", seat=seat, version=game.version)
+                    await manager.broadcast_uno_call(game, game.players[player_id].name)
                 case _:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid message type")
+                    # Ignored rather than closing the websocket, like moves sent outside a game
+                    logger.debug("Ignoring message %r from player %s", message["type"], player_id)
 
-    # Only runs when an authenticated websocket disconnects
     except WebSocketDisconnect as e:
-
         # If the websocket is closed by the server, don't do anything
         if e.code == 1012:
             return
-
+    finally:
+        # However the websocket ends, it must not stay in the game connections and keep the game pinned
         manager.disconnect(websocket)
-        # Wait 5 seconds to see if the player reconnects
-        await asyncio.sleep(5)
-        if [game_id, player_id] not in list(manager.active_connections.values()):
-            if game.players[player_id]:
-                game.players.remove_player(player_id)
-                if not len(game.players):
-                    logger.info(
-                        f"Deleting game {game_id} because thre are no players left")
-                    del games[game_id]
-                else:
-                    await manager.broadcast_gamestate(game)
+
+    # Only runs when an authenticated websocket disconnects
+    # Wait 5 seconds to see if the player reconnects
+    await asyncio.sleep(5)
+    if not manager.is_connected(game_id, player_id):
+        # Get the game again, it may have been evicted from the game store while no one was connected
+        game = await games.get(game_id)
+        if game and game.players.get(player_id):
+            seat = game.players.seat_index[player_id]
+            game.players.remove_player(player_id)
+            action_log.append(game_id, "leave", seat=seat, version=game.version)
+            stats.player_removed()
+            if not len(game.players):
+                logger.info(
+                    "Deleting game %s because thre are no players left", game_id)
+                await remove_game(game_id, game.state, len(game.players))
+            else:
+                await manager.broadcast_gamestate(game)
 
 
 @app.post("/create_game")
@@ -129,18 +256,30 @@ async def create_game(create_game_request: CreateGameRequest):
         create_game_request (CreateGameRequest): Request model for creating a game
 
     Returns:
-        JSONResponse: A JSON response containing the game ID and player ID
+        JSONResponse: A JSON response containing the game ID, game code and player ID
+
+    Raises:
+        HTTPException: If there are no game IDs left
     """
-    game = Game()
+    try:
+        game = Game(game_id=game_ids.allocate())
+    except IndexError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many games")
     player_name = create_game_request.player_name
-    games[game.game_id] = game
+    await games.add(game)
+    reaper.track(game.game_id)
+    stats.game_added(game.state, len(game.players))
+    action_log.append(game.game_id, "create", value=game.seed, version=game.version)
     player_id = game.players.add_player(player_name)
-    return JSONResponse(content={"game_id": game.game_id, "player_id": player_id}, status_code=status.HTTP_201_CREATED)
+    action_log.append(game.game_id, "join", seat=0, version=game.version)
+    stats.player_added()
+    return JSONResponse(content={"game_id": game.game_id, "game_code": encode_game_code(game.game_id), "player_id": player_id},
+                        status_code=status.HTTP_201_CREATED)
 
 
 @app.post("/join_game")
 async def join_game(join_id_request: JoinGameRequest):
-    """Endpoint for joining a game.
+    """Endpoint for joining a game by its ID or its game code.
 
     Args:
         join_id_request (JoinGameRequest): The request model for joining a game
@@ -151,7 +290,13 @@ async def join_game(join_id_request: JoinGameRequest):
     Raises:
         HTTPException: If game is not found, game has already started or game is full
     """
-    game = games.get(join_id_request.game_id)
+    game_id = join_id_request.game_id
+    if game_id is None and join_id_request.game_code:
+        try:
+            game_id = decode_game_code(join_id_request.game_code)
+        except ValueError:
+            pass
+    game = await games.get(game_id) if game_id is not None else None
     player_name = join_id_request.player_name
 
     if game is None:
@@ -167,8 +312,11 @@ async def join_game(join_id_request: JoinGameRequest):
             status_code=status.HTTP_403_FORBIDDEN, detail="Game is full")
 
     player_id = game.players.add_player(player_name)
+    action_log.append(game.game_id, "join", seat=len(game.players) - 1, version=game.version)
+    stats.player_added()
     await manager.broadcast_gamestate(game)
-    return JSONResponse(content={"game_id": game.game_id, "player_id": player_id}, status_code=status.HTTP_201_CREATED)
+    return JSONResponse(content={"game_id": game.game_id, "game_code": encode_game_code(game.game_id), "player_id": player_id},
+                        status_code=status.HTTP_201_CREATED)
 
 
 @app.post("/start_game")
@@ -184,43 +332,129 @@ async def start_game(start_game_request: StartGameRequest):
     Raises:
         HTTPException: If the game, number of players or host player are invalid for starting the game
     """
-    game = games.get(start_game_request.game_id)
+    game = await games.get(start_game_request.game_id)
 
     if game is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Game not found")
 
     if game.start_game(start_game_request.player_id):
+        action_log.append(game.game_id, "start", value=GAME_MODES.index(game.game_mode), version=game.version)
+        stats.state_changed(GameState.LOBBY, game.state)
+        turn_timer.track(game.game_id)
         await manager.broadcast_gamestate(game)
         return JSONResponse(content={"detail": "Game started", "started": True}, status_code=status.HTTP_200_OK)
 
 
+def filter_games(state: str | None):
+    """Returns the games held in memory, in a state if it is given.
+
+    Raises:
+        HTTPException: If the state is not a game state
+    """
+    if state is None:
+        return (game for _, game in games.items())
+    try:
+        game_state = GameState(state)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid game state")
+    return (game for _, game in games.items() if game.state == game_state)
+
+
+def websocket_page(offset: int, limit: int) -> dict:
+    """Returns the details of a page of the websockets, keyed by their address."""
+    page = {}
+    for websocket, (game_id, player_id) in islice(manager.active_connections.items(), offset, offset + limit):
+        details = websocket_stats(websocket, game_id, player_id, len(manager.outbound_queues[websocket]))
+        page[details["address"]] = details
+    return page
+
+
 @app.get("/admin_stats")
-async def admin_stats():
-    """Retrieves the statistics for the admin page."""
-    game_stats = []
-    for game_id, game in games.items():
-        players = {player_id: player.name for player_id,
-                   player in game.players.items()}
-        game_stats.append({
-            "gameId": game_id,
-            "players": players,
-            "host": list(players.keys())[0],
-            "currentPlayerIndex": game.players.current_player_index,
-            "currentPlayerId": game.players.current_player_id,
-            "deckLength": len(game.deck.cards),
-            "discardLength": len(game.deck.discard_pile),
-            "gameDirection": game.direction,
-            "gameFlip": game.deck.flip,
-            "gameStarted": str(game.state.value),
-            "playerScores": (player.score for player_id, player in game.players.items())
-        })
-
-    websocket_stats = {}
-    for connection_id, (game_id, player_id) in manager.active_connections.items():
-        websocket_stats[f"{str(connection_id.client[0])}:{str(connection_id.client[1])}"] = {  # type: ignore
-            "gameId": game_id, "playerId": player_id}
+async def admin_stats(offset: int = 0, limit: int = ADMIN_PAGE_SIZE, state: str | None = None):
+    """Retrieves the statistics for the admin page.
+
+    The aggregate counters are kept up to date as games change, so they are cheap to read however many games
+    there are. The details of games and websockets are paginated, see `admin_games` and `admin_websockets`
+    for the following pages, and `admin_dump` for every game and websocket at once.
+
+    Args:
+        offset (int): The number of games and websockets to skip
+        limit (int): The maximum number of games and websockets to return
+        state (str | None): Only return games in this state
+
+    Returns:
+        dict: The aggregate counters and the first page of games and websockets
+    """
+    limit = min(max(limit, 0), ADMIN_MAX_PAGE_SIZE)
     return {
-        "gameStats": game_stats,
-        "websocketStats": websocket_stats
+        "aggregates": stats.aggregates(len(manager.active_connections)),
+        "gameStats": [game_stats(game) for game in islice(filter_games(state), offset, offset + limit)],
+        "websocketStats": websocket_page(offset, limit),
+        "outboundStats": manager.outbound_stats(),
+        "reaperStats": reaper.stats(),
+        "turnTimerStats": turn_timer.stats(),
+        "memoryStats": memory_stats(list(islice(filter_games(None), ADMIN_MAX_PAGE_SIZE)), len(games)),
     }
+
+
+@app.get("/admin_stats/games")
+async def admin_games(offset: int = 0, limit: int = ADMIN_PAGE_SIZE, state: str | None = None):
+    """Retrieves a page of the details of the games held in memory.
+
+    Args:
+        offset (int): The number of games to skip
+        limit (int): The maximum number of games to return
+        state (str | None): Only return games in this state
+
+    Returns:
+        dict: The games and the offset of the next page, or None if this is the last page
+    """
+    limit = min(max(limit, 0), ADMIN_MAX_PAGE_SIZE)
+    page = [game_stats(game) for game in islice(filter_games(state), offset, offset + limit + 1)]
+    return {"gameStats": page[:limit], "nextOffset": offset + limit if len(page) > limit else None}
+
+
+@app.get("/admin_stats/websockets")
+async def admin_websockets(offset: int = 0, limit: int = ADMIN_PAGE_SIZE):
+    """Retrieves a page of the details of the websocket connections.
+
+    Args:
+        offset (int): The number of websockets to skip
+        limit (int): The maximum number of websockets to return
+
+    Returns:
+        dict: The websockets by address and the offset of the next page, or None if this is the last page
+    """
+    limit = min(max(limit, 0), ADMIN_MAX_PAGE_SIZE)
+    return {"websocketStats": websocket_page(offset, limit),
+            "nextOffset": offset + limit if len(manager.active_connections) > offset + limit else None}
+
+
+@app.get("/admin_stats/dump")
+async def admin_dump(state: str | None = None):
+    """Streams every game held in memory and every websocket as newline delimited JSON.
+
+    The first line is the aggregate counters, followed by a line for each game and then each websocket,
+    each with a "type" of "aggregates", "game" or "websocket". The stream yields to other tasks between lines,
+    so a full dump doesn't stall the event loop.
+
+    Args:
+        state (str | None): Only include games in this state
+
+    Returns:
+        StreamingResponse: The NDJSON stream
+    """
+    game_list = list(filter_games(state))
+    connections = list(manager.active_connections.items())
+
+    async def lines():
+        yield dumps({"type": "aggregates", **stats.aggregates(len(connections))}) + "\n"
+        for game in game_list:
+            yield dumps({"type": "game", **game_stats(game)}) + "\n"
+        for websocket, (game_id, player_id) in connections:
+            queue = manager.outbound_queues.get(websocket)
+            details = websocket_stats(websocket, game_id, player_id, len(queue) if queue else 0)
+            yield dumps({"type": "websocket", **details}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,230 @@
+"""A local router that shards games across several API worker processes.
+
+The API keeps its games and websockets in process, so a single uvicorn process can only use one core.
+The router starts one uvicorn worker per shard, see `utils.sharding`, and forwards every connection to the
+worker that owns the game it is for, found from the `game_id` or `game_code` in the query string
+(the lobby websocket) or in the JSON body (joining and starting games). Requests without a game, such as
+creating a game, are spread over the workers in turn, and the new game gets an ID in that worker's shard.
+A `shard` query parameter sends a request to a specific worker, for example `/admin_stats?shard=1`.
+
+The router works on raw connections: it reads the request head and body, picks a worker, and then pipes
+bytes both ways, so websockets are forwarded without being decoded. HTTP requests are forwarded with
+`Connection: close`, so each connection carries one request and can go to a different worker.
+
+Run from the api directory:
+    python -m router --workers 4 --port 8000
+
+Each worker gets its own action log and snapshot directory, with the shard appended to the configured path.
+With `UNO_GAME_STORE=sqlite` the workers share the game database, and each one only restores, expires and
+counts the games in its own shard.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+
+from utils.custom_logger import CustomLogger
+from utils.game_ids import decode_game_code
+from utils.sharding import shard_of
+
+logger = CustomLogger(__name__)
+
+# Maximum size of a request head
+MAX_HEAD_SIZE = 64 * 1024
+# Maximum size of a request body the router reads to find the game ID
+MAX_BODY_SIZE = 64 * 1024
+# Bytes read at a time when piping a connection
+CHUNK_SIZE = 64 * 1024
+
+
+def worker_env(shard: int, shards: int) -> dict[str, str]:
+    """Returns the environment of a worker process.
+
+    Args:
+        shard (int): The shard of the worker
+        shards (int): The number of workers
+
+    Returns:
+        dict: The environment, with the worker's shard and its own action log and snapshot directory
+    """
+    env = dict(os.environ, UNO_SHARD=str(shard), UNO_SHARDS=str(shards), UNO_WORKER_ID=f"shard-{shard}")
+    root, ext = os.path.splitext(env.get("UNO_ACTION_LOG", "actions.bin"))
+    env["UNO_ACTION_LOG"] = f"{root}.{shard}{ext}"
+    env["UNO_SNAPSHOT_DIR"] = os.path.join(env.get("UNO_SNAPSHOT_DIR", "snapshots"), str(shard))
+    return env
+
+
+class Router:
+    """Forwards connections to the worker that owns their game.
+
+    Attributes:
+        host (str): The host the workers listen on
+        ports (list): The port of each worker, by shard
+        forwarded (list): The number of connections forwarded to each worker
+    """
+
+    def __init__(self, host: str, ports: list[int]):
+        self.host = host
+        self.ports = ports
+        self.forwarded = [0] * len(ports)
+        self._next_shard = count()
+
+    def route(self, target: str, body: bytes) -> int:
+        """Returns the shard a request is forwarded to.
+
+        Args:
+            target (str): The request target, the path and query string
+            body (bytes): The request body
+
+        Returns:
+            int: The shard of the game in the request, or the next shard in turn if it isn't for a game
+        """
+        query = parse_qs(urlsplit(target).query)
+        try:
+            if "shard" in query:
+                return int(query["shard"][0]) % len(self.ports)
+            if "game_id" in query:
+                return shard_of(int(query["game_id"][0]), len(self.ports))
+            if "game_code" in query:
+                return shard_of(decode_game_code(query["game_code"][0]), len(self.ports))
+            if body:
+                fields = json.loads(body)
+                if fields.get("game_id") is not None:
+                    return shard_of(int(fields["game_id"]), len(self.ports))
+                if fields.get("game_code"):
+                    return shard_of(decode_game_code(fields["game_code"]), len(self.ports))
+        except (ValueError, TypeError, AttributeError):
+            # Let a worker reject the request
+            pass
+        return next(self._next_shard) % len(self.ports)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Reads a request and forwards its connection to a worker."""
+        upstream_writer = None
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+            target = request_line.split(" ")[1]
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if "transfer-encoding" in headers:
+                writer.write(b"HTTP/1.1 411 Length Required\r\nConnection: close\r\nContent-Length: 0\r\n\r\n")
+                return
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_SIZE:
+                writer.write(b"HTTP/1.1 413 Content Too Large\r\nConnection: close\r\nContent-Length: 0\r\n\r\n")
+                return
+            body = await reader.readexactly(length)
+
+            shard = self.route(target, body)
+            self.forwarded[shard] += 1
+            upstream_reader, upstream_writer = await asyncio.open_connection(self.host, self.ports[shard])
+
+            # Websockets keep their connection, other requests get one connection each
+            if headers.get("upgrade", "").lower() != "websocket":
+                header_lines = [line for line in header_lines
+                                if line.partition(":")[0].strip().lower() not in ("connection", "keep-alive")]
+                header_lines.append("Connection: close")
+            upstream_writer.write("\r\n".join([request_line, *header_lines, "", ""]).encode("latin-1") + body)
+
+            # The connection is done when the worker closes it, the client closing its side is passed on
+            to_worker = asyncio.create_task(self.pipe(reader, upstream_writer))
+            await self.pipe(upstream_reader, writer)
+            to_worker.cancel()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError, ValueError):
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nConnection: close\r\nContent-Length: 0\r\n\r\n")
+        except OSError as e:
+            logger.warning("Failed to forward a connection: %r", e)
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nConnection: close\r\nContent-Length: 0\r\n\r\n")
+        finally:
+            for stream in (upstream_writer, writer):
+                if stream:
+                    stream.close()
+
+    @staticmethod
+    async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Copies bytes from a reader to a writer until the reader is closed."""
+        try:
+            while data := await reader.read(CHUNK_SIZE):
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except OSError:
+            pass
+
+
+async def start_workers(shards: int, host: str, base_port: int, uvicorn_args: list[str]) -> list:
+    """Starts a uvicorn worker for each shard.
+
+    Args:
+        shards (int): The number of workers
+        host (str): The host the workers listen on
+        base_port (int): The port of the first worker, the others use the following ports
+        uvicorn_args (list): Extra arguments for uvicorn
+
+    Returns:
+        list: The worker processes
+    """
+    return [
+        await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(base_port + shard),
+            *uvicorn_args, env=worker_env(shard, shards))
+        for shard in range(shards)
+    ]
+
+
+async def wait_for_port(host: str, port: int, timeout: float = 30) -> None:
+    """Waits until a port accepts connections.
+
+    Raises:
+        TimeoutError: If the port isn't accepting connections before the timeout
+    """
+    async with asyncio.timeout(timeout):
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                await asyncio.sleep(0.1)
+                continue
+            writer.close()
+            return
+
+
+async def main(args: argparse.Namespace) -> None:
+    ports = [args.worker_port + shard for shard in range(args.workers)]
+    workers = await start_workers(args.workers, "127.0.0.1", args.worker_port, args.uvicorn_args)
+    try:
+        for port in ports:
+            await wait_for_port("127.0.0.1", port)
+        router = Router("127.0.0.1", ports)
+        server = await asyncio.start_server(router.handle, args.host, args.port, limit=MAX_HEAD_SIZE)
+        logger.info("Routing %s:%s to %s workers on ports %s", args.host, args.port, args.workers, ports)
+        async with server:
+            await server.serve_forever()
+    finally:
+        for worker in workers:
+            if worker.returncode is None:
+                worker.terminate()
+        for worker in workers:
+            await worker.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shard games across several API worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--host", default="0.0.0.0", help="host the router listens on")
+    parser.add_argument("--port", type=int, default=8000, help="port the router listens on")
+    parser.add_argument("--worker-port", type=int, default=8100, help="port of the first worker")
+    parser.add_argument("uvicorn_args", nargs="*", help="extra arguments for uvicorn, after --")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,2 @@
+from .bots import BOTS, playable_cards
+from .simulator import GameResult, game_seed, simulate_game, run_simulation
@@ -0,0 +1,62 @@
+"""Command line entry point for the game simulator.
+
+Run from the api directory, for example:
+    python -m sim --games 1000 --mode flip --bots first,random,greedy --seed 42
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+
+from cards import DECK_NAMES
+
+from .bots import BOTS
+from .simulator import run_simulation
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play complete games between bots and report the throughput.")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--mode", choices=DECK_NAMES, default="uno", help="game mode")
+    parser.add_argument("--players", type=int, default=4, help="number of players in each game")
+    parser.add_argument("--bots", default="first",
+                        help=f"comma separated bot strategies, one per seat and repeated to fill the seats: {', '.join(BOTS)}")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the run")
+    parser.add_argument("--max-turns", type=int, default=5000, help="turns after which a game is stopped")
+    parser.add_argument("--allocations", action="store_true", help="trace memory allocations, this is much slower")
+    parser.add_argument("--log-level", default="WARNING", help="minimum level to log")
+    args = parser.parse_args()
+
+    logging.disable(logging.getLevelName(args.log_level.upper()) - 1)
+
+    bot_names = args.bots.split(",")
+    if unknown := [name for name in bot_names if name not in BOTS]:
+        parser.error(f"unknown bots: {', '.join(unknown)}")
+    strategies = [BOTS[bot_names[seat % len(bot_names)]] for seat in range(args.players)]
+
+    if args.allocations:
+        tracemalloc.start()
+    start = time.perf_counter()
+    results = run_simulation(args.games, args.seed, args.mode, strategies, args.max_turns)
+    elapsed = time.perf_counter() - start
+    if args.allocations:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    turns = sum(result.turns for result in results)
+    finished = [result for result in results if result.finished]
+    wins = [sum(result.winner == seat for result in finished) for seat in range(args.players)]
+
+    exhausted = sum(result.exhausted for result in results)
+    print(f"games:          {len(results)} ({len(finished)} finished, {exhausted} ran out of cards)")
+    print(f"games/sec:      {len(results) / elapsed:.1f}")
+    print(f"moves/sec:      {turns / elapsed:.1f}")
+    print(f"average turns:  {turns / len(results):.1f}")
+    print(f"wins by seat:   {wins}")
+    if args.allocations:
+        print(f"memory:         {current / 1024:.1f} KiB retained, {peak / 1024:.1f} KiB peak")
+
+
+if __name__ == "__main__":
+    main()
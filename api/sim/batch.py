@@ -0,0 +1,247 @@
+"""Multiprocess batch runner for simulated games.
+
+Spreads a run of games across a process pool in chunks. Every game is seeded from the run's seed and
+its index, see `sim.simulator.game_seed`, so the results don't depend on the number of workers.
+Results stream back as compact `GameResult` records, are aggregated into a `Summary` as they arrive
+and can be written to a CSV file, or a Parquet file when pyarrow is installed. Both files are written a
+chunk at a time as the results arrive, so a run's results are never all held in memory.
+
+Run from the api directory, for example:
+    python -m sim.batch --games 1000000 --workers 8 --mode flip --bots random,greedy --csv results.csv
+
+Classes:
+    Summary: Aggregated statistics of a run.
+    ParquetResultWriter: Writes results to a Parquet file a chunk at a time.
+
+Functions:
+    run_batch: Plays a run of games across a process pool, yielding the results as chunks finish.
+"""
+
+import argparse
+import csv
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
+
+from cards import DECK_NAMES
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .bots import BOTS
+from .simulator import GameResult, run_simulation
+
+CSV_FIELDS = ("seed", "finished", "winner", "turns", "scores", "flips", "reshuffles", "exhausted")
+
+
+class Summary:
+    """Aggregated statistics of a run, updated one result at a time.
+
+    Attributes:
+        players (int): The number of seats
+        games (int): The number of games added
+        finished (int): The number of games that were won
+        exhausted (int): The number of games stopped because they ran out of cards to draw
+        wins (list): The number of wins for each seat
+        winner_scores (int): The total score of the winners
+    """
+
+    def __init__(self, players: int):
+        self.players = players
+        self.games = 0
+        self.finished = 0
+        self.exhausted = 0
+        self.wins = [0] * players
+        self.winner_scores = 0
+        # Sums and sums of squares for the mean and standard deviation
+        self._sums = {"turns": 0, "flips": 0, "reshuffles": 0}
+        self._squares = {"turns": 0, "flips": 0, "reshuffles": 0}
+
+    def add(self, result: GameResult) -> None:
+        """Adds a game result to the summary."""
+        self.games += 1
+        if result.finished:
+            self.finished += 1
+            self.wins[result.winner] += 1
+            self.winner_scores += result.scores[result.winner]
+        self.exhausted += result.exhausted
+        for name in self._sums:
+            value = getattr(result, name)
+            self._sums[name] += value
+            self._squares[name] += value * value
+
+    def mean(self, name: str) -> float:
+        """Returns the mean of "turns", "flips" or "reshuffles"."""
+        return self._sums[name] / self.games if self.games else 0.0
+
+    def stdev(self, name: str) -> float:
+        """Returns the population standard deviation of "turns", "flips" or "reshuffles"."""
+        if not self.games:
+            return 0.0
+        return math.sqrt(max(self._squares[name] / self.games - self.mean(name) ** 2, 0.0))
+
+    def win_rates(self) -> list[float]:
+        """Returns the share of finished games won by each seat."""
+        return [wins / self.finished if self.finished else 0.0 for wins in self.wins]
+
+    def as_dict(self) -> dict:
+        """Returns the summary statistics as a dict."""
+        return {
+            "games": self.games,
+            "finished": self.finished,
+            "exhausted": self.exhausted,
+            "winRates": self.win_rates(),
+            "meanWinnerScore": self.winner_scores / self.finished if self.finished else 0.0,
+            **{f"{name}Mean": self.mean(name) for name in self._sums},
+            **{f"{name}Stdev": self.stdev(name) for name in self._sums},
+        }
+
+
+def _init_worker(log_level: int) -> None:
+    """Initialises a worker process."""
+    logging.disable(log_level)
+
+
+def _run_chunk(start: int, games: int, seed: int, game_mode: str, bot_names: list[str],
+               max_turns: int) -> list[GameResult]:
+    """Plays one chunk of a run in a worker process."""
+    strategies = [BOTS[name] for name in bot_names]
+    return run_simulation(games, seed, game_mode, strategies, max_turns, start=start)
+
+
+def run_batch(games: int, seed: int = 0, game_mode: str = "uno", bot_names: list[str] | None = None,
+              max_turns: int = 5000, workers: int | None = None, chunk_size: int = 1000,
+              log_level: int = logging.WARNING) -> Iterator[list[GameResult]]:
+    """Plays a run of games across a process pool.
+
+    Args:
+        games (int): The number of games to play
+        seed (int): The seed of the run
+        game_mode (str): "uno" or "flip"
+        bot_names (list): The name of the bot strategy for each seat, see `sim.bots.BOTS`
+        max_turns (int): The number of turns after which a game is stopped
+        workers (int | None): The number of worker processes, defaults to the number of CPUs
+        chunk_size (int): The number of games each task plays
+        log_level (int): Logging is disabled up to and including this level in the workers
+
+    Yields:
+        list: The results of each chunk, in the order the chunks finish
+    """
+    bot_names = bot_names or ["first"] * 4
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,)) as executor:
+        futures = [
+            executor.submit(_run_chunk, start, min(chunk_size, games - start), seed, game_mode, bot_names, max_turns)
+            for start in range(0, games, chunk_size)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+class ParquetResultWriter:
+    """Writes results to a Parquet file a chunk at a time, each chunk as its own row group.
+
+    The columns are the fields of `GameResult`, with the scores as a list column.
+
+    Attributes:
+        path (str): The path of the Parquet file
+    """
+
+    def __init__(self, path: str):
+        """Opens the Parquet file.
+
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        if pyarrow is None:
+            raise ImportError("Writing Parquet files requires pyarrow")
+        self.path = path
+        # The schema is fixed so every chunk is written with the same column types
+        self.schema = pyarrow.schema([
+            ("seed", pyarrow.uint64()),
+            ("finished", pyarrow.bool_()),
+            ("winner", pyarrow.int64()),
+            ("turns", pyarrow.int64()),
+            ("scores", pyarrow.list_(pyarrow.int64())),
+            ("flips", pyarrow.int64()),
+            ("reshuffles", pyarrow.int64()),
+            ("exhausted", pyarrow.bool_()),
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, results: list[GameResult]) -> None:
+        """Writes a chunk of results."""
+        columns = {field: [getattr(result, field) for result in results] for field in CSV_FIELDS}
+        self._writer.write_table(pyarrow.table(columns, schema=self.schema))
+
+    def close(self) -> None:
+        """Finishes the Parquet file."""
+        self._writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play a large number of bot games across a process pool.")
+    parser.add_argument("--games", type=int, default=100000, help="number of games to play")
+    parser.add_argument("--mode", choices=DECK_NAMES, default="uno", help="game mode")
+    parser.add_argument("--players", type=int, default=4, help="number of players in each game")
+    parser.add_argument("--bots", default="first",
+                        help=f"comma separated bot strategies, one per seat and repeated to fill the seats: {', '.join(BOTS)}")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the run")
+    parser.add_argument("--max-turns", type=int, default=5000, help="turns after which a game is stopped")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="games per task")
+    parser.add_argument("--csv", help="write every result to this CSV file")
+    parser.add_argument("--parquet", help="write every result to this Parquet file, requires pyarrow")
+    args = parser.parse_args()
+    # Checked before any game is played, so a run isn't thrown away when it finishes
+    if args.parquet and pyarrow is None:
+        parser.error("--parquet requires pyarrow, which is not installed")
+
+    logging.disable(logging.WARNING)
+
+    bot_names = args.bots.split(",")
+    if unknown := [name for name in bot_names if name not in BOTS]:
+        parser.error(f"unknown bots: {', '.join(unknown)}")
+    bot_names = [bot_names[seat % len(bot_names)] for seat in range(args.players)]
+
+    summary = Summary(args.players)
+    parquet_writer = ParquetResultWriter(args.parquet) if args.parquet else None
+    csv_file = open(args.csv, "w", newline="") if args.csv else None
+    writer = csv.writer(csv_file) if csv_file else None
+    if writer:
+        writer.writerow(CSV_FIELDS)
+
+    start = time.perf_counter()
+    try:
+        for results in run_batch(args.games, args.seed, args.mode, bot_names, args.max_turns,
+                                 args.workers, args.chunk_size):
+            for result in results:
+                summary.add(result)
+            if writer:
+                # Scores are written as one space separated column
+                writer.writerows(result._replace(scores=" ".join(map(str, result.scores))) for result in results)
+            if parquet_writer:
+                parquet_writer.write(results)
+    finally:
+        if csv_file:
+            csv_file.close()
+        if parquet_writer:
+            parquet_writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"games:          {summary.games} ({summary.finished} finished, {summary.exhausted} ran out of cards) "
+          f"in {elapsed:.1f}s, "
+          f"{summary.games / elapsed:.1f} games/sec")
+    print(f"win rates:      {', '.join(f'{rate:.3f}' for rate in summary.win_rates())}")
+    print(f"winner score:   {summary.as_dict()['meanWinnerScore']:.1f}")
+    for name in ("turns", "flips", "reshuffles"):
+        print(f"{name + ':':<16}{summary.mean(name):.2f} mean, {summary.stdev(name):.2f} stdev")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Bot strategies for simulated games.
+
+A strategy is called with the game, the ID of the player whose turn it is and a random number generator.
+It returns the index of the card to play and the colour to choose if it is a wild card,
+or None to pick a card from the deck instead.
+
+Functions:
+    playable_cards: Returns the indexes of the playable cards in a player's hand.
+    first_bot: Plays the first playable card.
+    random_bot: Plays a random playable card.
+    greedy_bot: Plays the playable card with the highest score.
+"""
+
+from random import Random
+
+from cards import Colour
+from game_logic.game import Game
+
+
+def playable_cards(game: Game, player_id: str) -> list[int]:
+    """Returns the indexes of the playable cards in a player's hand.
+
+    Args:
+        game (Game): The game
+        player_id (str): The ID of the player
+
+    Returns:
+        list: The indexes of the cards that can be played on the discard pile
+    """
+    return [index for index, is_playable in enumerate(game.deck.playable(game.players[player_id].hand)) if is_playable]
+
+
+def choose_colour(game: Game, player_id: str) -> str:
+    """Chooses the colour the player holds the most cards of, for wild cards.
+
+    Args:
+        game (Game): The game
+        player_id (str): The ID of the player
+
+    Returns:
+        str: The value of the chosen colour
+    """
+    colours = Colour.colours(game.deck)
+    counts = {colour: 0 for colour in colours}
+    for card_id in game.players[player_id].hand:
+        if (colour := game.deck.face(card_id).colour) in counts:
+            counts[colour] += 1
+    return max(colours, key=counts.__getitem__).value
+
+
+def first_bot(game: Game, player_id: str, rng: Random) -> tuple[int, str] | None:
+    """Plays the first playable card."""
+    if playable := playable_cards(game, player_id):
+        return playable[0], choose_colour(game, player_id)
+
+
+def random_bot(game: Game, player_id: str, rng: Random) -> tuple[int, str] | None:
+    """Plays a random playable card with a random colour."""
+    if playable := playable_cards(game, player_id):
+        return rng.choice(playable), rng.choice(Colour.colours(game.deck)).value
+
+
+def greedy_bot(game: Game, player_id: str, rng: Random) -> tuple[int, str] | None:
+    """Plays the playable card with the highest score, to get rid of the most points first."""
+    if playable := playable_cards(game, player_id):
+        hand = game.players[player_id].hand
+        index = max(playable, key=lambda index: game.deck.face(hand[index]).score)
+        return index, choose_colour(game, player_id)
+
+
+BOTS = {
+    "first": first_bot,
+    "random": random_bot,
+    "greedy": greedy_bot,
+}
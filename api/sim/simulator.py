@@ -0,0 +1,131 @@
+"""Headless simulation of complete games between bots.
+
+Games are played directly through `Game`, without FastAPI or websockets.
+Every game is seeded from the run's seed and its index, so any game can be replayed on its own,
+either by simulating it again or from its recorded actions with `game_logic.replay`.
+
+Classes:
+    GameResult: The result of a simulated game.
+
+Functions:
+    game_seed: Returns the seed of a game in a run.
+    simulate_game: Plays a single game between bots.
+    run_simulation: Plays a number of games and returns their results.
+"""
+
+import random
+from typing import Callable, NamedTuple
+
+from game_logic.game import Game, GameState
+
+from .bots import BOTS
+
+
+class GameResult(NamedTuple):
+    """The result of a simulated game.
+
+    Attributes:
+        seed (int): The seed the game was played with
+        finished (bool): Whether the game was won before reaching the turn limit
+        winner (int): The seat of the winner, -1 if the game did not finish
+        turns (int): The number of turns played
+        scores (tuple): The score of every seat
+        flips (int): The number of times the deck was flipped
+        reshuffles (int): The number of times the discard pile was shuffled back into the deck
+        exhausted (bool): Whether the game was stopped because every card was in the players' hands
+    """
+    seed: int
+    finished: bool
+    winner: int
+    turns: int
+    scores: tuple[int, ...]
+    flips: int
+    reshuffles: int
+    exhausted: bool = False
+
+
+def game_seed(seed: int, index: int) -> int:
+    """Returns the seed of a game in a run, derived from the run's seed and the game's index.
+
+    Args:
+        seed (int): The seed of the run
+        index (int): The index of the game in the run
+
+    Returns:
+        int: The seed of the game
+    """
+    return random.Random(f"{seed}:{index}").getrandbits(64)
+
+
+def simulate_game(seed: int, game_mode: str = "uno", strategies: list[Callable] | None = None,
+                  max_turns: int = 5000) -> GameResult:
+    """Plays a single game between bots.
+
+    Args:
+        seed (int): The seed for the game
+        game_mode (str): "uno" or "flip"
+        strategies (list): The bot strategy of each seat, see `sim.bots`, defaults to 4 first bots
+        max_turns (int): The number of turns after which the game is stopped
+
+    Returns:
+        GameResult: The result of the game, a game that runs out of cards to draw is stopped and not finished
+    """
+    strategies = strategies or [BOTS["first"]] * 4
+    # The bots get their own generator so they don't change the game's random sequence
+    rng = random.Random(seed)
+
+    game = Game(seed)
+    game.game_mode = game_mode
+    player_ids = [game.players.add_player(f"Bot {seat}") for seat in range(len(strategies))]
+
+    turns = 0
+    flips = 0
+    exhausted = False
+    try:
+        game.start_game(player_ids[0])
+        while game.state == GameState.GAME and turns < max_turns:
+            seat = game.players.current_player_index
+            player_id = game.players.current_player_id
+            flip = game.deck.flip
+
+            move = strategies[seat](game, player_id, rng)
+            if move is None or not game.play_card(player_id, *move):
+                game.pick_card(player_id)
+
+            flips += game.deck.flip != flip
+            turns += 1
+    except IndexError:
+        # Raised by `Deck.recycle_discard_pile` when there are no cards left to draw,
+        # for example when many players hold most of the deck and a Wild Draw Colour is played
+        exhausted = True
+
+    finished = game.state == GameState.GAME_OVER and not exhausted
+    return GameResult(
+        seed=seed,
+        finished=finished,
+        winner=game.players.current_player_index if finished else -1,
+        turns=turns,
+        scores=tuple(game.players[player_id].score for player_id in player_ids),
+        flips=flips,
+        reshuffles=game.deck.reshuffles,
+        exhausted=exhausted,
+    )
+
+
+def run_simulation(games: int, seed: int = 0, game_mode: str = "uno", strategies: list[Callable] | None = None,
+                   max_turns: int = 5000, start: int = 0) -> list[GameResult]:
+    """Plays a number of games and returns their results.
+
+    Args:
+        games (int): The number of games to play
+        seed (int): The seed of the run
+        game_mode (str): "uno" or "flip"
+        strategies (list): The bot strategy of each seat
+        max_turns (int): The number of turns after which a game is stopped
+        start (int): The index of the first game, so a run can be split into parts
+
+    Returns:
+        list: The result of each game
+    """
+    return [simulate_game(game_seed(seed, index), game_mode, strategies, max_turns)
+            for index in range(start, start + games)]
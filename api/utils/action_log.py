@@ -0,0 +1,152 @@
+"""Append-only binary log of the actions accepted by the API.
+
+Every event is a fixed-width little endian record:
+
+    timestamp   float64  Unix time the event was accepted
+    game_id     uint64   The ID of the game
+    value       uint64   Event specific: the seed for "create", the game mode for "start"
+    version     uint32   The game state version after the event
+    event       uint8    The event code, see EVENTS
+    seat        uint8    The seat of the player
+    card_index  uint16   The index of the played card in the player's hand
+    wild_colour uint8    The chosen colour for "play_card": 0 for none, otherwise the index in Colour plus 1
+
+Records are packed into a buffer on the event loop and written in batches from a worker thread.
+Together with the game's seed the records are enough to replay a game, see `game_logic.replay`,
+except for player names which are not logged.
+
+Classes:
+    ActionRecord: A decoded record.
+    ActionLog: Writes records to the log file.
+
+Functions:
+    read_action_log: Reads every record from a log file using a memory map.
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import time
+from typing import Iterator, NamedTuple
+
+from cards import Colour, DECK_NAMES
+from utils.scheduling import PeriodicTask
+
+RECORD = struct.Struct("<dQQIBBHB7x")
+
+EVENTS = {
+    "create": 1,
+    "join": 2,
+    "start": 3,
+    "play_card": 4,
+    "pick_card": 5,
+    "call_uno": 6,
+    "leave": 7,
+}
+EVENT_NAMES = {code: name for name, code in EVENTS.items()}
+
+# Game modes by their "start" event value, the compiled deck IDs
+GAME_MODES = DECK_NAMES
+
+COLOURS = list(Colour)
+
+
+class ActionRecord(NamedTuple):
+    """A decoded action log record, see the module docstring for the fields."""
+    timestamp: float
+    game_id: int
+    value: int
+    version: int
+    event: str
+    seat: int
+    card_index: int
+    wild_colour: Colour | None
+
+
+def encode_colour(colour: str | None) -> int:
+    """Returns the record code of a colour value, 0 if it is not a colour."""
+    try:
+        return COLOURS.index(Colour(colour)) + 1
+    except ValueError:
+        return 0
+
+
+class ActionLog:
+    """Writes action records to an append-only log file.
+
+    Attributes:
+        path (str): The path of the log file
+        batch_size (int): The number of buffered records that triggers a write
+        flush_interval (float): Seconds between writes of a partial batch
+        records (int): The number of records appended
+    """
+
+    def __init__(self, path: str, batch_size: int = 512, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.records = 0
+        self._buffer = bytearray()
+        self._task: PeriodicTask | None = None
+
+    def append(self, game_id: int, event: str, *, seat: int = 0, card_index: int = 0,
+               wild_colour: str | None = None, version: int = 0, value: int = 0) -> None:
+        """Buffers a record, it is written by the flush task.
+
+        Args:
+            game_id (int): The ID of the game
+            event (str): The name of the event, a key of EVENTS
+            seat (int): The seat of the player
+            card_index (int): The index of the played card
+            wild_colour (str | None): The value of the chosen colour
+            version (int): The game state version after the event
+            value (int): The event specific value
+        """
+        self._buffer += RECORD.pack(time.time(), game_id, value, version, EVENTS[event], seat,
+                                    card_index, encode_colour(wild_colour))
+        self.records += 1
+        if len(self._buffer) >= self.batch_size * RECORD.size and self._task:
+            self._task.wake()
+
+    def start(self) -> None:
+        """Starts the task that writes buffered records."""
+        self._task = PeriodicTask(self.flush, self.flush_interval, "write the action log")
+        self._task.start()
+
+    async def stop(self) -> None:
+        """Writes the remaining records and stops the flush task."""
+        if self._task:
+            await self._task.stop()
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Writes the buffered records from a worker thread."""
+        if not self._buffer:
+            return
+        data, self._buffer = bytes(self._buffer), bytearray()
+        await asyncio.to_thread(self._write, data)
+
+    def _write(self, data: bytes) -> None:
+        with open(self.path, "ab") as file:
+            file.write(data)
+
+
+def read_action_log(path: str) -> Iterator[ActionRecord]:
+    """Reads every complete record from a log file using a memory map.
+
+    Args:
+        path (str): The path of the log file
+
+    Yields:
+        ActionRecord: Each record in the order it was written
+    """
+    if not os.path.exists(path) or not (size := os.path.getsize(path) // RECORD.size * RECORD.size):
+        return
+
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for offset in range(0, size, RECORD.size):
+            timestamp, game_id, value, version, event, seat, card_index, wild_colour = RECORD.unpack_from(data, offset)
+            yield ActionRecord(timestamp, game_id, value, version, EVENT_NAMES.get(event, str(event)), seat,
+                               card_index, COLOURS[wild_colour - 1] if wild_colour else None)
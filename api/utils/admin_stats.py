@@ -0,0 +1,140 @@
+"""Statistics for the admin page.
+
+`ServerStats` keeps aggregate counters that are updated as games are created, change state and are removed,
+so reading them is O(1) no matter how many games there are. The details of single games and websockets
+are built by `game_stats` and `websocket_stats` a page at a time.
+
+Classes:
+    ServerStats: Aggregate counters of the games on this worker.
+
+Functions:
+    game_stats: Returns the details of a game.
+    websocket_stats: Returns the details of a websocket connection.
+"""
+
+import time
+
+from fastapi import WebSocket
+
+from game_logic.game import Game, GameState
+from utils.game_ids import encode_game_code
+
+# Seconds of moves kept to work out the move rate
+MOVE_WINDOW = 60
+
+
+class ServerStats:
+    """Aggregate counters of the games on this worker.
+
+    Attributes:
+        games (dict): The number of games in each state, by state value
+        players (int): The number of players in every game
+        moves (int): The number of cards played and picked since the worker started
+    """
+
+    def __init__(self):
+        self.games = {state.value: 0 for state in GameState}
+        self.players = 0
+        self.moves = 0
+        # Moves in each of the last MOVE_WINDOW seconds, a ring buffer indexed by the second
+        self._move_buckets = [0] * MOVE_WINDOW
+        self._second = int(time.monotonic())
+
+    def game_added(self, state: GameState, players: int) -> None:
+        """Counts a new or restored game."""
+        self.games[state.value] += 1
+        self.players += players
+
+    def game_removed(self, state: GameState, players: int) -> None:
+        """Stops counting a removed game."""
+        self.games[state.value] -= 1
+        self.players -= players
+
+    def state_changed(self, old_state: GameState, new_state: GameState) -> None:
+        """Moves a game from one state count to another."""
+        self.games[old_state.value] -= 1
+        self.games[new_state.value] += 1
+
+    def player_added(self) -> None:
+        self.players += 1
+
+    def player_removed(self) -> None:
+        self.players -= 1
+
+    def _advance(self) -> int:
+        """Clears the buckets of the seconds since the last move and returns the current second."""
+        second = int(time.monotonic())
+        for elapsed in range(self._second + 1, min(second, self._second + MOVE_WINDOW) + 1):
+            self._move_buckets[elapsed % MOVE_WINDOW] = 0
+        self._second = max(self._second, second)
+        return second
+
+    def move(self) -> None:
+        """Counts a card played or picked."""
+        self._move_buckets[self._advance() % MOVE_WINDOW] += 1
+        self.moves += 1
+
+    def moves_per_second(self, seconds: int = 10) -> float:
+        """Returns the average number of moves per second over the last complete seconds.
+
+        Args:
+            seconds (int): The number of seconds to average over, at most MOVE_WINDOW - 1
+        """
+        second = self._advance()
+        return sum(self._move_buckets[(second - offset) % MOVE_WINDOW] for offset in range(1, seconds + 1)) / seconds
+
+    def aggregates(self, websockets: int) -> dict:
+        """Returns the aggregate counters.
+
+        Args:
+            websockets (int): The number of websockets connected
+        """
+        return {
+            "games": sum(self.games.values()),
+            "gamesByState": self.games,
+            "players": self.players,
+            "websockets": websockets,
+            "moves": self.moves,
+            "movesPerSecond": {"10s": self.moves_per_second(10), "50s": self.moves_per_second(50)},
+        }
+
+
+def game_stats(game: Game) -> dict:
+    """Returns the details of a game.
+
+    Args:
+        game (Game): The game
+    """
+    return {
+        "gameId": game.game_id,
+        "gameCode": encode_game_code(game.game_id),
+        "players": {player_id: player.name for player_id, player in game.players.items()},
+        "host": game.players.host_id,
+        "currentPlayerIndex": game.players.current_player_index,
+        "currentPlayerId": game.players.current_player_id if len(game.players) else None,
+        "deckLength": len(game.deck.cards),
+        "discardLength": len(game.deck.discard_pile),
+        "gameDirection": game.direction,
+        "gameFlip": game.deck.flip,
+        "gameStarted": game.state.value,
+        "playerScores": [player.score for player in game.players.values()],
+        "version": game.version,
+        "idleSeconds": round(time.monotonic() - game.updated, 1),
+    }
+
+
+def websocket_stats(websocket: WebSocket, game_id: int, player_id: str, queue_depth: int) -> dict:
+    """Returns the details of a websocket connection.
+
+    Args:
+        websocket (WebSocket): The websocket
+        game_id (int): The ID of the game it is connected to
+        player_id (str): The ID of the player
+        queue_depth (int): The number of frames waiting to be sent to it
+    """
+    return {
+        "address": f"{websocket.client[0]}:{websocket.client[1]}" if websocket.client else None,
+        "gameId": game_id,
+        "playerId": player_id,
+        "queueDepth": queue_depth,
+    }
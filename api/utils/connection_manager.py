@@ -1,85 +1,422 @@
 """The module is a connection manager for managing websocket connections in a game.
 
 This module provides a ConnectionManager class that is responsible for managing websocket connections in a game. It allows for connecting and disconnecting websockets, as well as broadcasting the game state to all connected websockets.
+Websockets can opt in to receiving deltas of the game state instead of the full state, see `utils.state_delta`.
+
+Every websocket has a bounded outbound queue drained by its own writer task, so broadcasting only queues frames
+and a slow websocket can't hold up the game. Queued game states are coalesced, as the game state is only built
+when it is sent, while chat messages are always kept. Websockets whose queue fills up, or whose send fails or
+times out, are dropped.
+
+Frames are sent as pre-encoded JSON text, see `utils.serialisation` and `Game.get_game_state_json`,
+so shared data is only encoded once per broadcast rather than once per websocket.
 
 Classes:
+    OutboundQueue: Class for the frames waiting to be sent to a websocket.
     ConnectionManager: Class to manage the websocket connections.
 
 Functions:
     connect: Method to connect a websocket to the connection manager.
     disconnect: Method to disconnect a websocket from the connection manager.
+    is_connected: Method to check if a player has a websocket connected to a game.
+    game_websockets: Method to get every websocket connected to a game.
+    queue_gamestate: Method to queue the game state to be sent to a websocket.
+    send_gamestate: Method to send the game state, or a delta of it, to a websocket.
     broadcast_gamestate: Method to broadcast the game state to all websockets in a game.
     broadcast_message: Method to broadcast a message to all websockets in a game.
+    outbound_stats: Method to get the outbound queue statistics.
 """
 
+import asyncio
+from collections import deque
+
 from fastapi import WebSocket
 
 from game_logic.game import Game
 from utils.custom_logger import CustomLogger
+from utils.serialisation import dumps
+from utils.state_delta import diff_game_state
 
 logger = CustomLogger(__name__)
 
+# Seconds to wait for a single send before the websocket is dropped as too slow
+SEND_TIMEOUT = 5
+# Seconds to wait when closing a dropped websocket
+CLOSE_TIMEOUT = 1
+# Maximum number of frames waiting to be sent to a websocket before it is dropped
+OUTBOUND_QUEUE_SIZE = 64
+
+# Kinds of queued frames
+GAMESTATE = "gamestate"
+MESSAGE = "message"
+
+
+class OutboundQueue:
+    """Class for the frames waiting to be sent to a websocket.
+
+    At most one game state frame is queued at a time. It is only a marker, the game state is built when
+    the frame is sent, so queueing a game state while one is waiting replaces it with the newest state.
+
+    Attributes:
+        frames (deque): The queued frames, as tuples of the frame kind and the encoded message
+        maxsize (int): The maximum number of queued frames
+        gamestate (tuple | None): The game and whether to send the full state, if a game state frame is queued
+        writer (asyncio.Task | None): The task sending the queued frames
+    """
+
+    def __init__(self, maxsize: int = OUTBOUND_QUEUE_SIZE):
+        self.frames: deque[tuple[str, str | None]] = deque()
+        self.maxsize = maxsize
+        self.gamestate: tuple[Game, bool] | None = None
+        self.writer: asyncio.Task | None = None
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put_gamestate(self, game: Game, full: bool = False) -> bool | None:
+        """Queues a game state frame.
+
+        Args:
+            game (Game): The game to send the state of
+            full (bool): Whether to send the full game state even if the websocket receives deltas
+
+        Returns:
+            bool | None: True if a queued game state was replaced, False if the frame was queued,
+            or None if the queue is full
+        """
+        if self.gamestate is not None:
+            self.gamestate = (game, full or self.gamestate[1])
+            return True
+        if len(self.frames) >= self.maxsize:
+            return None
+        self.gamestate = (game, full)
+        self.frames.append((GAMESTATE, None))
+        self._ready.set()
+        return False
+
+    def put_message(self, data: str) -> bool:
+        """Queues a chat message frame.
+
+        Args:
+            data (str): The message to send, encoded as JSON
+
+        Returns:
+            bool: True if the frame was queued, False if the queue is full
+        """
+        if len(self.frames) >= self.maxsize:
+            return False
+        self.frames.append((MESSAGE, data))
+        self._ready.set()
+        return True
+
+    async def get(self) -> tuple[str, str | tuple]:
+        """Waits for the next frame.
+
+        Returns:
+            tuple: The frame kind, and the message or the game and full flag for game state frames
+        """
+        while not self.frames:
+            self._ready.clear()
+            await self._ready.wait()
+
+        kind, data = self.frames.popleft()
+        if kind == GAMESTATE:
+            data, self.gamestate = self.gamestate, None
+        return kind, data
+
 
 class ConectionManager:
     """Class to manage the websocket connections.
 
     Attributes:
-        active_connections (Dict[WebSocket, list]): A dictionary with the websocket connections as keys and a list with the game ID and player ID as values
+        active_connections (Dict[WebSocket, tuple]): A dictionary with the websocket connections as keys and a tuple with the game ID and player ID as values
+        delta_states (Dict[WebSocket, dict | None]): The last game state sent to each websocket that receives deltas
+        game_connections (Dict[int, Dict[str, set[WebSocket]]]): The websocket connections of each player, by game ID and player ID
+        outbound_queues (Dict[WebSocket, OutboundQueue]): The frames waiting to be sent to each websocket
+        dropped_connections (int): The number of websockets dropped because a send failed, timed out or their queue was full
+        dropped_frames (int): The number of queued frames discarded when websockets were dropped
+        coalesced_frames (int): The number of game state frames replaced by a newer game state before being sent
     """
 
     def __init__(self):
         """Constructor method for the ConnectionManager class.
 
-        Initializes the active_connections attribute as an empty dictionary.
+        Initializes the connection dictionaries as empty dictionaries.
         """
-        self.active_connections: dict[WebSocket, list] = {}
+        self.active_connections: dict[WebSocket, tuple[int, str]] = {}
+        self.delta_states: dict[WebSocket, dict | None] = {}
+        self.game_connections: dict[int, dict[str, set[WebSocket]]] = {}
+        self.outbound_queues: dict[WebSocket, OutboundQueue] = {}
+        self.dropped_connections = 0
+        self.dropped_frames = 0
+        self.coalesced_frames = 0
+        self._closing: set[asyncio.Task] = set()
 
-    async def connect(self, websocket: WebSocket, game_id: int, player_id: str):
+    async def connect(self, websocket: WebSocket, game_id: int, player_id: str, delta: bool = False):
         """Method to connect a websocket to the connection manager.
 
-        Adds the websocket to the active_connections dictionary.
+        Adds the websocket to the active_connections dictionary and starts its writer task.
+        The websocket is added before it is accepted, so its game is pinned in the game store from the
+        moment it is fetched and can't be evicted and loaded again as a second copy while accepting.
+        Frames broadcast in the meantime are queued and sent once it is accepted.
 
         Args:
             websocket (WebSocket): The websocket connection
             game_id (int): The ID of the game
             player_id (str): The ID of the player
+            delta (bool): Whether the websocket receives deltas of the game state instead of the full state
         """
-        await websocket.accept()
-        self.active_connections[websocket] = [game_id, player_id]
+        self.active_connections[websocket] = (game_id, player_id)
+        self.game_connections.setdefault(game_id, {}).setdefault(player_id, set()).add(websocket)
+        if delta:
+            self.delta_states[websocket] = None
+        queue = self.outbound_queues[websocket] = OutboundQueue()
+
+        try:
+            await websocket.accept()
+        except Exception:
+            self.disconnect(websocket)
+            raise
+        # The websocket may have been dropped while it was accepted, if its queue filled up
+        if websocket in self.active_connections:
+            queue.writer = asyncio.create_task(self._write(websocket, queue))
         logger.debug(
-            f"Accepted and added websocket {websocket.client} to active connections")
+            "Accepted and added websocket %s to active connections", websocket.client)
 
     def disconnect(self, websocket: WebSocket):
         """Method to disconnect a websocket from the connection manager.
 
-        Removes the websocket from the active_connections dictionary.
+        Removes the websocket from the active_connections dictionary and the game_connections index,
+        and stops its writer task, discarding any frames that haven't been sent.
 
         Args:
             websocket (WebSocket): The websocket connection
         """
-        self.active_connections.pop(websocket, None)
+        connection = self.active_connections.pop(websocket, None)
+        self.delta_states.pop(websocket, None)
+        if connection is None:
+            return
+
+        queue = self.outbound_queues.pop(websocket)
+        # A websocket that is still being accepted has no writer task yet
+        if queue.writer is not None and queue.writer is not asyncio.current_task():
+            queue.writer.cancel()
+
+        game_id, player_id = connection
+        players = self.game_connections[game_id]
+        players[player_id].discard(websocket)
+        if not players[player_id]:
+            del players[player_id]
+            if not players:
+                del self.game_connections[game_id]
         logger.debug(
-            f"Removed websocket {websocket.client} from active connections")
+            "Removed websocket %s from active connections", websocket.client)
+
+    def is_connected(self, game_id: int, player_id: str) -> bool:
+        """Method to check if a player has a websocket connected to a game.
+
+        Args:
+            game_id (int): The ID of the game
+            player_id (str): The ID of the player
+
+        Returns:
+            bool: True if the player has at least one websocket connected
+        """
+        return player_id in self.game_connections.get(game_id, {})
+
+    def game_websockets(self, game_id: int) -> list[WebSocket]:
+        """Method to get every websocket connected to a game.
+
+        Args:
+            game_id (int): The ID of the game
+
+        Returns:
+            list: The websocket connections of every player in the game
+        """
+        return [websocket for websockets in self.game_connections.get(game_id, {}).values() for websocket in websockets]
+
+    def drop(self, websocket: WebSocket):
+        """Method to drop a websocket that can't keep up, disconnecting it and closing it in the background.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+        """
+        if websocket not in self.active_connections:
+            return
+        self.dropped_connections += 1
+        self.dropped_frames += len(self.outbound_queues[websocket])
+        self.disconnect(websocket)
+
+        task = asyncio.create_task(self._close(websocket))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, websocket: WebSocket):
+        """Closes a dropped websocket, ignoring any errors.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+        """
+        try:
+            await asyncio.wait_for(websocket.close(), CLOSE_TIMEOUT)
+        except Exception:
+            pass
+
+    async def _write(self, websocket: WebSocket, queue: OutboundQueue):
+        """Writer task that sends the frames queued for a websocket until it is disconnected.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+            queue (OutboundQueue): The websocket's outbound queue
+        """
+        while True:
+            kind, data = await queue.get()
+            if kind == GAMESTATE:
+                game, full = data
+                sent = await self.send_gamestate(websocket, game, self.active_connections[websocket][1], full)
+            else:
+                sent = await self.send_text(websocket, data)
+            if not sent:
+                return
+
+    async def send_json(self, websocket: WebSocket, data: dict) -> bool:
+        """Method to encode data as JSON and send it to a websocket.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+            data (dict): The data to send
+
+        Returns:
+            bool: True if the data was sent, False if the websocket was dropped
+        """
+        return await self.send_text(websocket, dumps(data))
+
+    async def send_text(self, websocket: WebSocket, text: str) -> bool:
+        """Method to send text to a websocket, dropping it if the send fails or takes too long.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+            text (str): The text to send
+
+        Returns:
+            bool: True if the text was sent, False if the websocket was dropped
+        """
+        try:
+            await asyncio.wait_for(websocket.send_text(text), SEND_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning("Dropping websocket %s after failed send: %r", websocket.client, e)
+
+        self.drop(websocket)
+        return False
+
+    def queue_gamestate(self, websocket: WebSocket, game: Game, full: bool = False):
+        """Method to queue the game state to be sent to a websocket.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+            game (Game): The game object to send
+            full (bool): Whether to send the full game state even if the websocket receives deltas
+        """
+        queue = self.outbound_queues.get(websocket)
+        if queue is None:
+            return
+
+        match queue.put_gamestate(game, full):
+            case True:
+                self.coalesced_frames += 1
+            case None:
+                logger.warning("Dropping websocket %s with a full outbound queue", websocket.client)
+                self.drop(websocket)
+
+    async def send_gamestate(self, websocket: WebSocket, game: Game, player_id: str, full: bool = False) -> bool:
+        """Method to send the game state to a websocket.
+
+        Websockets that receive deltas are sent the changes since the last state they were sent,
+        or the full state if they haven't been sent one yet or `full` is True.
+
+        Args:
+            websocket (WebSocket): The websocket connection
+            game (Game): The game object to send
+            player_id (str): The ID of the player the websocket belongs to
+            full (bool): Whether to send the full game state even if the websocket receives deltas
+
+        Returns:
+            bool: False if the websocket was dropped
+        """
+        if not game.players.get(player_id):
+            # The player left before the game state was sent
+            return True
+
+        if websocket not in self.delta_states:
+            return await self.send_text(websocket, game.get_game_state_json(player_id))
+
+        game_state = game.get_game_state(player_id)
+        last_state = self.delta_states[websocket]
+        if last_state is None or full:
+            sent = await self.send_text(websocket, game.get_game_state_json(player_id))
+        elif delta := diff_game_state(last_state, game_state):
+            sent = await self.send_json(websocket, delta)
+        else:
+            # Nothing this player can see has changed
+            return True
+        if sent:
+            self.delta_states[websocket] = game_state
+        return sent
 
     async def broadcast_gamestate(self, game: Game):
         """Method to broadcast the game state to all websockets in a game.
 
+        The game state is only queued, it is sent by each websocket's writer task.
+
         Args:
             game (Game): The game object to broadcast
         """
-        logger.debug(f"Broadcasting gamestate for game {game.game_id}")
-        for connection, [conn_game_id, conn_player_id] in self.active_connections.items():
-            if conn_game_id == game.game_id:
-                await connection.send_json(game.get_game_state(conn_player_id))
+        logger.debug("Broadcasting gamestate for game %s", game.game_id)
+        for connection in self.game_websockets(game.game_id):
+            self.queue_gamestate(connection, game)
 
     async def broadcast_message(self, game: Game, message: str):
         """Method to broadcast a message to all websockets in a game.
 
+        The message is only queued, it is sent by each websocket's writer task.
+
         Args:
             game (Game): The game object to broadcast
             message (str): The message to broadcast
         """
-        logger.debug(f"Broadcasting message for game {game.game_id}")
-        for connection, [conn_game_id, conn_player_id] in self.active_connections.items():
-            if conn_game_id == game.game_id:
-                await connection.send_json({"type": "message", "message": message})
+        logger.debug("Broadcasting message for game %s", game.game_id)
+        self._broadcast_text(game, dumps({"type": "message", "message": message}))
+
+    async def broadcast_uno_call(self, game: Game, player_name: str):
+        """Method to tell all websockets in a game that a player has called UNO.
+
+        Args:
+            game (Game): The game the player is in
+            player_name (str): The name of the player who called UNO
+        """
+        logger.debug("Broadcasting UNO call for game %s", game.game_id)
+        self._broadcast_text(game, dumps({"type": "call_uno", "playerName": player_name}))
+
+    def _broadcast_text(self, game: Game, data: str):
+        """Queues an encoded message for every websocket in a game, dropping those with a full queue."""
+        for connection in self.game_websockets(game.game_id):
+            if not self.outbound_queues[connection].put_message(data):
+                logger.warning("Dropping websocket %s with a full outbound queue", connection.client)
+                self.drop(connection)
+
+    def outbound_stats(self) -> dict:
+        """Method to get the outbound queue statistics.
+
+        Returns:
+            dict: The total and largest queue depth, and the drop and coalesce counters
+        """
+        depths = [len(queue) for queue in self.outbound_queues.values()]
+        return {
+            "queuedFrames": sum(depths),
+            "maxQueueDepth": max(depths, default=0),
+            "droppedConnections": self.dropped_connections,
+            "droppedFrames": self.dropped_frames,
+            "coalescedFrames": self.coalesced_frames,
+        }
@@ -1,6 +1,25 @@
+import atexit
+import json
 import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Settings read from the environment:
+# UNO_LOG_LEVEL: the minimum level to log, e.g. DEBUG, INFO or WARNING
+# UNO_LOG_FILE: the file to write logs to
+# UNO_LOG_JSON: write the file logs as JSON lines when set to 1
+level_name = os.environ.get("UNO_LOG_LEVEL", "DEBUG").upper()
+level = logging.getLevelName(level_name)
+# getLevelName returns "Level <name>" for an unknown name rather than raising, which setLevel would reject
+unknown_level = not isinstance(level, int)
+if unknown_level:
+    level = logging.DEBUG
+log_file = os.environ.get("UNO_LOG_FILE", "uno.log")
+json_lines = os.environ.get("UNO_LOG_JSON", "0").lower() in ("1", "true", "yes")
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-level = logging.DEBUG
 
 class LoggingFormatter(logging.Formatter):
     # Colours and styles
@@ -21,44 +40,92 @@ class LoggingFormatter(logging.Formatter):
         logging.CRITICAL: red + bold,
     }
 
+    def __init__(self):
+        super().__init__()
+        # Build one formatter per level up front rather than one per record
+        self.formatters = {
+            levelno: logging.Formatter(
+                f"{log_colour}{{levelname:<10}}{self.reset}"
+                f"{self.green}{{name}}{self.reset} "
+                f"{log_colour}{self.bold}{{message}}{self.reset}",
+                DATE_FORMAT, style="{")
+            for levelno, log_colour in self.COLOURS.items()
+        }
+
+    def format(self, record):
+        return self.formatters[record.levelno].format(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as a single line JSON object."""
+
     def format(self, record):
-        log_colour = self.COLOURS[record.levelno]
-        format_str = (
-            f"{log_colour}{{levelname:<10}}{self.reset}"
-            f"{self.green}{{name}}{self.reset} "
-            f"{log_colour}{self.bold}{{message}}{self.reset}"
-        )
-        formatter = logging.Formatter(format_str, "%Y-%m-%d %H:%M:%S", style="{")
-        return formatter.format(record)
+        return json.dumps({
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }, ensure_ascii=False)
+
+
+# The shared handler every logger writes to, records are written out by the listener's thread
+_queue_handler: QueueHandler | None = None
+
+
+def get_queue_handler() -> QueueHandler:
+    """Returns the shared QueueHandler, starting the listener that writes to the console and file the first time.
+
+    Returns:
+        QueueHandler: The handler to add to loggers
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        return _queue_handler
+
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(LoggingFormatter())
+
+    # File handler
+    file_handler = logging.FileHandler(filename=log_file, encoding="utf-8", mode="a+")
+    if json_lines:
+        file_handler.setFormatter(JsonLinesFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(
+            "[{asctime}] [{levelname:<8}] {name}: {message}", DATE_FORMAT, style="{"))
+
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    listener = QueueListener(_queue_handler.queue, console_handler, file_handler)
+    listener.start()
+    # Flush the remaining records when the process exits
+    atexit.register(listener.stop)
+    return _queue_handler
+
 
 class CustomLogger:
-    
+
     def __new__(cls, name):
         logger = logging.getLogger(name)
         logger.setLevel(level)
 
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(LoggingFormatter())
+        # Only add the shared handler once, no matter how many times a logger is created
+        handler = get_queue_handler()
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
 
-        # File handler
-        file_handler = logging.FileHandler(filename="uno.log", encoding="utf-8", mode="a+")
-        file_handler_formatter = logging.Formatter("[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{")
-        file_handler.setFormatter(file_handler_formatter)
+        return logger
 
-        # Add the handlers
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
 
-        return logger
+if unknown_level:
+    CustomLogger(__name__).warning("Unknown UNO_LOG_LEVEL %r, logging at DEBUG", level_name)
 
 """
 # Create a logger object
 logger = CustomLogger(__name__)
 
-# Usage examples
+# Usage examples, arguments are only formatted if the message is logged
 logger.info("This is an information message.")
-logger.debug("This is a debug message.")
+logger.debug("This is a debug message about game %s.", game_id)
 logger.warning("This is a warning message.")
 logger.error("This is an error message.")
 logger.critical("This is a critical message.")
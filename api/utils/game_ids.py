@@ -0,0 +1,158 @@
+"""Allocation of unique game IDs and short game codes.
+
+Game IDs are 6 digits and carry the shard of the worker that owns the game, see `utils.sharding`.
+The allocator walks the IDs in its shard in a random looking order that never repeats, a keyed permutation
+of a counter, so a new ID is found in O(1) without retrying random numbers. IDs of finished
+games are released to a free list and are only reused, oldest first, once every fresh ID has been used,
+so an old game ID is not taken by a new game soon after the old game ends.
+
+Game codes are the game IDs in base 32 with the Crockford alphabet, 4 characters that are easy to read out
+and type, with the letters that look like digits accepted as those digits.
+
+Classes:
+    GameIdAllocator: Allocates unique game IDs in a shard.
+
+Functions:
+    encode_game_code: Returns the game code of a game ID.
+    decode_game_code: Returns the game ID of a game code.
+"""
+
+from collections import deque
+from random import Random
+
+from utils.sharding import SHARD, SHARDS, MIN_GAME_ID, MAX_GAME_ID
+
+CODE_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CODE_LENGTH = 4
+# Characters that are read as others when decoding a code
+CODE_ALIASES = str.maketrans({"O": "0", "I": "1", "L": "1"})
+CODE_VALUES = {character: value for value, character in enumerate(CODE_ALPHABET)}
+
+
+def encode_game_code(game_id: int) -> str:
+    """Returns the game code of a game ID.
+
+    Args:
+        game_id (int): The ID of the game
+
+    Returns:
+        str: The game code
+    """
+    code = []
+    for _ in range(CODE_LENGTH):
+        game_id, value = divmod(game_id, len(CODE_ALPHABET))
+        code.append(CODE_ALPHABET[value])
+    return "".join(reversed(code))
+
+
+def decode_game_code(code: str) -> int:
+    """Returns the game ID of a game code, ignoring case and dashes.
+
+    Args:
+        code (str): The game code
+
+    Returns:
+        int: The ID of the game
+
+    Raises:
+        ValueError: If the code is not a valid game code
+    """
+    code = code.upper().replace("-", "").translate(CODE_ALIASES)
+    if len(code) != CODE_LENGTH:
+        raise ValueError(f"Invalid game code: {code}")
+    game_id = 0
+    for character in code:
+        if character not in CODE_VALUES:
+            raise ValueError(f"Invalid game code: {code}")
+        game_id = game_id * len(CODE_ALPHABET) + CODE_VALUES[character]
+    return game_id
+
+
+class GameIdAllocator:
+    """Allocates unique game IDs in a shard.
+
+    Attributes:
+        shard (int): The shard of the allocated IDs
+        shards (int): The number of shards
+        size (int): The number of IDs in the shard
+    """
+
+    def __init__(self, shard: int = SHARD, shards: int = SHARDS, seed: int | None = None):
+        self.shard = shard
+        self.shards = shards
+        self._first = -(-(MIN_GAME_ID - shard) // shards)
+        self.size = (MAX_GAME_ID - shard) // shards - self._first + 1
+
+        # The IDs are visited in the order of a Feistel permutation of the counter, see `_permute`
+        self._half_bits = ((self.size - 1).bit_length() + 1) // 2
+        self._mask = (1 << self._half_bits) - 1
+        rng = Random(seed)
+        self._keys = [rng.getrandbits(32) for _ in range(4)]
+        self._counter = 0
+
+        self._in_use: set[int] = set()
+        self._free: deque[int] = deque()
+
+    def __len__(self) -> int:
+        return len(self._in_use)
+
+    def __contains__(self, game_id: int) -> bool:
+        return game_id in self._in_use
+
+    def _permute(self, index: int) -> int:
+        """Maps an index below `size` to another, a different one for every index.
+
+        The Feistel network permutes the smallest range of an even number of bits that holds `size`,
+        and is applied again to results outside of `size` until one is inside it. The range is less than
+        4 times `size`, so this takes less than 4 tries on average.
+        """
+        while True:
+            left, right = index >> self._half_bits, index & self._mask
+            for key in self._keys:
+                left, right = right, left ^ (((right * 0x9E3779B1) ^ key) >> 7 & self._mask)
+            index = left << self._half_bits | right
+            if index < self.size:
+                return index
+
+    def allocate(self) -> int:
+        """Returns a game ID that isn't in use.
+
+        Returns:
+            int: The game ID
+
+        Raises:
+            IndexError: If every game ID in the shard is in use
+        """
+        while self._counter < self.size:
+            game_id = (self._first + self._permute(self._counter)) * self.shards + self.shard
+            self._counter += 1
+            # IDs reserved by restored games are skipped
+            if game_id not in self._in_use:
+                self._in_use.add(game_id)
+                return game_id
+
+        while self._free:
+            game_id = self._free.popleft()
+            if game_id not in self._in_use:
+                self._in_use.add(game_id)
+                return game_id
+
+        raise IndexError("There are no game IDs left")
+
+    def release(self, game_id: int) -> None:
+        """Releases the ID of a game that has been removed so it can be reused.
+
+        Args:
+            game_id (int): The game ID
+        """
+        if game_id in self._in_use:
+            self._in_use.remove(game_id)
+            self._free.append(game_id)
+
+    def reserve(self, game_id: int) -> None:
+        """Marks the ID of an existing game, such as a restored game, as in use.
+
+        Args:
+            game_id (int): The game ID
+        """
+        self._in_use.add(game_id)
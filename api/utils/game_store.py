@@ -0,0 +1,399 @@
+"""Stores for the games hosted by the API.
+
+The endpoints only get, add and remove games through a `GameStore`, so where games are kept can be changed
+without touching the game logic:
+
+- `MemoryGameStore` keeps every game in a dict, optionally snapshotting them to disk, see `utils.snapshots`.
+- `SQLiteGameStore` keeps a bounded LRU cache of hot games in memory and the rest in a SQLite database,
+  so a node can hold far more idle lobbies than fit in memory. The database also records which worker owns
+  each game, so worker processes sharing it can find a game's owner.
+
+Games in a store are mutated in place. Changes are detected using the game's state version,
+see `Game.state_changed`, so nothing has to be written back explicitly.
+
+Classes:
+    GameStore: The interface of a game store.
+    MemoryGameStore: Keeps every game in memory.
+    SQLiteGameStore: Keeps hot games in memory and every game in a SQLite database.
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import struct
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, ItemsView
+
+from game_logic.game import Game, GameState
+from game_logic.snapshot import dump_game, load_game, monotonic_time, unix_time
+from utils.custom_logger import CustomLogger
+from utils.scheduling import PeriodicTask
+from utils.snapshots import Snapshotter
+
+logger = CustomLogger(__name__)
+
+# The ID of this worker process, recorded as the owner of the games it writes
+WORKER_ID = os.environ.get("UNO_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class GameStore(ABC):
+    """The interface of a game store.
+
+    Games returned by the store are live objects, changes to them are picked up by the store.
+    A store that doesn't implement every abstract method can't be created.
+    """
+
+    @abstractmethod
+    async def get(self, game_id: int) -> Game | None:
+        """Returns a game, or None if it doesn't exist.
+
+        Args:
+            game_id (int): The ID of the game
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add(self, game: Game) -> None:
+        """Adds a new game to the store.
+
+        Args:
+            game (Game): The game to add
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def remove(self, game_id: int) -> None:
+        """Removes a game from the store.
+
+        Args:
+            game_id (int): The ID of the game
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def items(self) -> ItemsView[int, Game]:
+        """Returns the games held in memory by game ID."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def game_summaries(self) -> dict[int, tuple[GameState, int]]:
+        """Returns the state and number of players of every game in the store, including those not held in memory."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def last_changes(self, game_ids: list[int]) -> dict[int, tuple[GameState, int, float]]:
+        """Returns the state, number of players and `Game.updated` time of games, without loading them into memory.
+
+        Args:
+            game_ids (list): The IDs of the games, games that don't exist are left out
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Returns the number of games held in memory."""
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        """Starts any background tasks of the store."""
+
+    async def stop(self) -> None:
+        """Writes any pending changes and stops the background tasks of the store."""
+
+
+class MemoryGameStore(GameStore):
+    """Keeps every game in a dict.
+
+    Attributes:
+        games (dict): The games by game ID
+        snapshotter (Snapshotter | None): Snapshots the games so they are restored when the store starts
+    """
+
+    def __init__(self, snapshotter: Snapshotter | None = None):
+        self.games: dict[int, Game] = {}
+        self.snapshotter = snapshotter
+
+    async def get(self, game_id: int) -> Game | None:
+        return self.games.get(game_id)
+
+    async def add(self, game: Game) -> None:
+        self.games[game.game_id] = game
+
+    async def remove(self, game_id: int) -> None:
+        self.games.pop(game_id, None)
+
+    def items(self) -> ItemsView[int, Game]:
+        return self.games.items()
+
+    async def game_summaries(self) -> dict[int, tuple[GameState, int]]:
+        return {game_id: (game.state, len(game.players)) for game_id, game in self.games.items()}
+
+    async def last_changes(self, game_ids: list[int]) -> dict[int, tuple[GameState, int, float]]:
+        return {game_id: (game.state, len(game.players), game.updated)
+                for game_id in game_ids if (game := self.games.get(game_id)) is not None}
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    async def start(self) -> None:
+        if self.snapshotter:
+            self.games.update(await asyncio.to_thread(self.snapshotter.restore))
+            self.snapshotter.start(self.games)
+
+    async def stop(self) -> None:
+        if self.snapshotter:
+            await self.snapshotter.stop(self.games)
+
+
+class SQLiteGameStore(GameStore):
+    """Keeps a LRU cache of hot games in memory and every game in a SQLite database.
+
+    Changed games are written in batches every flush interval, in a single transaction on a worker thread,
+    and the database uses write ahead logging so other processes can read it while it is written.
+    Games are encoded with `game_logic.snapshot`. A game is only evicted from the cache if it is not pinned,
+    for example because players have websockets connected to it, so there is never more than one live copy.
+
+    Attributes:
+        path (str): The path of the database
+        cache_size (int): The number of games to keep in memory
+        flush_interval (float): Seconds between writes of the changed games
+        pinned (Callable[[int], bool]): Returns whether a game must stay in memory
+        owner (str): The worker ID recorded as the owner of the games written
+        hits (int): The number of games found in the cache
+        misses (int): The number of games read from the database
+    """
+
+    def __init__(self, path: str, cache_size: int = 10000, flush_interval: float = 1.0,
+                 pinned: Callable[[int], bool] = lambda game_id: False, owner: str = WORKER_ID):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.pinned = pinned
+        self.owner = owner
+        self.hits = 0
+        self.misses = 0
+
+        self._cache: OrderedDict[int, Game] = OrderedDict()
+        # The version of each cached game when it was last written
+        self._written: dict[int, int] = {}
+        # Rows of evicted games waiting to be written, by game ID
+        self._pending: dict[int, tuple] = {}
+        # IDs of removed games waiting to be deleted
+        self._deleted: set[int] = set()
+        # Reads in progress, so concurrent requests for a game share one copy
+        self._loading: dict[int, asyncio.Future] = {}
+
+        # Every database call runs on the same thread, so the connection is never shared between threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="game-store")
+        self._connection: sqlite3.Connection | None = None
+        self._task: PeriodicTask | None = None
+
+    async def _run_in_executor(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> None:
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS games (
+                game_id INTEGER PRIMARY KEY,
+                owner TEXT NOT NULL,
+                state TEXT NOT NULL,
+                players INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                data BLOB NOT NULL
+            )""")
+        self._connection.commit()
+
+    def _row(self, game: Game) -> tuple | None:
+        """Returns the database row of a game, or None if the game can't be encoded."""
+        try:
+            data = dump_game(game)
+        except (ValueError, KeyError, IndexError, struct.error) as e:
+            logger.error("Failed to encode game %s: %r", game.game_id, e)
+            return None
+        return (game.game_id, self.owner, game.state.value, len(game.players), game.version,
+                unix_time(game.updated), data)
+
+    def _cache_game(self, game: Game) -> None:
+        self._cache[game.game_id] = game
+        self._cache.move_to_end(game.game_id)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Evicts the least recently used games that aren't pinned until the cache fits."""
+        excess = len(self._cache) - self.cache_size
+        if excess <= 0:
+            return
+        # Walk the cache from the least recently used game, stopping as soon as enough games are found,
+        # so a cache full of hot games doesn't make every insert look at all of them.
+        # The most recently used game is never evicted, it has just been requested.
+        newest = next(reversed(self._cache))
+        evicted = []
+        for game_id, game in self._cache.items():
+            if len(evicted) == excess or game_id == newest:
+                break
+            if self.pinned(game_id):
+                continue
+            if self._written.get(game_id) != game.version:
+                # A game that can't be encoded stays in memory rather than being lost
+                if (row := self._row(game)) is None:
+                    continue
+                self._pending[game_id] = row
+            evicted.append(game_id)
+        for game_id in evicted:
+            del self._cache[game_id]
+            self._written.pop(game_id, None)
+
+    async def get(self, game_id: int) -> Game | None:
+        if (game := self._cache.get(game_id)) is not None:
+            self._cache.move_to_end(game_id)
+            self.hits += 1
+            return game
+        if game_id in self._deleted:
+            return None
+        if game_id in self._loading:
+            return await asyncio.shield(self._loading[game_id])
+
+        self.misses += 1
+        future = self._loading[game_id] = asyncio.get_running_loop().create_future()
+        try:
+            if (row := self._pending.get(game_id)) is not None:
+                data = row[-1]
+            else:
+                data = await self._run_in_executor(self._read, game_id)
+            game = load_game(data) if data is not None and game_id not in self._deleted else None
+            if game is not None:
+                self._written[game_id] = game.version
+                self._cache_game(game)
+            future.set_result(game)
+            return game
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved, it is raised here and by the concurrent requests
+            future.exception()
+            raise
+        finally:
+            del self._loading[game_id]
+
+    def _read(self, game_id: int) -> bytes | None:
+        row = self._connection.execute("SELECT data FROM games WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    async def add(self, game: Game) -> None:
+        self._deleted.discard(game.game_id)
+        self._pending.pop(game.game_id, None)
+        self._written.pop(game.game_id, None)
+        self._cache_game(game)
+
+    async def remove(self, game_id: int) -> None:
+        self._cache.pop(game_id, None)
+        self._written.pop(game_id, None)
+        self._pending.pop(game_id, None)
+        self._deleted.add(game_id)
+
+    def items(self) -> ItemsView[int, Game]:
+        return self._cache.items()
+
+    async def game_summaries(self) -> dict[int, tuple[GameState, int]]:
+        summaries = await self._run_in_executor(self._read_game_summaries)
+        summaries.update({row[0]: (GameState(row[2]), row[3]) for row in self._pending.values()})
+        summaries.update({game_id: (game.state, len(game.players)) for game_id, game in self._cache.items()})
+        for game_id in self._deleted:
+            summaries.pop(game_id, None)
+        return summaries
+
+    def _read_game_summaries(self) -> dict[int, tuple[GameState, int]]:
+        return {game_id: (GameState(state), players)
+                for game_id, state, players in self._connection.execute("SELECT game_id, state, players FROM games")}
+
+    async def last_changes(self, game_ids: list[int]) -> dict[int, tuple[GameState, int, float]]:
+        stored = [game_id for game_id in game_ids if game_id not in self._cache and game_id not in self._pending]
+        changes = await self._run_in_executor(self._read_last_changes, stored) if stored else {}
+        # Games may have been read, changed or removed while the database was read
+        for game_id in game_ids:
+            if (game := self._cache.get(game_id)) is not None:
+                changes[game_id] = (game.state, len(game.players), game.updated)
+            elif (row := self._pending.get(game_id)) is not None:
+                changes[game_id] = (GameState(row[2]), row[3], monotonic_time(row[5]))
+            elif game_id in self._deleted:
+                changes.pop(game_id, None)
+        return changes
+
+    def _read_last_changes(self, game_ids: list[int]) -> dict[int, tuple[GameState, int, float]]:
+        rows = self._connection.execute(
+            f"SELECT game_id, state, players, updated FROM games WHERE game_id IN ({', '.join('?' * len(game_ids))})",
+            game_ids)
+        return {game_id: (GameState(state), players, monotonic_time(updated)) for game_id, state, players, updated in rows}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def owner_of(self, game_id: int) -> str | None:
+        """Returns the worker that last wrote a game, or None if it isn't in the database.
+
+        Args:
+            game_id (int): The ID of the game
+        """
+        return await self._run_in_executor(self._read_owner, game_id)
+
+    def _read_owner(self, game_id: int) -> str | None:
+        row = self._connection.execute("SELECT owner FROM games WHERE game_id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    async def flush(self) -> None:
+        """Writes the changed and evicted games and deletes the removed games in one transaction."""
+        # Games evicted or removed while this flush runs are left for the next one
+        pending = dict(self._pending)
+        rows = list(pending.values())
+        written = {}
+        for count, (game_id, game) in enumerate(list(self._cache.items()), 1):
+            # A game that can't be encoded is skipped and tried again by the next flush
+            if self._written.get(game_id) != game.version and (row := self._row(game)) is not None:
+                rows.append(row)
+                written[game_id] = game.version
+            # Let other tasks run between chunks of encoding
+            if count % 100 == 0:
+                await asyncio.sleep(0)
+        deleted = list(self._deleted)
+        if not rows and not deleted:
+            return
+
+        # The pending rows stay readable by `get` until they are written, and are kept if the write fails
+        await self._run_in_executor(self._write, rows, deleted)
+        for game_id, row in pending.items():
+            # Only the rows that were written, a game may have been evicted again since
+            if self._pending.get(game_id) is row:
+                del self._pending[game_id]
+        self._deleted.difference_update(deleted)
+        for game_id, version in written.items():
+            if game_id in self._cache:
+                self._written[game_id] = version
+        logger.debug("Wrote %s games and deleted %s", len(rows), len(deleted))
+
+    def _write(self, rows: list[tuple], deleted: list[int]) -> None:
+        with self._connection:
+            self._connection.executemany("""
+                INSERT INTO games (game_id, owner, state, players, version, updated, data) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (game_id) DO UPDATE SET
+                    owner = excluded.owner, state = excluded.state, players = excluded.players,
+                    version = excluded.version, updated = excluded.updated, data = excluded.data""", rows)
+            self._connection.executemany("DELETE FROM games WHERE game_id = ?", [(game_id,) for game_id in deleted])
+
+    async def start(self) -> None:
+        await self._run_in_executor(self._connect)
+        self._task = PeriodicTask(self.flush, self.flush_interval, f"write games to {self.path}")
+        self._task.start()
+
+    async def stop(self) -> None:
+        if self._task:
+            await self._task.stop()
+            self._task = None
+        await self.flush()
+        await self._run_in_executor(self._connection.close)
+        self._executor.shutdown()
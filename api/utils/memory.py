@@ -0,0 +1,76 @@
+"""Approximate memory accounting for games.
+
+The size of a game is the sum of `sys.getsizeof` over every object it owns: its deck, players, hands,
+recorded actions, random number generator and cached game state views. Objects shared between games,
+such as the card prototypes and enums, are not counted.
+
+Functions:
+    game_memory: Returns the approximate number of bytes used by a game.
+    memory_stats: Returns the approximate memory used by a sample of games.
+"""
+
+import random
+import sys
+from collections import deque
+from enum import Enum
+from types import FunctionType, MethodType, ModuleType
+
+from cards import Card, FlipCard, CARD_LISTS
+from game_logic.game import Game
+
+# Objects that are shared between games
+SHARED_TYPES = (Card, FlipCard, Enum, type, FunctionType, MethodType, ModuleType)
+SHARED_IDS = {id(card_list) for card_list in CARD_LISTS.values()} | {id(())}
+
+
+def game_memory(game: Game) -> int:
+    """Returns the approximate number of bytes used by a game.
+
+    Args:
+        game (Game): The game
+
+    Returns:
+        int: The total size of the objects owned by the game
+    """
+    seen = set(SHARED_IDS)
+    pending = [game]
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            pending += obj.keys()
+            pending += obj.values()
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            pending += obj
+        elif hasattr(obj, "__dict__"):
+            pending.append(vars(obj))
+        elif hasattr(obj, "__slots__"):
+            pending += (getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def memory_stats(games: list[Game], total: int | None = None, sample_size: int = 20) -> dict:
+    """Returns the approximate memory used by games, estimated from a random sample of them.
+
+    Args:
+        games (list): The games to sample from
+        total (int | None): The total number of games, if there are more than those to sample from
+        sample_size (int): The number of games to measure
+
+    Returns:
+        dict: The number of games, the number measured, and the average and estimated total bytes
+    """
+    sample = random.sample(games, min(sample_size, len(games)))
+    average = sum(game_memory(game) for game in sample) / len(sample) if sample else 0
+    total = len(games) if total is None else total
+    return {
+        "games": total,
+        "sampled": len(sample),
+        "averageBytes": round(average),
+        "totalBytes": round(average * total),
+    }
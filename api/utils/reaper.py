@@ -0,0 +1,119 @@
+"""Background removal of idle and finished games.
+
+A game expires when it hasn't changed for the time to live of its state, for example a lobby no one has
+joined for 30 minutes or a game that ended 5 minutes ago. Games with websockets connected never expire,
+the lobby removes them once every player has left.
+
+Expiry times are kept in a `utils.scheduling.DeadlineHeap`, one entry per game, so each check only looks at
+the games that are due. An entry is only a lower bound: when it is due the game's real expiry time is worked out from
+`Game.updated`, and if the game has changed since the entry is pushed back with the new time.
+The time of the last change is read with `GameStore.last_changes`, so games kept in a database are checked
+and removed without loading them into memory, and their time is stored with them so it survives a restart.
+Entries of games that have already been removed, and entries replaced by an earlier one when a game ID
+is reused, are dropped when they come up.
+
+Settings read from the environment, in seconds:
+    UNO_TTL_LOBBY: time to live of a game in the lobby, 1800 by default
+    UNO_TTL_GAME: time to live of a game being played, 3600 by default
+    UNO_TTL_GAME_OVER: time to live of a game that has ended, 300 by default
+
+Classes:
+    Reaper: Removes the games that have expired.
+"""
+
+import os
+import time
+from itertools import islice
+from typing import Awaitable, Callable
+
+from game_logic.game import GameState
+from utils.custom_logger import CustomLogger
+from utils.game_store import GameStore
+from utils.scheduling import DeadlineHeap, PeriodicTask
+
+logger = CustomLogger(__name__)
+
+TTLS = {
+    GameState.LOBBY: float(os.environ.get("UNO_TTL_LOBBY", "1800")),
+    GameState.GAME: float(os.environ.get("UNO_TTL_GAME", "3600")),
+    GameState.GAME_OVER: float(os.environ.get("UNO_TTL_GAME_OVER", "300")),
+}
+
+
+class Reaper:
+    """Removes the games that have expired.
+
+    Attributes:
+        games (GameStore): The store of the games
+        remove (Callable): Removes an expired game, called with its game ID, state and number of players
+        pinned (Callable[[int], bool]): Returns whether a game must not expire, such as one with websockets connected
+        ttls (dict): The time to live in seconds of a game in each state
+        interval (float): Seconds between checks for expired games
+        reaped (dict): The number of games removed in each state
+    """
+
+    def __init__(self, games: GameStore, remove: Callable[[int, GameState, int], Awaitable[None]],
+                 pinned: Callable[[int], bool] = lambda game_id: False,
+                 ttls: dict[GameState, float] = TTLS, interval: float = 1.0):
+        self.games = games
+        self.remove = remove
+        self.pinned = pinned
+        self.ttls = ttls
+        self.interval = interval
+        self.reaped = {state.value: 0 for state in GameState}
+        # The expiry times are a lower bound of when each game expires
+        self._expires = DeadlineHeap()
+        self._task: PeriodicTask | None = None
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def track(self, game_id: int) -> None:
+        """Starts tracking a new or restored game.
+
+        Args:
+            game_id (int): The ID of the game
+        """
+        self._expires.push_earlier(time.monotonic() + min(self.ttls.values()), game_id)
+
+    async def reap(self) -> int:
+        """Removes the games that have expired.
+
+        Returns:
+            int: The number of games removed
+        """
+        now = time.monotonic()
+        due = self._expires.pop_due(now)
+        reaped = 0
+        # The games are checked a chunk at a time, letting other tasks run in between
+        while chunk := list(islice(due, 100)):
+            changes = await self.games.last_changes(chunk)
+            for game_id, (state, players, updated) in changes.items():
+                if self.pinned(game_id):
+                    expires = now + self.ttls[state]
+                else:
+                    expires = updated + self.ttls[state]
+                if expires > now:
+                    self._expires.push(expires, game_id)
+                    continue
+
+                logger.info("Removing game %s after %.0fs in the %s state", game_id, now - updated, state.value)
+                await self.remove(game_id, state, players)
+                self.reaped[state.value] += 1
+                reaped += 1
+        return reaped
+
+    def stats(self) -> dict:
+        """Returns the number of games tracked and removed."""
+        return {"tracked": len(self._expires), "reaped": self.reaped}
+
+    def start(self) -> None:
+        """Starts the task that removes expired games every interval."""
+        self._task = PeriodicTask(self.reap, self.interval, "remove expired games")
+        self._task.start()
+
+    async def stop(self) -> None:
+        """Stops the task that removes expired games."""
+        if self._task:
+            await self._task.stop()
+            self._task = None
@@ -5,7 +5,9 @@ class CreateGameRequest(BaseModel):
     player_name: str
 
 class JoinGameRequest(BaseModel):
-    game_id: int
+    # Either the game ID or the game code, see utils.game_ids
+    game_id: int | None = None
+    game_code: str | None = None
     player_name: str
 
 class LobbyRequest(BaseModel):
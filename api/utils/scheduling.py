@@ -0,0 +1,127 @@
+"""Building blocks of the API's background tasks.
+
+Snapshots, game store flushes, action log writes, game expiry and turn timers all run as a task on the
+event loop that wakes up every interval. `PeriodicTask` is that task: it calls a coroutine every interval,
+or sooner when woken, logs any error so one failed run doesn't end the task, and stops cleanly.
+
+Game expiry and turn timers also keep a deadline per game. `DeadlineHeap` keeps them in one heap shared by
+every game, instead of a task per game. The heap is lazy: a game's deadline is changed by pushing a new
+entry rather than finding the old one, and entries that are no longer a game's deadline are dropped when
+they come up.
+
+Classes:
+    PeriodicTask: Calls a coroutine every interval until it is stopped.
+    DeadlineHeap: One deadline per game, popped in order once they are due.
+"""
+
+import asyncio
+import heapq
+from typing import Awaitable, Callable, Iterator
+
+from utils.custom_logger import CustomLogger
+
+logger = CustomLogger(__name__)
+
+
+class PeriodicTask:
+    """Calls a coroutine every interval on a background task until it is stopped.
+
+    Attributes:
+        run (Callable): The coroutine function called every interval
+        interval (float): Seconds between calls
+        description (str): What the coroutine does, for the error logged when it fails
+    """
+
+    def __init__(self, run: Callable[[], Awaitable], interval: float, description: str):
+        self.run = run
+        self.interval = interval
+        self.description = description
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+
+    def start(self) -> None:
+        """Starts the task."""
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self) -> None:
+        """Makes the next call now instead of at the end of the interval."""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        """Stops the task, waiting for a call in progress to finish."""
+        self._stopping.set()
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._stopping.is_set():
+                return
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error("Failed to %s: %r", self.description, e)
+
+
+class DeadlineHeap:
+    """One deadline per game, popped in order once they are due.
+
+    A deadline can be a lower bound of the real one, which the caller works out when it is due and pushes
+    back if it is later, so a game doesn't have to update its deadline every time it changes.
+    """
+
+    def __init__(self):
+        # (deadline, game ID)
+        self._heap: list[tuple[float, int]] = []
+        # The deadline of the current heap entry of each game
+        self._deadlines: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def push(self, deadline: float, game_id: int) -> None:
+        """Sets the deadline of a game, replacing any it had.
+
+        Args:
+            deadline (float): The `time.monotonic` time the game is due
+            game_id (int): The ID of the game
+        """
+        self._deadlines[game_id] = deadline
+        heapq.heappush(self._heap, (deadline, game_id))
+
+    def push_earlier(self, deadline: float, game_id: int) -> None:
+        """Sets the deadline of a game, unless it already has an earlier one.
+
+        Args:
+            deadline (float): The `time.monotonic` time the game is due
+            game_id (int): The ID of the game
+        """
+        if self._deadlines.get(game_id, deadline + 1) > deadline:
+            self.push(deadline, game_id)
+
+    def pop_due(self, now: float) -> Iterator[int]:
+        """Removes the games whose deadline is due, earliest first, one at a time as they are iterated.
+
+        So if checking a game fails, the games after it keep their deadlines. Deadlines pushed while
+        iterating must be later than `now`.
+
+        Args:
+            now (float): The current `time.monotonic` time
+
+        Yields:
+            int: The ID of each game that is due
+        """
+        while self._heap and self._heap[0][0] <= now:
+            deadline, game_id = heapq.heappop(self._heap)
+            if self._deadlines.get(game_id) != deadline:
+                continue
+            del self._deadlines[game_id]
+            yield game_id
@@ -0,0 +1,29 @@
+"""JSON encoding for the frames sent to websockets.
+
+Uses orjson when it is installed, falling back to the standard library encoder
+with the same compact output that `WebSocket.send_json` produces.
+
+Functions:
+    dumps: Encodes data as a JSON string.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data) -> str:
+    """Encodes data as a compact JSON string.
+
+    Args:
+        data: The data to encode
+
+    Returns:
+        str: The JSON string
+    """
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
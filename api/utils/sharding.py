@@ -0,0 +1,50 @@
+"""Sharding of games across worker processes.
+
+Each worker process owns the games whose ID falls in its shard, `game_id % shards`, so the shard is encoded
+in the game ID itself and any process can work out the owner of a game without asking anyone.
+The router, see `router.py`, uses this to send requests and websockets to the worker that owns the game.
+
+Settings read from the environment:
+    UNO_SHARDS: the number of worker processes, 1 when sharding is off
+    UNO_SHARD: the shard of this worker process, from 0 to UNO_SHARDS - 1
+
+Functions:
+    shard_of: Returns the shard that owns a game.
+    new_game_id: Returns a random game ID in a shard.
+"""
+
+import os
+from random import randint
+
+SHARDS = int(os.environ.get("UNO_SHARDS", "1"))
+SHARD = int(os.environ.get("UNO_SHARD", "0"))
+
+# Game IDs are 6 digits
+MIN_GAME_ID = 100000
+MAX_GAME_ID = 999999
+
+
+def shard_of(game_id: int, shards: int = SHARDS) -> int:
+    """Returns the shard that owns a game.
+
+    Args:
+        game_id (int): The ID of the game
+        shards (int): The number of shards
+
+    Returns:
+        int: The shard of the game
+    """
+    return game_id % shards
+
+
+def new_game_id(shard: int = SHARD, shards: int = SHARDS) -> int:
+    """Returns a random game ID owned by a shard.
+
+    Args:
+        shard (int): The shard that will own the game
+        shards (int): The number of shards
+
+    Returns:
+        int: A game ID with `shard_of(game_id, shards) == shard`
+    """
+    return randint(-(-(MIN_GAME_ID - shard) // shards), (MAX_GAME_ID - shard) // shards) * shards + shard
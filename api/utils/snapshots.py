@@ -0,0 +1,143 @@
+"""Periodic snapshots of the running games, so they survive a restart.
+
+Each game is written to its own file, `<game_id>.snap`, in the snapshot directory using the binary format
+from `game_logic.snapshot`. Snapshots are incremental: only games whose state version has changed since
+they were last written are encoded, and the files of games that have ended are deleted.
+
+Games are encoded on the event loop, a chunk at a time so other tasks can run in between,
+and the files are written from a worker thread.
+
+Classes:
+    Snapshotter: Writes and restores the game snapshots.
+"""
+
+import asyncio
+import os
+import struct
+
+from game_logic.game import Game
+from game_logic.snapshot import dump_game, load_game
+from utils.custom_logger import CustomLogger
+from utils.scheduling import PeriodicTask
+
+logger = CustomLogger(__name__)
+
+SUFFIX = ".snap"
+
+
+class Snapshotter:
+    """Writes snapshots of the games that have changed and restores them on startup.
+
+    Attributes:
+        directory (str): The directory the snapshots are written to
+        interval (float): Seconds between snapshots
+        chunk_size (int): The number of games encoded before yielding to the event loop
+        snapshots (int): The number of game snapshots written
+    """
+
+    def __init__(self, directory: str, interval: float = 5.0, chunk_size: int = 100):
+        self.directory = directory
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.snapshots = 0
+        # The game and its version when it was last written, by game ID
+        self._written: dict[int, tuple[Game, int]] = {}
+        self._task: PeriodicTask | None = None
+
+    def _path(self, game_id: int) -> str:
+        return os.path.join(self.directory, f"{game_id}{SUFFIX}")
+
+    def restore(self) -> dict[int, Game]:
+        """Reads every game snapshot in the directory.
+
+        Snapshots that can't be read are logged and skipped. This blocks, so it should be run
+        from a worker thread or before the server starts accepting connections.
+
+        Returns:
+            dict: The restored games by game ID
+        """
+        games = {}
+        if not os.path.isdir(self.directory):
+            return games
+
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                with open(path, "rb") as file:
+                    game = load_game(file.read())
+            except (OSError, ValueError, KeyError, IndexError, struct.error) as e:
+                logger.warning("Skipping game snapshot %s: %r", path, e)
+                continue
+            games[game.game_id] = game
+            self._written[game.game_id] = (game, game.version)
+
+        logger.info("Restored %s games from %s", len(games), self.directory)
+        return games
+
+    async def snapshot(self, games: dict[int, Game]) -> None:
+        """Writes the games that changed since the last snapshot and deletes the files of removed games.
+
+        Args:
+            games (dict): The running games by game ID
+        """
+        changed = []
+        written_versions = {}
+        for count, (game_id, game) in enumerate(list(games.items()), 1):
+            if count % self.chunk_size == 0:
+                await asyncio.sleep(0)
+            written = self._written.get(game_id)
+            if written is None or written[0] is not game or written[1] != game.version:
+                # A game that can't be encoded is skipped, so it doesn't stop the other games being written
+                try:
+                    changed.append((game_id, dump_game(game)))
+                except (ValueError, KeyError, IndexError, struct.error) as e:
+                    logger.error("Failed to encode a snapshot of game %s: %r", game_id, e)
+                    continue
+                written_versions[game_id] = (game, game.version)
+
+        removed = [game_id for game_id in self._written if game_id not in games]
+
+        if changed or removed:
+            await asyncio.to_thread(self._write, changed, removed)
+            # Only mark the games as written once the files are, so failed writes are retried
+            self._written.update(written_versions)
+            for game_id in removed:
+                self._written.pop(game_id, None)
+            self.snapshots += len(changed)
+            logger.debug("Wrote %s game snapshots and removed %s", len(changed), len(removed))
+
+    def _write(self, changed: list[tuple[int, bytes]], removed: list[int]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for game_id, data in changed:
+            # Write to a temporary file first so a crash never leaves a partial snapshot
+            path = self._path(game_id)
+            with open(path + ".tmp", "wb") as file:
+                file.write(data)
+            os.replace(path + ".tmp", path)
+        for game_id in removed:
+            try:
+                os.remove(self._path(game_id))
+            except FileNotFoundError:
+                pass
+
+    def start(self, games: dict[int, Game]) -> None:
+        """Starts the task that snapshots the games every interval.
+
+        Args:
+            games (dict): The running games by game ID, the dict is read on every snapshot
+        """
+        self._task = PeriodicTask(lambda: self.snapshot(games), self.interval, "write game snapshots")
+        self._task.start()
+
+    async def stop(self, games: dict[int, Game]) -> None:
+        """Stops the snapshot task and writes a final snapshot.
+
+        Args:
+            games (dict): The running games by game ID
+        """
+        if self._task:
+            await self._task.stop()
+            self._task = None
+        await self.snapshot(games)
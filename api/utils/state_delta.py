@@ -0,0 +1,94 @@
+"""Compact diffs between two game states sent to the same player.
+
+Websockets connected with `delta=true` receive a full game state when they connect,
+and after that only the changes since the last state they were sent:
+
+    {
+        "type": "delta",
+        "version": 12,          # The version of the game state after applying the delta
+        "from": 11,             # The version the delta applies to
+        "set": {...},           # Top level keys of the game state that changed, with their new values
+        "hand": {
+            "remove": [3],      # Indexes to remove from the hand
+            "append": [{...}],  # Cards to add to the end of the hand
+            "playable": [0, 2], # If present, the indexes of every playable card after the changes
+        },
+    }
+
+If a client's version does not match "from" it should send `{"type": "resync"}` to get a full game state.
+
+Functions:
+    diff_game_state: Returns the delta between two game states, or None if nothing changed.
+    diff_hand: Returns the changes between two views of a hand.
+"""
+
+# Keys that are not diffed as a whole
+IGNORED_KEYS = ("version", "playerHand")
+
+
+def diff_hand(old_hand: list[dict], new_hand: list[dict]) -> dict | None:
+    """Returns the changes between two views of a player's hand.
+
+    Cards appended to the end and single cards removed are encoded as operations,
+    any other change returns None so the whole hand is sent instead.
+
+    Args:
+        old_hand (list): The hand the client has
+        new_hand (list): The current hand
+
+    Returns:
+        dict | None: The hand changes, an empty dict if nothing changed, or None if the hand can't be diffed
+    """
+    if old_hand is new_hand:
+        return {}
+
+    old_cards = [(card["colour"], card["action"]) for card in old_hand]
+    new_cards = [(card["colour"], card["action"]) for card in new_hand]
+    kept_hand = list(old_hand)
+    changes = {}
+
+    if old_cards != new_cards[:len(old_cards)]:
+        # Only a single removed card, optionally followed by appended cards, is encoded
+        index = next((i for i, (old, new) in enumerate(zip(old_cards, new_cards)) if old != new),
+                     len(new_cards))
+        del old_cards[index]
+        del kept_hand[index]
+        if old_cards != new_cards[:len(old_cards)]:
+            return None
+        changes["remove"] = [index]
+
+    if len(new_cards) > len(old_cards):
+        changes["append"] = new_hand[len(old_cards):]
+
+    if any(old["isPlayable"] != new["isPlayable"] for old, new in zip(kept_hand, new_hand)):
+        changes["playable"] = [i for i, card in enumerate(new_hand) if card["isPlayable"]]
+
+    return changes
+
+
+def diff_game_state(old_state: dict, new_state: dict) -> dict | None:
+    """Returns the delta that turns one game state into another.
+
+    Args:
+        old_state (dict): The last game state sent to the player
+        new_state (dict): The current game state for the player
+
+    Returns:
+        dict | None: The delta message, or None if nothing the player can see has changed
+    """
+    changed = {key: value for key, value in new_state.items()
+               if key not in IGNORED_KEYS and old_state.get(key) != value}
+
+    hand_changes = diff_hand(old_state["playerHand"], new_state["playerHand"])
+    if hand_changes is None:
+        changed["playerHand"] = new_state["playerHand"]
+
+    if not changed and not hand_changes:
+        return None
+
+    delta = {"type": "delta", "version": new_state["version"], "from": old_state["version"]}
+    if changed:
+        delta["set"] = changed
+    if hand_changes:
+        delta["hand"] = hand_changes
+    return delta
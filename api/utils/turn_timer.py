@@ -0,0 +1,170 @@
+"""Turn timers, moving for players who don't take their turn in time.
+
+When the current player of a game hasn't moved for the turn time, a bot strategy from `sim.bots` plays
+a card for them, or picks a card if they can't play one, through `Game.play_card` and `Game.pick_card`
+like any other move, so it is recorded and can be replayed. Only games with websockets connected are
+moved for, games no one is connected to are left for the reaper.
+
+Every game being played shares one `utils.scheduling.DeadlineHeap`, with one entry per game, instead of a task
+per game. Like the reaper's expiry times an entry is only a lower bound: when it is due the turn's real deadline is
+worked out from `Game.updated`, and if the game has changed since, the entry is pushed back with the new
+deadline. So moves don't need to reset the timer, and each game costs at most one check per turn time.
+The turn time is counted from the last change to the game. Games no one is connected to are only checked
+with `GameStore.last_changes`, so they aren't loaded into memory just to be skipped.
+
+Settings read from the environment:
+    UNO_TURN_SECONDS: seconds a player has to take their turn, 60 by default, 0 to turn the timers off
+    UNO_AUTO_PLAY_BOT: the bot strategy that moves for players, "greedy" by default, see `sim.bots`
+
+Classes:
+    TurnTimer: Moves for the players whose turn has run out.
+"""
+
+import asyncio
+import os
+import time
+from itertools import islice
+from random import Random
+from typing import Awaitable, Callable
+
+from game_logic.game import Game, GameState
+from sim.bots import BOTS
+from utils.custom_logger import CustomLogger
+from utils.game_store import GameStore
+from utils.scheduling import DeadlineHeap, PeriodicTask
+
+logger = CustomLogger(__name__)
+
+TURN_SECONDS = float(os.environ.get("UNO_TURN_SECONDS", "60"))
+AUTO_PLAY_BOT = os.environ.get("UNO_AUTO_PLAY_BOT", "greedy")
+
+
+class TurnTimer:
+    """Moves for the players whose turn has run out.
+
+    Attributes:
+        games (GameStore): The store of the games
+        on_move (Callable): Called with the game, the seat that was moved for and the card index and colour played,
+            or None if a card was picked, after every automatic move
+        active (Callable[[int], bool]): Returns whether a game has players connected to move for
+        turn_seconds (float): Seconds a player has to take their turn
+        strategy (Callable): The bot strategy that chooses the card to play
+        interval (float): Seconds between checks for turns that have run out
+        auto_moves (int): The number of automatic moves made
+    """
+
+    def __init__(self, games: GameStore, on_move: Callable[[Game, int, tuple[int, str] | None], Awaitable[None]],
+                 active: Callable[[int], bool] = lambda game_id: True, turn_seconds: float = TURN_SECONDS,
+                 strategy: Callable = BOTS[AUTO_PLAY_BOT], interval: float = 0.5):
+        self.games = games
+        self.on_move = on_move
+        self.active = active
+        self.turn_seconds = turn_seconds
+        self.strategy = strategy
+        self.interval = interval
+        self.auto_moves = 0
+        # The bots get their own generator so they don't change the game's random sequence
+        self.rng = Random()
+        # The deadlines are a lower bound of when each game's turn runs out
+        self._deadlines = DeadlineHeap()
+        self._task: PeriodicTask | None = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def track(self, game_id: int) -> None:
+        """Starts timing the turns of a game that has started or been restored.
+
+        Args:
+            game_id (int): The ID of the game
+        """
+        if self.turn_seconds:
+            self._deadlines.push_earlier(time.monotonic() + self.turn_seconds, game_id)
+
+    def auto_move(self, game: Game) -> tuple[int, tuple[int, str] | None]:
+        """Plays a card for the current player with the bot strategy, or picks a card if they can't play one.
+
+        Args:
+            game (Game): The game
+
+        Returns:
+            tuple: The seat moved for, and the card index and colour played or None if a card was picked
+        """
+        seat = game.players.current_player_index
+        player_id = game.players.current_player_id
+        move = self.strategy(game, player_id, self.rng)
+        if move is None or not game.play_card(player_id, *move):
+            move = None
+            game.pick_card(player_id)
+        self.auto_moves += 1
+        return seat, move
+
+    async def expire(self) -> int:
+        """Moves for the players whose turn has run out.
+
+        Returns:
+            int: The number of automatic moves made
+        """
+        now = time.monotonic()
+        moves = 0
+        due = self._deadlines.pop_due(now)
+        # The games are checked a chunk at a time, letting other tasks run in between
+        while chunk := list(islice(due, 100)):
+            await asyncio.sleep(0)
+            active, inactive = [], []
+            for game_id in chunk:
+                (active if self.active(game_id) else inactive).append(game_id)
+            if inactive:
+                # Checked again a turn later, in case a player has reconnected, without loading the games
+                for game_id, (state, _, _) in (await self.games.last_changes(inactive)).items():
+                    if state == GameState.GAME:
+                        self._deadlines.push(now + self.turn_seconds, game_id)
+            for game_id in active:
+                moves += await self._check(game_id, now)
+        return moves
+
+    async def _check(self, game_id: int, now: float) -> int:
+        """Moves for the current player of a game with players connected if their turn has run out.
+
+        Returns:
+            int: 1 if a move was made, otherwise 0
+        """
+        # Games with players connected are pinned in memory, so this doesn't load the game
+        game = await self.games.get(game_id)
+        if game is None or game.state != GameState.GAME:
+            return 0
+
+        deadline = game.updated + self.turn_seconds
+        if deadline > now:
+            self._deadlines.push(deadline, game_id)
+            return 0
+
+        moved = 0
+        try:
+            seat, move = self.auto_move(game)
+            logger.info("Turn of seat %s in game %s ran out, %s", seat, game_id,
+                        f"played card {move[0]}" if move else "picked a card")
+            await self.on_move(game, seat, move)
+            moved = 1
+        except Exception as e:
+            logger.error("Failed to move for a player in game %s: %r", game_id, e)
+        if game.state == GameState.GAME:
+            # Never due again in this check, even if the move failed and the game didn't change
+            self._deadlines.push(max(game.updated, now) + self.turn_seconds, game_id)
+        return moved
+
+    def stats(self) -> dict:
+        """Returns the number of games timed and automatic moves made."""
+        return {"timed": len(self._deadlines), "autoMoves": self.auto_moves, "turnSeconds": self.turn_seconds}
+
+    def start(self) -> None:
+        """Starts the task that moves for players every interval."""
+        if self.turn_seconds:
+            self._task = PeriodicTask(self.expire, self.interval, "move for players whose turn ran out")
+            self._task.start()
+
+    async def stop(self) -> None:
+        """Stops the task that moves for players."""
+        if self._task:
+            await self._task.stop()
+            self._task = None